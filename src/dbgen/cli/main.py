@@ -25,6 +25,7 @@ from dbgen.cli.model import model_app
 from dbgen.cli.new import new_app
 from dbgen.cli.options import chdir_option, config_option
 from dbgen.cli.run import run_app
+from dbgen.cli.worker import run_worker
 from dbgen.configuration import config, get_connections
 from dbgen.utils.misc import which
 
@@ -35,6 +36,7 @@ app.add_typer(
 app.add_typer(run_app, name='run', help="Run DBgen models and monitor their status.")
 app.add_typer(model_app, name='model', help="Validate, serialize and export DBgen models.")
 app.add_typer(new_app, name='new', help="Create new DBgen models from templates.")
+app.command('worker', help="Run the ETLSteps queued in the metadatabase by distributed runs.")(run_worker)
 
 app.command("version", help="Print the version of dbgen")(lambda: styles.console.print(styles.LOGO_STYLE))
 
@@ -121,6 +121,23 @@ def run_model(
     include: List[str] = typer.Option([], help="ETLSteps to include"),
     exclude: List[str] = typer.Option([], help="ETLSteps to xclude"),
     retry: bool = typer.Option(False, help="Ignore repeat checking"),
+    single_transaction: bool = typer.Option(
+        False, help="Load every Load of a batch, and its repeats when possible, in a single transaction"
+    ),
+    pipeline: bool = typer.Option(
+        False, help="Overlap extracting, transforming and loading batches using background threads"
+    ),
+    memory_limit: Optional[float] = typer.Option(
+        None, help="Memory budget in MB for async runs, extraction pauses while the run uses more"
+    ),
+    hash_in_workers: bool = typer.Option(
+        False, help="Hash extracted rows in the worker processes of async runs instead of the main process"
+    ),
+    parallel: int = typer.Option(
+        1,
+        min=1,
+        help="Number of independent ETLSteps to run at once, each starts once its upstream ETLSteps finish",
+    ),
     start: Optional[str] = typer.Option(None, help="ETLStep to start run at"),
     until: Optional[str] = typer.Option(None, help="ETLStep to finish run at."),
     build: bool = typer.Option(
@@ -147,6 +164,15 @@ def run_model(
     ),
     remote: bool = typer.Option(False, help='Use the RemoteETLStep Runner'),
     run_async: bool = typer.Option(False, '--async', help='Use the RemoteGenerator Runner'),
+    distributed: bool = typer.Option(
+        False, help="Queue the ETLSteps in the metadatabase for `dbgen worker` processes to run"
+    ),
+    worker_lease: float = typer.Option(
+        60.0, help="Fail a distributed ETLStep once its worker has not sent a heartbeat for this many seconds"
+    ),
+    worker_timeout: Optional[float] = typer.Option(
+        None, help="Fail a distributed ETLStep that no worker has finished within this many seconds"
+    ),
     config_file: Path = config_option,
     no_conf: bool = typer.Option(
         False,
@@ -178,6 +204,13 @@ def run_model(
     # Initialize the run Configuration
     run_config = RunConfig(
         retry=retry,
+        single_transaction=single_transaction,
+        pipeline=pipeline,
+        memory_limit=memory_limit,
+        hash_in_workers=hash_in_workers,
+        parallel=parallel,
+        worker_lease=worker_lease,
+        worker_timeout=worker_timeout,
         start=start,
         until=until,
         exclude=exclude,
@@ -226,6 +259,7 @@ def run_model(
             rerun_failed=rerun_failed,
             remote=remote,
             run_async=run_async,
+            distributed=distributed,
         )
     except exceptions.SerializationError as exc:
         raise typer.BadParameter(
@@ -250,6 +284,7 @@ def run_model(
         ]
         rows_inserted = sum(etl_step_run.rows_inserted for etl_step_run in run.etl_step_runs)
         rows_updated = sum(etl_step_run.rows_updated for etl_step_run in run.etl_step_runs)
+        rows_unchanged = sum(etl_step_run.rows_unchanged for etl_step_run in run.etl_step_runs)
 
     if run.errors:
         styles.delimiter(styles.typer.colors.RED)
@@ -261,7 +296,7 @@ def run_model(
             f"Finished Running {len(model.etl_steps)} ETLStep(s) in {run.runtime.total_seconds():.3f}(s). {len(excluded_etl_steps)} Steps were Excluded."
         )
         styles.good_typer_print(
-            f"The run attempted to insert {rows_inserted} and update {rows_updated} rows."
+            f"The run inserted {rows_inserted} and updated {rows_updated} rows, leaving {rows_unchanged} rows unchanged."
         )
     else:
         styles.delimiter(styles.typer.colors.RED)
@@ -0,0 +1,58 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from pathlib import Path
+from typing import Optional
+
+import typer
+
+import dbgen.cli.styles as styles
+from dbgen.cli.options import chdir_option, config_option
+from dbgen.cli.utils import test_connection
+from dbgen.configuration import get_connections, stdout_handler
+from dbgen.core.run.worker import ETLStepWorker
+from dbgen.utils.log import LogLevel
+
+
+def run_worker(
+    name: Optional[str] = typer.Option(None, help="Name the worker reports, defaults to hostname:pid"),
+    run_async: bool = typer.Option(False, '--async', help='Run the claimed ETLSteps with the async runner'),
+    poll_interval: float = typer.Option(1.0, help="Seconds to wait between checks of an empty queue"),
+    max_idle: Optional[float] = typer.Option(
+        None, help="Exit once the queue has been empty for this many seconds"
+    ),
+    max_tasks: Optional[int] = typer.Option(None, help="Exit after running this many ETLSteps"),
+    heartbeat_interval: float = typer.Option(
+        10.0, help="Seconds between heartbeats, must be shorter than the --worker-lease of the run"
+    ),
+    level: LogLevel = typer.Option(LogLevel.INFO, help="Log level"),
+    config_file: Path = config_option,
+    _chdir: Path = chdir_option,
+):
+    """Run the ETLSteps queued by `dbgen run --distributed`, many workers can share a metadatabase."""
+    stdout_handler.setLevel(level.get_log_level())
+    main_conn, meta_conn = get_connections()
+    for conn_name, conn in (('main', main_conn), ('meta', meta_conn)):
+        test_connection(conn, conn_name)
+    worker_kwargs = dict(
+        run_async=run_async,
+        poll_interval=poll_interval,
+        max_idle=max_idle,
+        max_tasks=max_tasks,
+        heartbeat_interval=heartbeat_interval,
+    )
+    worker = ETLStepWorker(**worker_kwargs) if name is None else ETLStepWorker(name=name, **worker_kwargs)
+    styles.good_typer_print(f"Worker [theme]{worker.name!r}[/theme] waiting for queued ETLSteps...")
+    tasks = worker.run(main_conn.get_engine(), meta_conn.get_engine())
+    styles.good_typer_print(f"Worker {worker.name!r} ran {tasks} ETLStep(s).")
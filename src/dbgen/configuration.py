@@ -42,6 +42,33 @@ class ValidationEnum(str, Enum):
     OFF = 'off'
 
 
+class RepeatIndexType(str, Enum):
+    SET = 'set'
+    SORTED = 'sorted'
+
+
+class HashingType(str, Enum):
+    LEGACY = 'legacy'
+    FAST = 'fast'
+
+
+class CopyFormat(str, Enum):
+    TEXT = 'text'
+    BINARY = 'binary'
+
+
+class LoadStrategy(str, Enum):
+    AUTO = 'auto'
+    DEDUP = 'dedup'
+    UPSERT = 'upsert'
+    MERGE = 'merge'
+
+
+class PartitionStrategy(str, Enum):
+    HASH = 'hash'
+    RANGE = 'range'
+
+
 hidden_options = ('pdb', 'testing')
 
 
@@ -58,6 +85,11 @@ class DBgenConfiguration(BaseSettings):
     batch_size: int = 100
     temp_dir: Path = Path(tempfile.gettempdir())
     validation: ValidationEnum = ValidationEnum.COERCE
+    repeat_index: RepeatIndexType = RepeatIndexType.SORTED
+    hashing: HashingType = HashingType.LEGACY
+    copy_format: CopyFormat = CopyFormat.TEXT
+    load_strategy: LoadStrategy = LoadStrategy.AUTO
+    skip_unchanged: bool = False
     pdb: bool = False
     testing: bool = False
     log_level: LogLevel = LogLevel.INFO
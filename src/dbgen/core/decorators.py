@@ -96,10 +96,13 @@ class TransformNode(FunctionNode[In, Out]):
         function: Callable[In, Out] = None,
         env: Optional[Environment] = None,
         outputs=None,
+        batched: bool = False,
     ):
         outputs = outputs or ['out']
         try:
-            node = PythonTransform(function=function, env=env, inputs=inputs, outputs=outputs)
+            node = PythonTransform(
+                function=function, env=env, inputs=inputs, outputs=outputs, batched=batched
+            )
         except ValidationError as exc:
             raise InvalidArgument(
                 f'Error occurred during the validation of the transform {function.__name__!r}'
@@ -135,12 +138,19 @@ def transform(function: Callable[In, Out]) -> Callable[In, FunctionNode[In, Out]
 
 @overload
 def transform(
-    *, env: Environment = None, outputs: List[str] = None
+    *, env: Environment = None, outputs: List[str] = None, batched: bool = False
 ) -> Callable[[Callable[In, Out]], Callable[In, FunctionNode[In, Out]]]:
     ...  # pragma: no cover
 
 
-def transform(function=None, *, env: Optional[Environment] = None, outputs: List[str] = None):
+def transform(
+    function=None, *, env: Optional[Environment] = None, outputs: List[str] = None, batched: bool = False
+):
+    """Turn a function into a transform node.
+
+    With batched=True the function is called once per batch with a list of values for each input, and returns
+    a sequence or NumPy array of values for each output, so setup work and vectorised code run once per batch.
+    """
 
     if function:
         if not outputs:
@@ -150,19 +160,23 @@ def transform(function=None, *, env: Optional[Environment] = None, outputs: List
             if outputs is None and sig.return_annotation:
                 annotation = sig.return_annotation
                 origin = get_origin(annotation)
-                if origin is not None and origin is not Union and issubclass(origin, (list, tuple)):
+                if batched:
+                    # Batched functions return a column per output, a tuple of columns for several outputs
+                    if origin is tuple and ... not in get_args(annotation):
+                        outputs = [str(i) for i, _ in enumerate(get_args(annotation))]
+                elif origin is not None and origin is not Union and issubclass(origin, (list, tuple)):
                     args = get_args(annotation)
                     bad_args = list(filter(lambda x: not isinstance(x, type), args))
                     if not bad_args:
                         outputs = [str(i) for i, _ in enumerate(args)]
-        func = partial(TransformNode, function=function, env=env, outputs=outputs)
+        func = partial(TransformNode, function=function, env=env, outputs=outputs, batched=batched)
 
         def set_inputs(*inputs: List[Arg]) -> FunctionNode[In, Out]:
             return func(*inputs)
 
         return set_inputs
     else:
-        return partial(transform, env=env, outputs=outputs)
+        return partial(transform, env=env, outputs=outputs, batched=batched)
 
 
 @overload
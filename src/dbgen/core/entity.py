@@ -281,7 +281,15 @@ class BaseEntity(Base, SQLModel, metaclass=EntityMetaclass):
         )
 
     @classmethod
-    def load(cls, insert: bool = False, validation: Optional[str] = None, **kwargs) -> Load[UUID]:
+    def load(
+        cls,
+        insert: bool = False,
+        validation: Optional[str] = None,
+        copy_format: Optional[str] = None,
+        load_strategy: Optional[str] = None,
+        skip_unchanged: Optional[bool] = None,
+        **kwargs,
+    ) -> Load[UUID]:
         name = cls.__tablename__
         assert isinstance(name, str)
         # TODO check if we need this anymore
@@ -336,6 +344,9 @@ class BaseEntity(Base, SQLModel, metaclass=EntityMetaclass):
             inputs={**attrs, **fks},
             insert=insert,
             validation=validation,
+            copy_format=copy_format,
+            load_strategy=load_strategy,
+            skip_unchanged=skip_unchanged,
         )
 
     @classmethod
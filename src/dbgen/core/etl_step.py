@@ -16,8 +16,8 @@ import logging
 import re
 import traceback
 from bdb import BdbQuit
-from functools import reduce
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+from functools import partial, reduce
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
 from uuid import UUID
 
 from pydantic import Field, PrivateAttr
@@ -34,8 +34,10 @@ from dbgen.core.node.extract import Extract
 from dbgen.core.node.load import Load
 from dbgen.core.node.query import BaseQuery
 from dbgen.core.node.transforms import PythonTransform, Transform
+from dbgen.core.plan import ETLStepPlan
 from dbgen.exceptions import DBgenMissingInfo, DBgenSkipException, ValidationError
 from dbgen.utils.graphs import topsort_with_dict
+from dbgen.utils.typing import ROWS_TO_LOAD_TYPE
 
 if TYPE_CHECKING:
     from networkx import DiGraph  # pragma: no cover
@@ -57,12 +59,18 @@ class ETLStep(Base):
     loads: List[Load] = list_field
     tags: List[str] = list_field
     batch_size: Optional[int] = None
+    # Hash the inputs of a query extract in the database, the first run after switching hashes is a one-time
+    # migration that reprocesses every input once as the database hashes differ from the python hashes
+    server_side_repeats: bool = False
     additional_dependencies: Optional[Dependency] = None
     dependency: Optional[Dependency] = None
     _graph: Optional["DiGraph"] = PrivateAttr(None)
     _context: ETLStepContext = PrivateAttr(None)
+    _plan: Optional[ETLStepPlan] = PrivateAttr(None)
+    _plan_compiled: bool = PrivateAttr(False)
     _hashexclude_ = {
         'dependency',
+        'server_side_repeats',
     }
 
     def __init__(self, name: str, **kwargs):
@@ -128,9 +136,12 @@ class ETLStep(Base):
     def transform_batch(self, batch: List[Tuple[UUID, Dict[str, Dict[str, Any]]]], run_config: 'RunConfig'):
         """Transform a batch of extracted namespaces."""
         # initialize the master dict for the rows that will need to be loaded after
-        rows_to_load: Dict[str, Dict[UUID, dict]] = {node.hash: {} for node in self.loads}
+        rows_to_load: ROWS_TO_LOAD_TYPE = {node.hash: node.new_buffer() for node in self.loads}
         processed_hashes = []
         inputs_skipped = 0
+        plan = self._get_plan()
+        if plan is not None:
+            return self._transform_columns(plan, batch, rows_to_load, run_config)
         for input_hash, row in batch:
             try:
                 _, skipped = self._transform(row, rows_to_load, run_config)
@@ -149,13 +160,99 @@ class ETLStep(Base):
                 return None, None, None, inputs_skipped, traceback.format_exc()
         return processed_hashes, rows_to_load, len(batch), inputs_skipped, None
 
+    def _transform_columns(
+        self,
+        plan: ETLStepPlan,
+        batch: List[Tuple[UUID, Dict[str, Dict[str, Any]]]],
+        rows_to_load: ROWS_TO_LOAD_TYPE,
+        run_config: 'RunConfig',
+    ):
+        """Transform a batch one node at a time, so batched transforms are called once on its columns.
+
+        Consecutive nodes that run a row at a time run together for each row, and each load hashes the ids
+        of every row in one call. Rows are skipped as in transform_batch, a batched transform that raises
+        skips every row it ran on. Loads check the identifying info of each row as they assemble it, so a
+        bad row is skipped on its own before the load's rows are hashed together.
+        """
+
+        def start(rows: List[List[Any]]) -> None:
+            for values in rows:
+                values[:] = plan.start(values[0])
+
+        stages: List[Tuple[bool, List[Callable[[List[List[Any]]], None]]]] = []
+
+        def add_stage(batched: bool, run: Callable[[List[List[Any]]], None]) -> None:
+            if not batched and stages and not stages[-1][0]:
+                stages[-1][1].append(run)
+            else:
+                stages.append((batched, [run]))
+
+        def run_stage(runs: List[Callable[[List[List[Any]]], None]], rows: List[List[Any]]) -> None:
+            for run in runs:
+                run(rows)
+
+        add_stage(False, start)
+        for step in plan.transforms:
+            add_stage(step[0].batched, partial(plan.run_transform, step, run_config=run_config))
+        for load_step in plan.loads:
+            add_stage(False, partial(plan.assemble_load, load_step))
+            add_stage(True, partial(plan.add_load, load_step, rows_to_load=rows_to_load))
+        rows: List[Tuple[UUID, List[Any]]] = [(input_hash, [namespace]) for input_hash, namespace in batch]
+        inputs_skipped = 0
+        for batched, runs in stages:
+            groups = ([rows] if rows else []) if batched else [[row] for row in rows]
+            remaining = []
+            for group in groups:
+                try:
+                    skipped = self._run_plan(run_stage, runs, [values for _, values in group])
+                except (KeyboardInterrupt, SystemExit, BdbQuit):
+                    raise
+                except BaseException:
+                    if not run_config.skip_on_error:
+                        return None, None, None, inputs_skipped, traceback.format_exc()
+                    if self._logger.isEnabledFor(logging.DEBUG):
+                        self._logger.debug(f'Skipped {len(group)} row(s) due to error')
+                    skipped = True
+                if skipped:
+                    inputs_skipped += len(group)
+                else:
+                    remaining.extend(group)
+            rows = remaining
+        return [input_hash for input_hash, _ in rows], rows_to_load, len(batch), inputs_skipped, None
+
+    def transform_raw_batch(self, batch: List[Tuple[UUID, Any]], run_config: 'RunConfig'):
+        """Process a batch of rows straight from the extract and transform them."""
+        extract = self.extract
+        return self.transform_batch(
+            [(input_hash, {extract.hash: extract.process_row(row)}) for input_hash, row in batch], run_config
+        )
+
     def remove_stored_func(self):
         """Removes all stored functions on this ETLStep's PythonTransforms to allow for pickling."""
         for node in self.transforms:
             if isinstance(node, PythonTransform):
                 node.function.set_func(None)
 
-    def _transform(self, namespace: dict, rows_to_load: Dict[str, Dict[UUID, dict]], run_config: 'RunConfig'):
+    def _get_plan(self) -> Optional[ETLStepPlan]:
+        """Get the ETLStep's flat execution plan, compiled the first time it is needed."""
+        if not self._plan_compiled:
+            self._plan = ETLStepPlan.compile(self)
+            self._plan_compiled = True
+        return self._plan
+
+    def _run_plan(self, run: Callable[..., Any], *args: Any) -> bool:
+        """Run the execution plan or a stage of it, returning whether its rows were skipped."""
+        try:
+            run(*args)
+        except DBgenSkipException as exc:
+            self._logger.debug(f'Skipped row: {exc.msg}')
+            return True
+        except ValidationError as exc:
+            self._logger.error(exc)
+            raise
+        return False
+
+    def _transform(self, namespace: dict, rows_to_load: ROWS_TO_LOAD_TYPE, run_config: 'RunConfig'):
         skipped = False
         try:
             output = namespace.copy()
@@ -186,6 +283,7 @@ class ETLStep(Base):
                 raise TypeError(f"Unknown node type found during sorting! {type(node)}")
         self.transforms = transforms
         self.loads = loads
+        self._plan_compiled = False
 
     def _computational_graph(self, force_rebuild: bool = True) -> "DiGraph":
         if self._graph is None or force_rebuild:
@@ -14,24 +14,23 @@
 
 import ast
 import inspect
+import linecache
 import os
 import re
-from importlib.util import module_from_spec, spec_from_file_location
 from inspect import (
     Parameter,
+    Signature,
     getdoc,
     getmembers,
-    getsourcefile,
     getsourcelines,
     isbuiltin,
     isclass,
     isfunction,
     signature,
 )
-from os.path import exists
 from pathlib import Path
 from textwrap import dedent
-from types import LambdaType
+from types import LambdaType, ModuleType
 from typing import Any, Callable, ClassVar, Dict, Generic, List, Optional, Set, TypeVar, Union
 
 from pydantic import Field, constr, root_validator, validator
@@ -186,6 +185,9 @@ Output = TypeVar('Output')
 FuncIn = ParamSpec('FuncIn')
 FuncOut = TypeVar('FuncOut')
 
+# Functions compiled from the source of Funcs keyed by Func hash, so each process compiles a source once
+_compiled_funcs: Dict[str, Callable] = {}
+
 
 class Func(Base, Generic[FuncOut]):
     """
@@ -196,6 +198,7 @@ class Func(Base, Generic[FuncOut]):
     name: str
     env: Environment
     _func: Optional[Callable]
+    _sig: Optional[Signature] = None
 
     class Config:
         """Pydantic Config"""
@@ -214,11 +217,8 @@ class Func(Base, Generic[FuncOut]):
         return "<Func (%d line%s)>" % (n, s)
 
     def __call__(self, *args, **kwargs) -> FuncOut:
-        if self._func is not None and self.path.exists():
-            return self._func(*args, **kwargs)
-        else:
-            f = self._from_src()
-            return f(*args, **kwargs)
+        func = self._func if self._func is not None else self._from_src()
+        return func(*args, **kwargs)
 
     def __repr__(self) -> str:
         return self.name
@@ -235,7 +235,10 @@ class Func(Base, Generic[FuncOut]):
 
     @property
     def sig(self) -> Any:
-        return signature(self._from_src())
+        # The signature is inspected once, the properties describing the arguments all derive from it
+        if self._sig is None:
+            self._sig = signature(self._from_src())
+        return self._sig
 
     @property
     def argnames(self) -> List[str]:
@@ -273,6 +276,7 @@ class Func(Base, Generic[FuncOut]):
 
     @property
     def path(self) -> Path:
+        """Filename given to the code compiled from the source, the file is only written by write_file."""
         return config.temp_dir / f"{self.name}_{self.hash}.py"
 
     def file(self) -> str:
@@ -284,15 +288,16 @@ class Func(Base, Generic[FuncOut]):
     def _from_src(self, force: bool = False) -> Callable:
         """
         Execute source code to get a callable
-        """
-
-        if force or not exists(self.path):
-            with open(self.path, "w") as t:
-                t.write(self.file())
 
+        The compiled function is cached in memory by the hash of the Func so each process compiles a source
+        once, without a round trip through the filesystem.
+        """
         if force or self._func is None:
-            self._func = self.path_to_func(str(self.path))
-
+            func_hash = self.hash
+            func = None if force else _compiled_funcs.get(func_hash)
+            if func is None:
+                func = _compiled_funcs[func_hash] = self.source_to_func(self.file(), str(self.path))
+            self._func = func
         return self._func
 
     # # Public methods #
@@ -308,28 +313,43 @@ class Func(Base, Generic[FuncOut]):
         Useful for removing the function object from the Func object for pickling
         """
         self._func = value
+        self._sig = None
+
+    def write_file(self) -> Path:
+        """Write the source to the temp file named in tracebacks, for inspecting it outside the process."""
+        with open(self.path, "w") as t:
+            t.write(self.file())
+        return self.path
 
     @staticmethod
     def path_to_func(pth: str) -> Callable:
+        with open(pth) as f:
+            return Func.source_to_func(f.read(), str(pth))
 
+    @staticmethod
+    def source_to_func(source: str, filename: str) -> Callable:
+        """Execute the source of a module defining one function and return that function.
+
+        The source is registered with linecache under filename, so tracebacks and inspect show its lines
+        whether or not a file exists at that path.
+        """
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
         try:
-            spec = spec_from_file_location("random", pth)
-            assert spec and spec.loader, "Spec or Spec.loader are broken"
-            mod = module_from_spec(spec)
-            spec.loader.exec_module(mod)  # type: ignore
-            transforms = [o for o in getmembers(mod) if isfunction(o[1]) and getsourcefile(o[1]) == pth]
+            mod = ModuleType(Path(filename).stem)
+            mod.__file__ = filename
+            exec(compile(source, filename, "exec"), mod.__dict__)
+            transforms = [
+                o for o in getmembers(mod) if isfunction(o[1]) and o[1].__code__.co_filename == filename
+            ]
             assert len(transforms) == 1, "Bad input file %s has %d functions, not 1" % (
-                pth,
+                filename,
                 len(transforms),
             )
             return transforms[0][1]
 
         except Exception as e:
-            if exists(pth):
-                with open(pth) as f:
-                    content = f.read()
             raise DBgenInternalError(
-                f"Error while trying to load source code. You may be missing an import in your Transforms Env object. \nPath:{pth}\nFile Contents:\n--------\n{content}\n--------\nLoad Error: {e}"
+                f"Error while trying to load source code. You may be missing an import in your Transforms Env object. \nPath:{filename}\nFile Contents:\n--------\n{source}\n--------\nLoad Error: {e}"
             )
 
 
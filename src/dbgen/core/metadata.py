@@ -105,6 +105,7 @@ class ETLStepRunEntity(Root, registry=meta_registry, table=True):
     inputs_processed: int = 0
     rows_inserted: int = 0
     rows_updated: int = 0
+    rows_unchanged: int = 0
     memory_usage: Optional[float]
     query: Optional[str]
     error: Optional[str]
@@ -118,6 +119,26 @@ class Repeats(Root, registry=meta_registry, table=True):
     input_hash: UUID = Field(..., primary_key=True)
 
 
+class ETLStepQueueEntity(Root, registry=meta_registry, table=True):
+    """An ETLStep run waiting to be claimed, or claimed, by a dbgen worker."""
+
+    __tablename__ = "etl_step_queue"
+    id: Optional[int] = Field(None, sa_column_kwargs={"autoincrement": True, "primary_key": True})
+    run_id: Optional[int] = RunEntity.foreign_key()
+    etl_step_id: Optional[UUID] = ETLStepEntity.foreign_key()
+    created_at: Optional[datetime] = get_created_at_field()
+    ordering: Optional[int]
+    status: Optional[Status] = Status.initialized
+    run_config: Optional[dict]
+    settings_class: Optional[str]
+    worker: Optional[str]
+    claimed_at: Optional[datetime]
+    heartbeat_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    return_code: Optional[int]
+    error: Optional[str]
+
+
 run_view_statement = (
     select(
         ETLStepEntity.name,
@@ -195,3 +216,13 @@ class ETLStepsToRun(BaseEntity, registry=meta_registry):
             Column("error", AutoString()),
         ],
     )
+
+
+# create_all leaves existing tables as they are, so columns added to the meta tables since they were created
+# are added here
+meta_migration_stmts = [
+    text(
+        f"ALTER TABLE {META_SCHEMA}.etl_step_run "
+        "ADD COLUMN IF NOT EXISTS rows_unchanged integer NOT NULL DEFAULT 0"
+    ),
+]
@@ -28,7 +28,7 @@ from dbgen.core.base import Base
 from dbgen.core.context import ModelContext
 from dbgen.core.entity import BaseEntity
 from dbgen.core.etl_step import ETLStep
-from dbgen.core.metadata import ModelEntity, RunEntity, meta_registry
+from dbgen.core.metadata import ModelEntity, RunEntity, meta_migration_stmts, meta_registry
 from dbgen.core.model_settings import BaseModelSettings
 from dbgen.exceptions import ModelRunError
 from dbgen.utils.graphs import serialize_graph, topsort_with_dict
@@ -127,6 +127,7 @@ class Model(Base, Generic[SettingType]):
         rerun_failed: bool = False,
         remote: bool = True,
         run_async: bool = True,
+        distributed: bool = False,
     ) -> RunEntity:
         from dbgen.core.run.model_run import ModelRun
 
@@ -144,6 +145,7 @@ class Model(Base, Generic[SettingType]):
             run_async=run_async,
             remote=remote,
             rerun_failed=rerun_failed,
+            distributed=distributed,
         )
 
     def sync(
@@ -166,6 +168,7 @@ class Model(Base, Generic[SettingType]):
             self.drop_metadata(meta_engine, self.meta_registry.metadata)
         if create:
             self.create_metadata(meta_engine, self.meta_registry.metadata)
+            self.migrate_metadata(meta_engine)
 
     def drop_metadata(self, engine: Engine, metadata: MetaData):
         try:
@@ -188,6 +191,12 @@ class Model(Base, Generic[SettingType]):
         except sqlalchemy.exc.InternalError as exc:
             raise ValueError("Error occurred during database creation") from exc
 
+    def migrate_metadata(self, engine: Engine):
+        """Add the columns missing from meta tables created by older versions of dbgen."""
+        with engine.begin() as conn:
+            for stmt in meta_migration_stmts:
+                conn.execute(stmt)
+
     def _get_model_row(self):
         graph = self._etl_step_graph()
 
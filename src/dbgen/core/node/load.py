@@ -12,7 +12,7 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 from functools import partial
-from itertools import chain
+from itertools import chain, islice
 from typing import (
     TYPE_CHECKING,
     Any,
@@ -33,18 +33,27 @@ from pydantic import Field, PrivateAttr
 from pydantic import ValidationError as PydValidationError
 from pydantic import root_validator, validate_model, validator
 from pydantic.error_wrappers import ErrorWrapper
-from pydasher import hasher
 from pydasher.import_module import import_string
 
-from dbgen.configuration import ValidationEnum, config
+from dbgen.configuration import CopyFormat, LoadStrategy, ValidationEnum, config
 from dbgen.core.args import Arg, Constant
 from dbgen.core.base import Base
 from dbgen.core.dependency import Dependency
 from dbgen.core.node.computational_node import ComputationalNode
 from dbgen.core.type_registry import column_registry
 from dbgen.exceptions import ValidationError
+from dbgen.utils.hashing import get_value_hasher
 from dbgen.utils.lists import broadcast, is_broadcastable
-from dbgen.utils.postgresql_load import async_load_data, load_data
+from dbgen.utils.load_buffer import LoadBuffer
+from dbgen.utils.postgresql_load import (
+    LoadResult,
+    StagedLoad,
+    async_load_data,
+    async_prepare_load,
+    load_data,
+    prepare_load,
+)
+from dbgen.utils.typing import ASSEMBLED_ROWS_TYPE, ROWS_TO_LOAD_TYPE
 
 if TYPE_CHECKING:
     from psycopg import AsyncConnection, Connection  # pragma: no cover
@@ -53,7 +62,7 @@ if TYPE_CHECKING:
 
 
 def hash_tuple(tuple_to_hash: Tuple[Any, ...]) -> UUID:
-    return UUID(hasher(tuple_to_hash))
+    return get_value_hasher()(tuple_to_hash)
 
 
 class LoadEntity(Base):
@@ -69,6 +78,7 @@ class LoadEntity(Base):
     required: Set[str] = Field(default_factory=set)
     foreign_keys: Set[str] = Field(default_factory=set)
     _entity: Optional[Type['BaseEntity']] = PrivateAttr(None)
+    _hash_layout: Optional[Tuple[Tuple[Tuple[str, type], ...], Tuple[str, ...]]] = PrivateAttr(None)
 
     def __str__(self):
         return (
@@ -151,29 +161,62 @@ class LoadEntity(Base):
             raise PydValidationError(errors, self.__class__)
         return input_data
 
-    def _get_hash(self, arg_dict: Dict[str, Any]) -> UUID:
-        id_fks = (str(arg_dict[val]) for val in sorted(self.identifying_foreign_keys))
-        id_attrs = []
-        for attr_name in sorted(self.identifying_attributes):
-            type_str = self.attributes[attr_name]
-            data_type = column_registry[type_str]
-            type_func = list if type_str == data_type.array_oid else data_type.python_type
+    def _get_hash_layout(self) -> Tuple[Tuple[Tuple[str, type], ...], Tuple[str, ...]]:
+        """Get the sorted identifying attributes with their python types and the sorted identifying fks."""
+        if self._hash_layout is None:
+            id_attrs = []
+            for attr_name in sorted(self.identifying_attributes):
+                type_str = self.attributes[attr_name]
+                data_type = column_registry[type_str]
+                type_func = list if type_str == data_type.array_oid else data_type.python_type
+                id_attrs.append((attr_name, type_func))
+            self._hash_layout = (tuple(id_attrs), tuple(sorted(self.identifying_foreign_keys)))
+        return self._hash_layout
+
+    def _check_hash_inputs(self, arg_dict: Mapping[str, Any]) -> None:
+        """Check a row has all its identifying info with the right types, so hashing its batch cannot fail."""
+        id_attrs, id_fks = self._get_hash_layout()
+        for attr_name, type_func in id_attrs:
             try:
                 arg_val = arg_dict[attr_name]
-                if arg_val is None or isinstance(arg_val, type_func):
-                    coerced_val = arg_val
-                else:
-                    raise TypeError(
-                        f"Type Coercing is turned off. You are trying to insert into attribute {self.name}({attr_name}) which has a type of {type_func} but you provided a type {type(arg_val)}.\n"
-                        "If you want to turn Type Coercement on set the configuration variable DBGEN_TYPE_COERCING=true in your config file or environment variable"
-                    )
-            except TypeError as exc:
-                raise ValueError(f"Error coercing value {arg_val!r} to type {type_func}:\n{exc}") from exc
             except KeyError:
-                raise KeyError(f"Cannot find id_attribute {attr_name!r} in arg_dict for hashing: {arg_dict}")
-            id_attrs.append(coerced_val)
-        tuple_to_hash = (*id_attrs, *id_fks)
-        return hash_tuple(tuple_to_hash)
+                raise KeyError(f"Cannot find id_attribute {attr_name!r} in row for hashing: {list(arg_dict)}")
+            self._check_hash_value(attr_name, type_func, arg_val)
+        for fk_name in id_fks:
+            if fk_name not in arg_dict:
+                raise KeyError(f"Cannot find id_foreign_key {fk_name!r} in row for hashing: {list(arg_dict)}")
+
+    def _check_hash_value(self, attr_name: str, type_func: type, arg_val: Any) -> None:
+        if not (arg_val is None or isinstance(arg_val, type_func)):
+            raise ValueError(
+                f"Error coercing value {arg_val!r} to type {type_func}:\n"
+                f"Type Coercing is turned off. You are trying to insert into attribute {self.name}({attr_name}) which has a type of {type_func} but you provided a type {type(arg_val)}.\n"
+                "If you want to turn Type Coercement on set the configuration variable DBGEN_TYPE_COERCING=true in your config file or environment variable"
+            )
+
+    def _get_hash(self, arg_dict: Dict[str, Any]) -> UUID:
+        return self._get_hashes({key: [val] for key, val in arg_dict.items()}, 1)[0]
+
+    def _get_hashes(self, columns: Mapping[str, Sequence[Any]], num_rows: int) -> List[UUID]:
+        """Hash the identifying info of a batch of rows given as columns into their primary keys."""
+        id_attrs, id_fks = self._get_hash_layout()
+        id_columns: List[Sequence[Any]] = []
+        for attr_name, type_func in id_attrs:
+            try:
+                column = columns[attr_name]
+            except KeyError:
+                raise KeyError(
+                    f"Cannot find id_attribute {attr_name!r} in columns for hashing: {list(columns)}"
+                )
+            for arg_val in column:
+                self._check_hash_value(attr_name, type_func, arg_val)
+            id_columns.append(column)
+        for fk_name in id_fks:
+            id_columns.append([str(val) for val in columns[fk_name]])
+        value_hasher = get_value_hasher()
+        if not id_columns:
+            return [value_hasher(())] * num_rows
+        return [value_hasher(id_values) for id_values in zip(*id_columns)]
 
     @property
     def full_name(self) -> str:
@@ -193,7 +236,11 @@ class Load(ComputationalNode[T]):
     _output: Dict[UUID, Sequence[Any]] = PrivateAttr(default_factory=dict)
     insert: bool = False
     validation: Optional[ValidationEnum] = None
+    copy_format: Optional[CopyFormat] = None
+    load_strategy: Optional[LoadStrategy] = None
+    skip_unchanged: Optional[bool] = None
     outputs: List[str] = Field(default_factory=list)
+    _hashexclude_ = {'copy_format', 'load_strategy', 'skip_unchanged'}
     # _logger_name: ClassVar[
     #     Callable[["Base", Dict[str, Any]], str]
     # ] = lambda _, kwargs: f"dbgen.load.{kwargs.get('load_entity').name}"  # type: ignore
@@ -272,20 +319,40 @@ class Load(ComputationalNode[T]):
             tables_needed=tables_needed,
         )
 
+    def new_buffer(self) -> LoadBuffer:
+        """Create an empty buffer for the rows this Load will queue for the database."""
+        return LoadBuffer(len(self.inputs))
+
     def new_run(
-        self, row: Dict[str, Mapping[str, Any]], rows_to_load: Dict[str, Dict[UUID, Any]]
+        self, row: Dict[str, Mapping[str, Any]], rows_to_load: ROWS_TO_LOAD_TYPE
     ) -> Dict[str, List[UUID]]:
+        inputs = self._get_inputs(row)
+        primary_key = self.primary_key.arg_get(row) if self.primary_key is not None else None
+        primary_keys = self.add_rows({key: inputs[key] for key in sorted(inputs)}, primary_key, rows_to_load)
+        return {self.outputs[0]: primary_keys}
+
+    def add_rows(
+        self, inputs: Mapping[str, Any], primary_key: Any, rows_to_load: ROWS_TO_LOAD_TYPE
+    ) -> List[UUID]:
+        """Broadcast and validate the resolved inputs into rows, add them to the buffer and return their ids.
+
+        The inputs must be in sorted column order, the order of the columns in the load's buffer.
+        """
+        return self.add_assembled_rows([self.assemble_rows(inputs, primary_key)], rows_to_load)[0]
+
+    def assemble_rows(self, inputs: Mapping[str, Any], primary_key: Any) -> ASSEMBLED_ROWS_TYPE:
+        """Broadcast and validate the resolved inputs into rows, with their ids if a primary key is given."""
         not_list = lambda x: not isinstance(x, (list, tuple))
         lists_allowed = lambda x: self.load_entity.attributes[x].endswith('[]')
         is_list_of_lists = lambda x: isinstance(x, list) and x and isinstance(x[0], list)
         arg_dict = {
             key: [val] if (not_list(val) or (lists_allowed(key) and not is_list_of_lists)) else val
-            for key, val in sorted(self._get_inputs(row).items())
+            for key, val in inputs.items()
         }
         # Check for empty lists, as that will cause the row to be ignored
         if any(map(lambda x: len(x) == 0, arg_dict.values())):
             # self._logger.debug(f'Row {arg_dict} produced 0 rows for load {self}')
-            return {self.outputs[0]: []}
+            return [], []
         # Check for broadcastability
         try:
             is_broadcastable(*arg_dict.values())
@@ -319,7 +386,7 @@ class Load(ComputationalNode[T]):
             ) from exc
         # If we have a user supplied Primary Key go get it and broadcast it
         if self.primary_key is not None:
-            primary_arg_val = self.primary_key.arg_get(row)
+            primary_arg_val = primary_key
             # Validate the primary key type
             if isinstance(primary_arg_val, UUID):
                 primary_keys: List[UUID] = [primary_arg_val]
@@ -335,29 +402,44 @@ class Load(ComputationalNode[T]):
                 raise ValueError(
                     f"Cannot broadcast Primary Key to Max Length: {len(primary_keys)} {len(broadcasted_values)}"
                 )
-        else:
-            # If we don't have a primary key get it from the identifying info on the broadcasted
-            # Values
-            primary_keys = [self.load_entity._get_hash(row) for row in broadcasted_values]
-        sorted_keys = sorted(self.inputs.keys())
-        # Update rows to load dict in place
-        rows_to_load[self.hash].update(
-            {
-                primary_key: [value[key] for key in sorted_keys]
-                for primary_key, value in zip(primary_keys, broadcasted_values)
-            }
+            return broadcasted_values, primary_keys
+        # Without a primary key the ids are hashed from the identifying info once the rows are added, so the
+        # identifying info is checked here where a bad row only fails its own input
+        for value in broadcasted_values:
+            self.load_entity._check_hash_inputs(value)
+        return broadcasted_values, None
+
+    def add_assembled_rows(
+        self, assembled: Sequence[ASSEMBLED_ROWS_TYPE], rows_to_load: ROWS_TO_LOAD_TYPE
+    ) -> List[List[UUID]]:
+        """Add the assembled rows of many inputs to the buffer, returning the ids of each input's rows.
+
+        The ids of every row without a primary key are hashed from their identifying info in one call.
+        """
+        to_hash = [value for values, primary_keys in assembled if primary_keys is None for value in values]
+        if to_hash:
+            id_columns = {key: [value[key] for value in to_hash] for key in self.load_entity.identifiers}
+            hashes = iter(self.load_entity._get_hashes(id_columns, len(to_hash)))
+        ids: List[List[UUID]] = []
+        for values, primary_keys in assembled:
+            ids.append(list(islice(hashes, len(values))) if primary_keys is None else primary_keys)
+        rows = [value for values, _ in assembled for value in values]
+        # Add the rows to the load's buffer in place
+        rows_to_load[self.hash].extend(
+            list(chain.from_iterable(ids)), [[value[key] for value in rows] for key in sorted(self.inputs)]
         )
+        return ids
 
-        return {self.outputs[0]: primary_keys}
-
-    def _load_data(self, data: Mapping[UUID, tuple], connection: 'Connection', etl_step_id: UUID):
+    def _load_data(
+        self, data: Mapping[UUID, Sequence[Any]], connection: 'Connection', etl_step_id: UUID
+    ) -> LoadResult:
         """Run the Load statement for the given namespace rows.
 
         Args:
             namespace_rows (List[Dict[str, Any]]): A dictionary with the strings as hashes and the values as the local namespace dictionaries from PyBlocks, Queries, and Consts
         """
         self._logger.debug(f"Loading into {self.load_entity.name}")
-        load_data(
+        return load_data(
             data,
             connection,
             self.load_entity,
@@ -365,9 +447,40 @@ class Load(ComputationalNode[T]):
             self.insert,
             self.load_entity.hash,
             etl_step_id,
+            copy_format=self.copy_format,
+            load_strategy=self.load_strategy,
+            skip_unchanged=self.skip_unchanged,
+        )
+
+    def _prepare_load(self, connection: 'Connection', etl_step_id: UUID) -> StagedLoad:
+        """Prepare a staging table owned by this Load for loading within a larger transaction."""
+        # Loads into the same entity need separate staging tables when they are staged together
+        return prepare_load(
+            connection,
+            self.load_entity,
+            self.inputs.keys(),
+            self.insert,
+            self.hash,
+            etl_step_id,
+            copy_format=self.copy_format,
+            load_strategy=self.load_strategy,
+            skip_unchanged=self.skip_unchanged,
+        )
+
+    async def _async_prepare_load(self, connection: 'AsyncConnection', etl_step_id: UUID) -> StagedLoad:
+        return await async_prepare_load(
+            connection,
+            self.load_entity,
+            self.inputs.keys(),
+            self.insert,
+            self.hash,
+            etl_step_id,
+            copy_format=self.copy_format,
+            load_strategy=self.load_strategy,
+            skip_unchanged=self.skip_unchanged,
         )
 
-    async def _async_load(self, data, connection: 'AsyncConnection', etl_step_id: UUID) -> int:
+    async def _async_load(self, data, connection: 'AsyncConnection', etl_step_id: UUID) -> LoadResult:
         return await async_load_data(
             data,
             connection,
@@ -376,4 +489,7 @@ class Load(ComputationalNode[T]):
             self.insert,
             self.load_entity.hash,
             etl_step_id,
+            copy_format=self.copy_format,
+            load_strategy=self.load_strategy,
+            skip_unchanged=self.skip_unchanged,
         )
@@ -12,15 +12,18 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+from decimal import Decimal
 from typing import TYPE_CHECKING, Any, Dict
 from typing import Generator as GenType
-from typing import Optional, Type, TypeVar, Union, overload
+from typing import List, Mapping, Optional, Sequence, Tuple, Type, TypeVar, Union, overload
+from uuid import UUID
 
-from pydantic import Field
+from pydantic import Field, root_validator
 from sqlalchemy import text
 from sqlalchemy.dialects import postgresql
 from sqlmodel.sql.expression import Select, SelectOfScalar
 
+from dbgen.configuration import PartitionStrategy
 from dbgen.core.dependency import Dependency
 from dbgen.core.node.extract import Extract
 from dbgen.core.statement_parsing import _get_select_keys, get_statement_dependency
@@ -32,6 +35,23 @@ if TYPE_CHECKING:
 
 
 SCHEMA_DEFAULT = "public"
+INPUT_HASH_COLUMN = "__dbgen_input_hash__"
+# Wraps an extract query to compute each row's input hash in the database and
+# optionally anti-join the hashes against the repeats table
+INPUT_HASH_QUERY = """
+SELECT X.*, H.{hash_column}
+FROM ({query}) AS X
+CROSS JOIN LATERAL (
+  SELECT CAST(md5('{etl_step_id}' || CAST(row_to_json(X) AS TEXT)) AS UUID) AS {hash_column}
+) AS H
+"""
+REPEAT_FILTER_CLAUSE = """WHERE NOT EXISTS (
+  SELECT 1 FROM {repeats_table} AS R WHERE R.input_hash = H.{hash_column}
+)
+"""
+# Selects one of the disjoint slices of an extract query streamed concurrently by partitioned extraction
+PARTITION_QUERY = "SELECT * FROM ({query}) AS P WHERE {condition}"
+PARTITION_BOUNDS_QUERY = "SELECT min(P.{column}), max(P.{column}) FROM ({query}) AS P"
 
 T = TypeVar('T')
 
@@ -42,8 +62,19 @@ class BaseQuery(Extract[T]):
     query: str
     params: Dict[str, Any] = Field(default_factory=dict)
     dependency: Dependency = Field(default_factory=Dependency)
+    partitions: int = Field(1, ge=1)
+    partition_by: Optional[str] = None
+    partition_strategy: PartitionStrategy = PartitionStrategy.HASH
     _connection: 'SAConnection'
     _yield_per: Optional[int] = None
+    _repeat_filter: Optional[Tuple[UUID, bool]] = None
+    _hashexclude_ = {'partitions', 'partition_by', 'partition_strategy'}
+
+    @root_validator(skip_on_failure=True)
+    def check_partitioning(cls, values):
+        if values['partition_strategy'] == PartitionStrategy.RANGE and values['partition_by'] is None:
+            raise ValueError('Range partitioning needs a partition_by column to split the key range of')
+        return values
 
     def _get_dependency(self) -> Dependency:
         return self.dependency
@@ -70,15 +101,109 @@ class BaseQuery(Extract[T]):
 
     def render_query(self) -> str:
         """Stringifies the query with the bound parameters."""
-        compiled_query = (
-            text(self.query).bindparams(**self.params).compile(compile_kwargs={'literal_binds': True})
-        )
+        return self._render(self.query)
+
+    def _render(self, query: str) -> str:
+        compiled_query = text(query).bindparams(**self.params).compile(compile_kwargs={'literal_binds': True})
         return str(compiled_query)
 
+    def partition(
+        self,
+        partitions: int,
+        partition_by: Optional[str] = None,
+        strategy: PartitionStrategy = PartitionStrategy.HASH,
+    ) -> 'BaseQuery[T]':
+        """Split the query into disjoint slices streamed concurrently over separate connections in async runs.
+
+        Hash partitioning takes the rows whose hashed partition_by column, or whole row when not set, falls
+        in each slice. Range partitioning splits the range between the minimum and maximum of a numeric
+        partition_by column evenly.
+        """
+        if partitions < 1:
+            raise ValueError(f'A query needs at least one partition, got {partitions}')
+        self.partitions = partitions
+        self.partition_by = partition_by
+        self.partition_strategy = PartitionStrategy(strategy)
+        if self.partition_strategy == PartitionStrategy.RANGE and partition_by is None:
+            raise ValueError('Range partitioning needs a partition_by column to split the key range of')
+        return self
+
+    def _partition_conditions(self, bounds: Optional[Sequence[Any]] = None) -> List[str]:
+        """Get a filter on the rows of each partition, range partitioning needs the bounds of the key."""
+        partitions = self.partitions
+        if partitions == 1:
+            return ['TRUE']
+        column = f'P.{quote_identifier(self.partition_by)}' if self.partition_by else None
+        if self.partition_strategy == PartitionStrategy.HASH:
+            key = f"coalesce(CAST({column} AS TEXT), '')" if column else 'CAST(row_to_json(P) AS TEXT)'
+            return [
+                f'mod(abs(CAST(hashtext({key}) AS BIGINT)), {partitions}) = {i}' for i in range(partitions)
+            ]
+        low, high = bounds if bounds is not None else (None, None)
+        if low is None:
+            # Every key is null, the first partition takes all the rows
+            return [f'{column} IS NULL'] + ['FALSE'] * (partitions - 1)
+        if not all(isinstance(bound, (int, float, Decimal)) for bound in (low, high)):
+            raise TypeError(
+                f'Range partitioning needs a numeric partition_by column, got bounds {low!r}, {high!r}'
+            )
+        step = (high - low) / partitions
+        edges = [low + step * i for i in range(1, partitions)]
+        return (
+            [f'({column} < {edges[0]} OR {column} IS NULL)']
+            + [f'{column} >= {lower} AND {column} < {upper}' for lower, upper in zip(edges, edges[1:])]
+            + [f'{column} >= {edges[-1]}']
+        )
+
+    async def _async_partition_queries(self, connection: 'AsyncConnection') -> List[str]:
+        """Compile the query of each partition, fetching the key bounds of range partitioned queries."""
+        if self.partitions == 1:
+            return [self.compiled_query]
+        bounds = None
+        if self.partition_strategy == PartitionStrategy.RANGE:
+            assert self.partition_by
+            bounds_query = PARTITION_BOUNDS_QUERY.format(
+                column=quote_identifier(self.partition_by), query=self._extract_query
+            )
+            result = await connection.execute(self._compile(bounds_query), self.params)
+            bounds = await result.fetchone()
+        return [
+            self._compile(PARTITION_QUERY.format(query=self._extract_query, condition=condition))
+            for condition in self._partition_conditions(bounds)
+        ]
+
     def set_connection(self, connection: 'SAConnection', yield_per: Optional[int] = None):
         self._connection = connection
         self._yield_per = yield_per
 
+    def set_repeat_filter(self, etl_step_id: Optional[UUID], filter_repeats: bool = True) -> None:
+        """Compute the input hash of each row in the database and optionally drop the repeated rows.
+
+        When set each extracted row carries its input hash in the INPUT_HASH_COLUMN column, which can
+        be split off with split_input_hash. Passing None restores the plain query.
+        """
+        self._repeat_filter = (etl_step_id, filter_repeats) if etl_step_id is not None else None
+
+    @property
+    def hashes_inputs(self) -> bool:
+        return self._repeat_filter is not None
+
+    @property
+    def _extract_query(self) -> str:
+        if self._repeat_filter is None:
+            return self.query
+        from dbgen.core.metadata import Repeats
+
+        etl_step_id, filter_repeats = self._repeat_filter
+        query = INPUT_HASH_QUERY.format(
+            query=self.query, etl_step_id=etl_step_id, hash_column=INPUT_HASH_COLUMN
+        )
+        if filter_repeats:
+            query += REPEAT_FILTER_CLAUSE.format(
+                repeats_table=Repeats.__fulltablename__, hash_column=INPUT_HASH_COLUMN
+            )
+        return query
+
     def length(self) -> int:
         rows: int = self._connection.execute(text(self.count_statement)).scalar()  # type: ignore
         return rows
@@ -95,12 +220,18 @@ class BaseQuery(Extract[T]):
 
     @property
     def compiled_query(self):
-        return str(text(self.query).compile(dialect=postgresql_dialect))
+        return self._compile(self._extract_query)
+
+    @staticmethod
+    def _compile(query: str) -> str:
+        return str(text(query).compile(dialect=postgresql_dialect))
 
     @property
     def count_statement(self):
         return str(
-            text(f'select count(1) from ({self.render_query()}) as X').compile(dialect=postgresql_dialect)
+            text(f'select count(1) from ({self._render(self._extract_query)}) as X').compile(
+                dialect=postgresql_dialect
+            )
         )
 
     def extract(
@@ -108,16 +239,27 @@ class BaseQuery(Extract[T]):
     ) -> GenType[T, None, None]:
         if self._yield_per:
             result = self._connection.execution_options(stream_results=True).execute(
-                text(self.query).bindparams(**self.params)
+                text(self._extract_query).bindparams(**self.params)
             )
             while chunk := result.fetchmany(self._yield_per):
                 for row in chunk:
                     yield dict(row)  # type: ignore
         else:
-            result = self._connection.execute(text(self.query).bindparams(**self.params))
+            result = self._connection.execute(text(self._extract_query).bindparams(**self.params))
             yield from result.mappings()  # type: ignore
 
 
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def split_input_hash(row: Mapping[str, Any]) -> Tuple[UUID, Dict[str, Any]]:
+    """Separate the database computed input hash from a row extracted with a repeat filter."""
+    row = dict(row)
+    input_hash = row.pop(INPUT_HASH_COLUMN)
+    return (input_hash if isinstance(input_hash, UUID) else UUID(str(input_hash)), row)
+
+
 class ExternalQuery(BaseQuery[T]):
     connection: Connection
 
@@ -12,16 +12,17 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import logging
 from traceback import format_exc
-from typing import TYPE_CHECKING, Any, Callable, Dict, Mapping, Optional, TypeVar, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Optional, Sequence, TypeVar, Union
 
-from pydantic import Field, root_validator, validator
+from pydantic import Field, PrivateAttr, root_validator, validator
 
 from dbgen.configuration import config
 from dbgen.core.func import Environment, Func, func_from_callable
 from dbgen.core.node.computational_node import ComputationalNode
 from dbgen.exceptions import DBgenExternalError, DBgenPythonTransformError, DBgenSkipException
-from dbgen.utils.log import capture_stdout
+from dbgen.utils.log import call_capturing_stdout
 
 if TYPE_CHECKING:
     from dbgen.core.run.utilities import RunConfig
@@ -39,6 +40,24 @@ class PythonTransform(Transform[Output]):
 
     env: Optional[Environment] = Field(default_factory=lambda: Environment(imports=set()))
     function: Func[Output]
+    capture_output: bool = False
+    batched: bool = False
+    _args: List[str] = PrivateAttr(default_factory=list)
+    _kwargs: List[str] = PrivateAttr(default_factory=list)
+    _inject_settings: bool = PrivateAttr(False)
+    _stdout_logger: logging.Logger = PrivateAttr(None)
+    _hashexclude_ = {'capture_output', 'batched'}
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Resolve how inputs map onto the function's arguments once, instead of on every row
+        self._args = [key for key in self.inputs if key.isdigit()]
+        self._kwargs = [key for key in self.inputs if not key.isdigit()]
+        argnames = self.function.argnames
+        if 'settings' in argnames:
+            setting_index = argnames.index('settings')
+            self._inject_settings = 'settings' not in self._kwargs or len(self._args) < setting_index + 1
+        self._stdout_logger = logging.getLogger(f"dbgen.pyblock.{self.function.name}")
 
     @validator('function', pre=True)
     def convert_callable_to_func(cls, function: Union[Func[Output], Callable[..., Output]], values):
@@ -76,31 +95,66 @@ class PythonTransform(Transform[Output]):
         self, namespace_dict: Dict[str, Mapping[str, Any]], run_config: Optional['RunConfig'] = None
     ) -> Dict[str, Any]:
         inputvars = self._get_inputs(namespace_dict)
-        args = {key: val for key, val in inputvars.items() if key.isdigit()}
-        kwargs = {key: val for key, val in inputvars.items() if key not in args}
+        args = [inputvars[key] for key in self._args]
+        kwargs = {key: inputvars[key] for key in self._kwargs}
+        if self.batched:
+            columns = self.apply_batch(
+                [[arg] for arg in args], {key: [val] for key, val in kwargs.items()}, 1, run_config
+            )
+            return {output: column[0] for output, column in zip(self.outputs, columns)}
+        return dict(zip(self.outputs, self.apply(args, kwargs, run_config)))
+
+    def apply_batch(
+        self,
+        args: List[List[Any]],
+        kwargs: Dict[str, List[Any]],
+        rows: int,
+        run_config: Optional['RunConfig'] = None,
+    ) -> List[List[Any]]:
+        """Call a batched function on a column of values per input, returning a column per output.
+
+        Batched functions return a sequence of values for a single output and a tuple of sequences for
+        several outputs. NumPy arrays are converted to lists of python values.
+        """
+        columns = []
+        for output, column in zip(self.outputs, self.apply(args, kwargs, run_config)):
+            column = column.tolist() if hasattr(column, 'tolist') else list(column)
+            if len(column) != rows:
+                raise DBgenPythonTransformError(
+                    f"Batched function {self.function.name!r} returned {len(column)} values "
+                    f"for output {output!r} of a batch of {rows} rows"
+                )
+            columns.append(column)
+        return columns
 
-        if 'settings' in self.function.argnames and run_config:
-            setting_index = self.function.argnames.index('settings')
-            if 'settings' not in kwargs or len(args) < setting_index + 1:
-                kwargs['settings'] = run_config.settings
+    def apply(
+        self, args: List[Any], kwargs: Dict[str, Any], run_config: Optional['RunConfig'] = None
+    ) -> Sequence[Any]:
+        """Call the function on resolved positional and keyword inputs, returning the output values."""
+        if self._inject_settings and run_config:
+            kwargs['settings'] = run_config.settings
 
         try:
-            wrapped = capture_stdout(self.function) if not config.pdb else self.function
-            output = wrapped(*args.values(), **kwargs)
-            if isinstance(output, tuple):
+            # Printed output is only captured when it would be logged, or the transform asks for it
+            if not config.pdb and (self.capture_output or self._stdout_logger.isEnabledFor(logging.DEBUG)):
+                output = call_capturing_stdout(self._stdout_logger, self.function, *args, **kwargs)
+            else:
+                output = self.function(*args, **kwargs)
+            # A batched function with one output returns its column, which may itself be a tuple
+            if isinstance(output, tuple) and not (self.batched and len(self.outputs) == 1):
                 l1, l2 = len(output), len(self.outputs)
                 assert l1 == l2, "Expected %d outputs from %s, got %d" % (
                     l2,
                     self.function.name,
                     l1,
                 )
-                return {o: val for val, o in zip(output, self.outputs)}
+                return output
             else:
                 if len(self.outputs) != 1:
                     raise DBgenPythonTransformError(
                         f"Function returned a non-tuple but outputs is greater length 1: {self.outputs}"
                     )
-                return {list(self.outputs)[0]: output}
+                return (output,)
         except (DBgenSkipException, DBgenPythonTransformError):
             raise
         except Exception:
@@ -0,0 +1,175 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Flat execution plans for transforming the extracted rows of an ETLStep."""
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from dbgen.core.args import Arg, Constant
+from dbgen.core.node.load import Load
+from dbgen.core.node.transforms import PythonTransform
+from dbgen.utils.typing import ROWS_TO_LOAD_TYPE
+
+if TYPE_CHECKING:
+    from dbgen.core.etl_step import ETLStep  # pragma: no cover
+    from dbgen.core.run.utilities import RunConfig  # pragma: no cover
+
+# (transform, positional input slots, keyword input slots, output slots)
+TransformStep = Tuple[PythonTransform, List[int], List[Tuple[str, int]], List[int]]
+# (load, input slots in column order, primary key slot, output slot)
+LoadStep = Tuple[Load, List[Tuple[str, int]], Optional[int], int]
+
+
+class ETLStepPlan:
+    """
+    A flat execution plan for the transforms and loads of an ETLStep.
+
+    Every node output and constant input is given a slot in a list of values, so running a row reads each
+    input by index instead of looking it up in a namespace of nested dictionaries. The nodes run in the
+    sorted order of the ETLStep and write their outputs to their slots. Batched transforms are called once
+    with a column of input values per slot over the rows of a batch, and each load hashes the ids of the
+    rows of a batch at once.
+    """
+
+    __slots__ = ('extract_key', 'extract_slots', 'template', 'transforms', 'loads')
+
+    def __init__(
+        self,
+        extract_key: str,
+        extract_slots: List[Tuple[str, int]],
+        template: List[Any],
+        transforms: List[TransformStep],
+        loads: List[LoadStep],
+    ) -> None:
+        self.extract_key = extract_key
+        self.extract_slots = extract_slots
+        self.template = template
+        self.transforms = transforms
+        self.loads = loads
+
+    @classmethod
+    def compile(cls, etl_step: 'ETLStep') -> Optional['ETLStepPlan']:
+        """Compile the plan of an ETLStep, or return None if it has a node or input the plan cannot run."""
+        extract_key = etl_step.extract.hash
+        template: List[Any] = []
+        slots: Dict[Tuple[str, str], int] = {}
+
+        extract_slots: Dict[str, int] = {}
+
+        def new_slot(value: Any = None) -> int:
+            template.append(value)
+            return len(template) - 1
+
+        def add_outputs(node: Union[PythonTransform, Load]) -> List[int]:
+            # Outputs get their slots once their node is planned, so only earlier nodes can be read from
+            return [slots.setdefault((node.hash, name), new_slot()) for name in node.outputs]
+
+        def get_slot(arg: Union[Arg, Constant]) -> Optional[int]:
+            # Inputs that cannot be read from a slot leave the ETLStep to the namespace based transform
+            if isinstance(arg, Constant):
+                return new_slot(arg.val)
+            if not isinstance(arg, Arg):
+                return None
+            if arg.key == extract_key:
+                if arg.name not in extract_slots:
+                    extract_slots[arg.name] = new_slot()
+                return extract_slots[arg.name]
+            return slots.get((arg.key, arg.name))
+
+        transforms: List[TransformStep] = []
+        for transform in etl_step.transforms:
+            if not isinstance(transform, PythonTransform):
+                return None
+            input_slots = {key: get_slot(arg) for key, arg in transform.inputs.items()}
+            if None in input_slots.values():
+                return None
+            transforms.append(
+                (
+                    transform,
+                    [input_slots[key] for key in transform._args],  # type: ignore
+                    [(key, input_slots[key]) for key in transform._kwargs],  # type: ignore
+                    add_outputs(transform),
+                )
+            )
+        loads: List[LoadStep] = []
+        for load in etl_step.loads:
+            input_slots = {key: get_slot(load.inputs[key]) for key in sorted(load.inputs)}
+            primary_key_slot = get_slot(load.primary_key) if load.primary_key is not None else None
+            if None in input_slots.values() or (load.primary_key is not None and primary_key_slot is None):
+                return None
+            loads.append(
+                (
+                    load,
+                    list(input_slots.items()),  # type: ignore
+                    primary_key_slot,
+                    add_outputs(load)[0],
+                )
+            )
+        return cls(extract_key, list(extract_slots.items()), template, transforms, loads)
+
+    def start(self, namespace: Mapping[str, Mapping[str, Any]]) -> List[Any]:
+        """Get the slot values of an extracted row before any transforms have run."""
+        values = self.template.copy()
+        try:
+            extracted = namespace[self.extract_key]
+            for name, index in self.extract_slots:
+                values[index] = extracted[name]
+        except KeyError:
+            # Raise the missing info error of the namespace lookup
+            for name, _ in self.extract_slots:
+                Arg(key=self.extract_key, name=name).arg_get(namespace)  # type: ignore
+            raise
+        return values
+
+    @staticmethod
+    def run_transform(step: TransformStep, rows: List[List[Any]], run_config: 'RunConfig') -> None:
+        """Run a transform on the slot values of rows, batched transforms take all the rows in one call."""
+        transform, arg_slots, kwarg_slots, output_slots = step
+        if transform.batched:
+            columns = transform.apply_batch(
+                [[values[index] for values in rows] for index in arg_slots],
+                {key: [values[index] for values in rows] for key, index in kwarg_slots},
+                len(rows),
+                run_config,
+            )
+            for index, column in zip(output_slots, columns):
+                for values, value in zip(rows, column):
+                    values[index] = value
+            return
+        for values in rows:
+            outputs: Sequence[Any] = transform.apply(
+                [values[index] for index in arg_slots],
+                {key: values[index] for key, index in kwarg_slots},
+                run_config,
+            )
+            for index, value in zip(output_slots, outputs):
+                values[index] = value
+
+    @staticmethod
+    def assemble_load(step: LoadStep, rows: List[List[Any]]) -> None:
+        """Broadcast and validate the rows a load assembles from the slot values of transformed rows."""
+        load, input_slots, primary_key_slot, output_slot = step
+        for values in rows:
+            # The output slot holds the assembled rows until add_load replaces them with their ids
+            values[output_slot] = load.assemble_rows(
+                {key: values[index] for key, index in input_slots},
+                values[primary_key_slot] if primary_key_slot is not None else None,
+            )
+
+    @staticmethod
+    def add_load(step: LoadStep, rows: List[List[Any]], rows_to_load: ROWS_TO_LOAD_TYPE) -> None:
+        """Add the rows a load assembled to its buffer, hashing the ids of all the rows in one call."""
+        load, _, _, output_slot = step
+        ids = load.add_assembled_rows([values[output_slot] for values in rows], rows_to_load)
+        for values, primary_keys in zip(rows, ids):
+            values[output_slot] = primary_keys
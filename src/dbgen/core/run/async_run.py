@@ -14,33 +14,49 @@
 
 """Objects related to the running of Models and ETLSteps."""
 import asyncio
+import logging
 import multiprocessing
-from concurrent.futures import ProcessPoolExecutor
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from os import cpu_count
+from pathlib import Path
+from tempfile import TemporaryDirectory, mkstemp
+from threading import Thread
 from time import time
 from traceback import format_exc
-from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Union
+from typing import TYPE_CHECKING, Any, Coroutine, Deque, Dict, List, Optional, Set, Tuple, TypeVar, Union
 from uuid import UUID
 
 import psutil
 from psycopg import AsyncConnection
+from psycopg import connect as pg3_connect
 from psycopg.rows import dict_row
 from psycopg_pool import AsyncConnectionPool
-from pydasher import hasher
+from pydantic import PrivateAttr
 from sqlalchemy.future import Engine
 from sqlmodel import Session
 
-from dbgen.core.base import encoders
+from dbgen.configuration import DBgenConfiguration, LogLevel, config
 from dbgen.core.dashboard import BarNames, Dashboard
 from dbgen.core.etl_step import ETLStep
 from dbgen.core.metadata import ETLStepRunEntity, Repeats, RunEntity, Status
 from dbgen.core.node.extract import Extract
-from dbgen.core.node.query import BaseQuery
-from dbgen.core.run.utilities import BaseETLStepExecutor
+from dbgen.core.node.query import BaseQuery, split_input_hash
+from dbgen.core.run.utilities import BaseETLStepExecutor, count_loaded_rows, same_database
 from dbgen.exceptions import DBgenExternalError, TransformerError
+from dbgen.utils.hashing import hash_inputs
 from dbgen.utils.log import setup_logger
+from dbgen.utils.postgresql_load import async_copy_data, async_merge_data, async_prepare_load
 from dbgen.utils.typing import NAMESPACE_TYPE, ROWS_TO_LOAD_TYPE
 
+# The number of batches each queue between the extractor, transformers and loader can hold per consumer
+QUEUED_BATCHES = 2
+# The number of deserialized ETLSteps each worker process keeps around
+WORKER_CACHE_SIZE = 64
+
 if TYPE_CHECKING:
     from asyncio.events import AbstractEventLoop
 
@@ -48,6 +64,159 @@ if TYPE_CHECKING:
 TRANSFORM_RETURN_TYPE = Union[
     Tuple[None, None, None, int, str], Tuple[list, Dict[str, Dict[UUID, dict]], int, int, None]
 ]
+T = TypeVar('T')
+
+# ETLSteps unpickled by this worker process keyed by their uuid
+_worker_etl_steps: Dict[UUID, ETLStep] = {}
+# The directory of the ETLStepRegistry the worker process loads ETLSteps from
+_worker_registry: Optional[str] = None
+
+
+class ETLStepRegistry:
+    """
+    A directory of pickled ETLSteps keyed by uuid that primes the worker processes.
+
+    Each ETLStep is pickled once when it is registered, the workers load it the first time they
+    transform one of its batches so only the batches need to be sent with each task.
+    """
+
+    def __init__(self) -> None:
+        self._directory = TemporaryDirectory(prefix='dbgen-etl-steps-')
+        self.directory = self._directory.name
+
+    @staticmethod
+    def path(directory: str, etl_step_id: UUID) -> Path:
+        return Path(directory) / f'{etl_step_id.hex}.pickle'
+
+    def register(self, etl_step: ETLStep) -> None:
+        path = self.path(self.directory, etl_step.uuid)
+        # The uuid hashes the ETLStep's definition so a registered ETLStep never goes stale
+        if path.exists():
+            return
+        # Remove the stored functions on the etl_step for pickling
+        etl_step.remove_stored_func()
+        handle, temp_path = mkstemp(dir=self.directory)
+        with os.fdopen(handle, 'wb') as temp_file:
+            pickle.dump(etl_step, temp_file)
+        # Workers only ever see a fully written file
+        os.replace(temp_path, path)
+
+    def cleanup(self) -> None:
+        self._directory.cleanup()
+
+
+def _initialize_worker(log_level: LogLevel, registry: str, parent_config: DBgenConfiguration) -> None:
+    global _worker_registry
+    setup_logger(log_level, log_level)
+    # Spawned workers reload the config from the environment, so settings passed on the CLI are forwarded
+    config.update(parent_config, set_defaults=True)
+    _worker_registry = registry
+
+
+def _get_worker_etl_step(etl_step_id: UUID) -> ETLStep:
+    """Get a registered ETLStep, only unpickling it the first time its uuid is seen by this worker."""
+    etl_step = _worker_etl_steps.get(etl_step_id)
+    if etl_step is None:
+        assert _worker_registry is not None, 'Worker process was not initialized with an ETLStepRegistry'
+        with open(ETLStepRegistry.path(_worker_registry, etl_step_id), 'rb') as registered:
+            etl_step = pickle.load(registered)
+        if len(_worker_etl_steps) >= WORKER_CACHE_SIZE:
+            del _worker_etl_steps[next(iter(_worker_etl_steps))]
+        _worker_etl_steps[etl_step_id] = etl_step
+    return etl_step
+
+
+def _transform_in_worker(
+    etl_step_id: UUID, batch: list, run_config: Any, raw_batch: bool = False
+) -> TRANSFORM_RETURN_TYPE:
+    etl_step = _get_worker_etl_step(etl_step_id)
+    if raw_batch:
+        return etl_step.transform_raw_batch(batch, run_config)
+    return etl_step.transform_batch(batch, run_config)
+
+
+class AsyncRunResources:
+    """
+    The event loop, worker processes and connection pools used to run async ETLSteps.
+
+    A ModelRun creates one for the whole run so the worker processes are only spawned once and keep
+    their imports and cached ETLSteps between ETLSteps. The event loop runs in a background thread so
+    ETLSteps running concurrently in separate threads can share it. Must be closed once the run is finished.
+    """
+
+    def __init__(
+        self,
+        main_dsn: str,
+        meta_dsn: str,
+        log_level: LogLevel = LogLevel.INFO,
+        workers: Optional[int] = None,
+        concurrency: int = 1,
+    ) -> None:
+        self.workers = workers or cpu_count() or 1
+        self._log_level = log_level
+        self.registry = ETLStepRegistry()
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = Thread(target=self.loop.run_forever, name='dbgen-event-loop', daemon=True)
+        self._loop_thread.start()
+        self.executor = self._new_executor()
+        try:
+            self.conn_pool, self.meta_conn_pool = self.run(self._open_pools(main_dsn, meta_dsn, concurrency))
+        except BaseException:
+            self._shutdown()
+            raise
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_worker,
+            initargs=(self._log_level, self.registry.directory, config.copy()),
+        )
+
+    @staticmethod
+    async def _open_pools(
+        main_dsn: str, meta_dsn: str, concurrency: int
+    ) -> Tuple[AsyncConnectionPool, AsyncConnectionPool]:
+        # The pools are bound to the running loop so they have to be created within it
+        conn_pool = AsyncConnectionPool(main_dsn, name='dbgen-main', min_size=4, max_size=4 * concurrency)
+        meta_conn_pool = AsyncConnectionPool(
+            meta_dsn, name='dbgen-meta', min_size=4, max_size=4 * concurrency
+        )
+        await conn_pool.check()
+        return conn_pool, meta_conn_pool
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """Get the worker pool, replacing it if a worker process died during a previous ETLStep."""
+        if getattr(self.executor, '_broken', False):
+            self.executor.shutdown(wait=False)
+            self.executor = self._new_executor()
+        return self.executor
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the shared event loop and wait for its result, safe to call from any thread."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def _shutdown(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._loop_thread.join()
+        self.executor.shutdown(wait=True)
+        self.loop.close()
+        self.registry.cleanup()
+
+    def close(self) -> None:
+        try:
+            self.run(self.conn_pool.close())
+            self.run(self.meta_conn_pool.close())
+            self.run(self.loop.shutdown_asyncgens())
+        finally:
+            self._shutdown()
+
+    def __enter__(self) -> 'AsyncRunResources':
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
 
 # TODO Add data to the Async Run object to minimize data passing around1
 # TODO Refactor the methods to reduce verbosity and increase clarity
@@ -55,6 +224,9 @@ TRANSFORM_RETURN_TYPE = Union[
 # TODO make return types clearer (dataclas?) to reduce verbosity
 # TODO update gen_run during the run
 class AsyncETLStepExecutor(BaseETLStepExecutor):
+    # Shared by the ETLSteps of a ModelRun, otherwise created and closed by each execute
+    _resources: Optional[AsyncRunResources] = PrivateAttr(None)
+
     def execute(
         self,
         main_engine: Engine,
@@ -66,24 +238,41 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
     ):
         start = time()
         batch_size = self.run_config.batch_size or self.etl_step.batch_size or 1000
-        (
-            inputs_extracted,
-            unique_inputs,
-            inputs_processed,
-            inputs_skipped,
-            rows_inserted,
-            rows_updated,
-            memory_usage,
-            exc,
-        ) = asyncio.run(
-            self.main(
-                self.etl_step,
-                main_dsn=str(main_engine.url),
-                meta_dsn=str(meta_engine.url),
-                batch_size=batch_size,
-                dashboard=dashboard,
-            )
+        repeats_in_db = self._set_repeat_filter(self.etl_step.extract, main_engine, meta_engine)
+        # Repeats filtered out by the database don't need to be fetched
+        if not repeats_in_db:
+            self._logger.debug('Fetching repeats')
+            with pg3_connect(str(meta_engine.url)) as meta_raw_connection:
+                self._fetch_repeats(meta_raw_connection)
+        resources = self._resources or AsyncRunResources(
+            str(main_engine.url), str(meta_engine.url), self.run_config.log_level
         )
+        try:
+            (
+                inputs_extracted,
+                unique_inputs,
+                inputs_processed,
+                inputs_skipped,
+                rows_inserted,
+                rows_updated,
+                rows_unchanged,
+                memory_usage,
+                exc,
+            ) = resources.run(
+                self.main(
+                    self.etl_step,
+                    main_dsn=str(main_engine.url),
+                    resources=resources,
+                    batch_size=batch_size,
+                    dashboard=dashboard,
+                    repeats_in_transaction=(
+                        self.run_config.single_transaction and same_database(main_engine, meta_engine)
+                    ),
+                )
+            )
+        finally:
+            if resources is not self._resources:
+                resources.close()
         if exc:
             etl_step_run.status = Status.failed
             etl_step_run.error = str(exc)
@@ -104,13 +293,15 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
         etl_step_run.inputs_processed = inputs_processed
         etl_step_run.rows_updated = rows_updated
         etl_step_run.rows_inserted = rows_inserted
+        etl_step_run.rows_unchanged = rows_unchanged
         etl_step_run.memory_usage = memory_usage
         etl_step_run.runtime = round(time() - start, 3)
         self._logger.info(
             f"Finished running etl_step {self.etl_step.name}({self.etl_step.uuid}) in {etl_step_run.runtime}(s)."
         )
-        self._logger.info(f"Inserted approximately {etl_step_run.rows_inserted} rows")
-        self._logger.info(f"Updated approximately {etl_step_run.rows_updated} rows")
+        self._logger.info(f"Inserted {etl_step_run.rows_inserted} rows")
+        self._logger.info(f"Updated {etl_step_run.rows_updated} rows")
+        self._logger.info(f"Left {etl_step_run.rows_unchanged} unchanged rows untouched")
         meta_session.commit()
         meta_session.close()
         return
@@ -119,88 +310,99 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
         self,
         etl_step: ETLStep,
         main_dsn: str,
-        meta_dsn: str,
+        resources: AsyncRunResources,
         batch_size: int,
         dashboard: Optional[Dashboard],
+        repeats_in_transaction: bool = False,
     ):
-        # Initialize multiprocessing start method
-        conn_pool = AsyncConnectionPool(main_dsn, name='test', min_size=4)
-        meta_conn_pool = AsyncConnectionPool(meta_dsn, name='test', min_size=4)
-
-        await conn_pool.check()
+        conn_pool, meta_conn_pool = resources.conn_pool, resources.meta_conn_pool
         loop = asyncio.get_running_loop()
-        # Remove the stored functions on the etl_step for pickling
-        etl_step.remove_stored_func()
-        # Initialize the queues and type them
-        transform_queue: asyncio.Queue[Tuple[Optional[UUID], Optional[NAMESPACE_TYPE]]] = asyncio.Queue()
-        tform_results: asyncio.Queue[asyncio.Future[TRANSFORM_RETURN_TYPE]] = asyncio.Queue()
-        load_queue: asyncio.Queue[Tuple[List[UUID], ROWS_TO_LOAD_TYPE, int]] = asyncio.Queue()
+        executor = resources.get_executor()
+        workers = resources.workers
+        resources.registry.register(etl_step)
+        # Initialize the queues and type them, bounding them applies backpressure to the extractor
+        transform_queue: asyncio.Queue[Optional[List[Tuple[UUID, NAMESPACE_TYPE]]]] = asyncio.Queue(
+            maxsize=QUEUED_BATCHES
+        )
+        tform_results: asyncio.Queue[asyncio.Future[TRANSFORM_RETURN_TYPE]] = asyncio.Queue(maxsize=workers)
+        load_queue: asyncio.Queue[Tuple[List[UUID], ROWS_TO_LOAD_TYPE, int]] = asyncio.Queue(
+            maxsize=QUEUED_BATCHES * workers
+        )
         repeats_queue: asyncio.Queue[Set[UUID]] = asyncio.Queue()
+        # Cleared by the memory monitor while the run is over its memory limit
+        memory_available = asyncio.Event()
+        memory_available.set()
+        # Input hashes computed by the database don't need to be hashed again
+        extract = etl_step.extract
+        hash_in_workers = self.run_config.hash_in_workers and not (
+            isinstance(extract, BaseQuery) and extract.hashes_inputs
+        )
 
-        rows_inserted, rows_loaded = 0, 0
+        rows_inserted, rows_loaded, rows_unchanged = 0, 0, 0
         max_memory = None
         if dashboard:
             dashboard.add_etl_progress_bars(run_async=True)
+        tasks: List[asyncio.Task] = []
+        mem_usage = asyncio.create_task(
+            self.memory_usage(executor, memory_available, memory_limit=self.run_config.memory_limit)
+        )
         try:
-            context = multiprocessing.get_context("spawn")
-            with ProcessPoolExecutor(
-                cpu_count(),
-                mp_context=context,
-                initializer=setup_logger,  # type: ignore
-                initargs=(self.run_config.log_level, self.run_config.log_level),
-            ) as executor:
-                mem_usage = asyncio.create_task(self.memory_usage(executor))
-                routines = (
-                    self.extractor(
-                        etl_step.extract,
-                        transform_queue,
-                        load_queue,
-                        main_dsn,
-                        batch_size=batch_size,
-                        dashboard=dashboard,
-                        etl_step_id=etl_step.uuid,
-                        retry=self.run_config.retry,
-                    ),
-                    self.transformer(
-                        etl_step,
-                        transform_queue,
-                        tform_results,
-                        loop,
-                        batch_size=batch_size,
-                        dashboard=dashboard,
-                        executor=executor,
-                    ),
-                    self.transformer_results(
-                        tform_results,
-                        load_queue,
-                        dashboard=dashboard,
-                    ),
-                    self.loader(etl_step, load_queue, repeats_queue, conn_pool, dashboard=dashboard),
-                    self.repeat_loader(repeats_queue, meta_conn_pool, etl_step.uuid),
-                    self.set_length(etl_step.extract, dashboard, conn_pool),
-                )
-                tasks = map(asyncio.create_task, routines)
-                results = await asyncio.gather(*tasks)
-                self._logger.debug('Gathered tasks returned')
-                self._logger.debug('Shutting down the executor...')
-                mem_usage.cancel()
-                max_memory = await mem_usage
-            self._logger.debug('Executor shutdown')
+            routines = (
+                self.extractor(
+                    etl_step.extract,
+                    transform_queue,
+                    load_queue,
+                    main_dsn,
+                    batch_size=batch_size,
+                    dashboard=dashboard,
+                    etl_step_id=etl_step.uuid,
+                    retry=self.run_config.retry,
+                    memory_available=memory_available,
+                    hash_executor=executor if hash_in_workers else None,
+                ),
+                self.transformer(
+                    etl_step,
+                    transform_queue,
+                    tform_results,
+                    loop,
+                    dashboard=dashboard,
+                    executor=executor,
+                    raw_batches=hash_in_workers,
+                ),
+                self.transformer_results(
+                    tform_results,
+                    load_queue,
+                    dashboard=dashboard,
+                ),
+                self.loader(
+                    etl_step,
+                    load_queue,
+                    repeats_queue,
+                    conn_pool,
+                    dashboard=dashboard,
+                    repeats_in_transaction=repeats_in_transaction,
+                ),
+                self.repeat_loader(repeats_queue, meta_conn_pool, etl_step.uuid),
+                self.set_length(etl_step.extract, dashboard, conn_pool),
+            )
+            tasks = list(map(asyncio.create_task, routines))
+            results = await asyncio.gather(*tasks)
+            self._logger.debug('Gathered tasks returned')
+            mem_usage.cancel()
+            max_memory = await mem_usage
         except (Exception, DBgenExternalError) as exc:
             self._logger.error('Uncaught exception found!')
             self._logger.exception(exc, exc_info=exc)
             self._logger.debug('Shutting down tasks')
-            for task in tasks:
+            for task in (*tasks, mem_usage):
                 task.cancel()
-            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.gather(*tasks, mem_usage, return_exceptions=True)
             self._logger.debug('All tasks successfully shutdown')
-            return None, None, None, None, None, None, None, format_exc(chain=False)
-        finally:
-            await conn_pool.close()
+            return None, None, None, None, None, None, None, None, format_exc(chain=False)
 
         inputs_extracted, unique_inputs, inputs_processed = results[0]
         inputs_skipped = results[2]
-        rows_inserted, rows_loaded = results[3]
+        rows_inserted, rows_loaded, rows_unchanged = results[3]
         return (
             inputs_extracted,
             unique_inputs,
@@ -208,6 +410,7 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
             inputs_skipped,
             rows_inserted,
             rows_loaded,
+            rows_unchanged,
             max_memory,
             None,
         )
@@ -215,105 +418,171 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
     async def extractor(
         self,
         extract: Extract,
-        queue: 'asyncio.Queue[Tuple[Optional[UUID], Optional[NAMESPACE_TYPE]]]',
+        queue: 'asyncio.Queue[Optional[List[Tuple[UUID, NAMESPACE_TYPE]]]]',
         load_queue: 'asyncio.Queue',
         async_dsn: str,
         batch_size,
         dashboard: Optional[Dashboard],
         etl_step_id: UUID,
         retry: bool,
+        memory_available: Optional[asyncio.Event] = None,
+        hash_executor: Optional[ProcessPoolExecutor] = None,
     ) -> Tuple[int, int, int]:
-        """Take a query and param and stream the outputs to the queue."""
+        """Take a query and param and stream batches of the outputs to the queue.
+
+        If a hash_executor is given the rows are hashed in its worker processes and queued unprocessed.
+        Partitioned queries stream each partition over its own connection concurrently.
+        """
         logger = self._logger.getChild('extractor')
         unique_inputs, inputs_extracted, inputs_processed = 0, 0, 0
-        with extract:
+        loop = asyncio.get_running_loop()
+        # Batches hashing in the hash_executor, oldest first, so every worker process can hash a batch at once
+        hashing: Deque[Tuple['asyncio.Future[List[UUID]]', List[Any]]] = deque()
+        # Hashing and processing rows happens in a thread to keep the event loop free for the loaders
+        with extract, ThreadPoolExecutor(1, thread_name_prefix='dbgen-extract') as thread:
+
+            async def put_batch(rows: List[Any]) -> None:
+                nonlocal inputs_extracted
+                if memory_available is not None and not memory_available.is_set():
+                    await self._wait_for_memory(memory_available, queue, load_queue)
+                inputs_extracted += len(rows)
+                if dashboard:
+                    dashboard.advance_bar(BarNames.EXTRACTED, advance=len(rows))
+                if hash_executor is not None:
+                    future = loop.run_in_executor(
+                        hash_executor, hash_inputs, etl_step_id, rows, config.hashing
+                    )
+                    hashing.append((future, rows))
+                    if len(hashing) >= hash_executor._max_workers:
+                        await put_hashed_batch()
+                    return
+                batch, unique = await loop.run_in_executor(
+                    thread, self._prepare_batch, extract, rows, etl_step_id, retry
+                )
+                await queue_batch(batch, unique)
+
+            async def put_hashed_batch() -> None:
+                future, rows = hashing.popleft()
+                batch, unique = self._filter_repeats(await future, rows, retry)
+                await queue_batch(batch, unique)
+
+            async def queue_batch(batch: List[Tuple[UUID, Any]], unique: int) -> None:
+                nonlocal unique_inputs, inputs_processed
+                unique_inputs += unique
+                inputs_processed += len(batch)
+                if batch:
+                    await queue.put(batch)
+
             if not isinstance(extract, BaseQuery):
-                for i, row in enumerate(extract.extract()):
-                    if dashboard:
-                        dashboard.advance_bar(BarNames.EXTRACTED, advance=1)
-                    is_repeat, input_hash = self._check_repeat(row, etl_step_id)
-                    # increment unique inputs and extracted inputs
-                    inputs_extracted += 1
-                    unique_inputs += 1 if not is_repeat else 0
-                    if not is_repeat or retry:
-                        await queue.put((input_hash, {extract.hash: extract.process_row(row)}))
-                        inputs_processed += 1
-                    else:
-                        continue
-                    if i % batch_size == 0:
-                        await asyncio.sleep(0.05)
-                await queue.put((None, None))
+                rows_iter = iter(extract.extract())
+                while rows := await loop.run_in_executor(thread, list, islice(rows_iter, batch_size)):
+                    await put_batch(rows)
                 # Start the bars with the fully extracted total
                 if dashboard:
-                    dashboard.set_total(i)
+                    dashboard.set_total(inputs_extracted)
             else:
-                async with await AsyncConnection.connect(async_dsn) as conn:
+
+                async def stream_partition(conn: AsyncConnection, query: str) -> None:
                     async with conn.cursor(row_factory=dict_row) as cursor:
-                        result = await cursor.execute(extract.compiled_query, extract.params)
-                        i = 0
-                        async for row in result:
-                            logged = False
-                            while (queue.qsize() / batch_size) < (load_queue.qsize() - 100):
-                                if not logged:
-                                    self._logger.info('Waiting for loader to catch up')
-                                    logged = True
-                                await asyncio.sleep(1)
-
-                            is_repeat, input_hash = self._check_repeat(row, etl_step_id)
-                            # increment unique inputs and extracted inputs
-                            inputs_extracted += 1
-                            unique_inputs += 1 if not is_repeat else 0
-                            if not is_repeat or retry:
-                                await queue.put((input_hash, {extract.hash: extract.process_row(row)}))
-                            else:
-                                continue
-                            if dashboard:
-                                dashboard.advance_bar(BarNames.EXTRACTED, advance=1)
-                            if i % batch_size == 0:
-                                await asyncio.sleep(0.05)
-                            i += 1
-
-                        await queue.put((None, None))
+                        await cursor.execute(query, extract.params)
+                        while rows := await cursor.fetchmany(batch_size):
+                            await put_batch(rows)
+
+                async def stream_partition_connection(query: str) -> None:
+                    async with await AsyncConnection.connect(async_dsn) as conn:
+                        await stream_partition(conn, query)
+
+                async with await AsyncConnection.connect(async_dsn) as conn:
+                    first_query, *other_queries = await extract._async_partition_queries(conn)
+                    if other_queries:
+                        logger.debug(f'Extracting {len(other_queries) + 1} partitions concurrently')
+                    await asyncio.gather(
+                        stream_partition(conn, first_query), *map(stream_partition_connection, other_queries)
+                    )
+            while hashing:
+                await put_hashed_batch()
+            await queue.put(None)
         logger.debug('Extraction Finished')
         return inputs_extracted, unique_inputs, inputs_processed
 
+    def _prepare_batch(
+        self, extract: Extract, rows: List[Any], etl_step_id: UUID, retry: bool
+    ) -> Tuple[List[Tuple[UUID, NAMESPACE_TYPE]], int]:
+        """Hash and process extracted rows, returning the rows to transform and the number of unique rows."""
+        hashes_inputs = isinstance(extract, BaseQuery) and extract.hashes_inputs
+        batch: List[Tuple[UUID, NAMESPACE_TYPE]] = []
+        unique_inputs = 0
+        for row in rows:
+            if hashes_inputs:
+                input_hash, row = split_input_hash(row)
+                is_repeat = self._is_repeat(input_hash)
+            else:
+                is_repeat, input_hash = self._check_repeat(row, etl_step_id)
+            unique_inputs += 1 if not is_repeat else 0
+            if not is_repeat or retry:
+                batch.append((input_hash, {extract.hash: extract.process_row(row)}))
+        return batch, unique_inputs
+
+    def _filter_repeats(
+        self, input_hashes: List[UUID], rows: List[Any], retry: bool
+    ) -> Tuple[List[Tuple[UUID, Any]], int]:
+        """Drop the repeats from a hashed batch, returning the remaining rows and the number of unique rows."""
+        batch: List[Tuple[UUID, Any]] = []
+        unique_inputs = 0
+        for input_hash, row in zip(input_hashes, rows):
+            is_repeat = self._is_repeat(input_hash)
+            unique_inputs += 1 if not is_repeat else 0
+            if not is_repeat or retry:
+                batch.append((input_hash, row))
+        return batch, unique_inputs
+
+    async def _wait_for_memory(self, memory_available: asyncio.Event, *queues: asyncio.Queue) -> None:
+        """Hold extraction while the run is over its memory limit unless the downstream queues are empty."""
+        self._logger.info('Memory limit reached, waiting for queued rows to be loaded')
+        while not memory_available.is_set() and not all(queue.empty() for queue in queues):
+            try:
+                await asyncio.wait_for(memory_available.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+
     async def transformer(
         self,
         etl_step: ETLStep,
         transform_queue: asyncio.Queue,
         transformed_queue: asyncio.Queue,
         loop: 'AbstractEventLoop',
-        batch_size: int,
         dashboard: Optional[Dashboard],
         executor,
+        raw_batches: bool = False,
     ):
-        batch = []
         logger = self._logger.getChild('transformer')
         pending_tasks: Set[asyncio.Future[TRANSFORM_RETURN_TYPE]] = set()
         while True:
-            # get row from producer queue
-            input_hash, record = await transform_queue.get()
-            # add to the batch
-            if record is not None:
-                batch.append((input_hash, record))
-            # if batch is right size launch the transform
-            if len(batch) >= batch_size or record is None:
-                # Run transform on the cpu_pool for parallelization
-                if len(pending_tasks) >= executor._max_workers:
-                    logger.debug('waiting for max workers')
-                    _, pending_tasks = await asyncio.wait(pending_tasks, return_when=asyncio.FIRST_COMPLETED)
-                task = loop.run_in_executor(executor, etl_step.transform_batch, batch, self.run_config)
-                pending_tasks.add(task)  # type: ignore
-                # add to currently running tasks
-                await transformed_queue.put(task)
-                logger.debug(f"Number of items in Transformed Queue: {transformed_queue.qsize()}")
-                if dashboard:
-                    dashboard.advance_bar(BarNames.LAUNCHED, advance=len(batch))
-                batch = []
+            # get a batch from the extractor
+            batch = await transform_queue.get()
             # if None is received from extract queue stop the loop
-            if record is None:
+            if batch is None:
                 await transformed_queue.put(None)
                 break
+            # Run transform on the cpu_pool for parallelization
+            if len(pending_tasks) >= executor._max_workers:
+                logger.debug('waiting for max workers')
+                _, pending_tasks = await asyncio.wait(pending_tasks, return_when=asyncio.FIRST_COMPLETED)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f'Sending {len(pickle.dumps((batch, self.run_config)))} pickled bytes for {len(batch)} rows'
+                )
+            # The workers are primed with the ETLStep by the registry so only the batch is sent
+            # Rows hashed in the worker processes still need to be processed by the extract
+            task = loop.run_in_executor(
+                executor, _transform_in_worker, etl_step.uuid, batch, self.run_config, raw_batches
+            )
+            pending_tasks.add(task)  # type: ignore
+            # add to currently running tasks
+            await transformed_queue.put(task)
+            logger.debug(f"Number of items in Transformed Queue: {transformed_queue.qsize()}")
+            if dashboard:
+                dashboard.advance_bar(BarNames.LAUNCHED, advance=len(batch))
         logger.debug('Launching Finished')
 
     async def transformer_results(
@@ -376,20 +645,14 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
         return inputs_skipped
 
     @staticmethod
-    async def merge_rows(current_rows, new_rows) -> dict:
+    async def merge_rows(current_rows: ROWS_TO_LOAD_TYPE, new_rows: ROWS_TO_LOAD_TYPE) -> ROWS_TO_LOAD_TYPE:
         for load_hash, rows in new_rows.items():
-            updated_rows = current_rows.get(load_hash, {})
-            updated_rows.update(rows)
-            current_rows[load_hash] = updated_rows
+            if load_hash in current_rows:
+                current_rows[load_hash].merge(rows)
+            else:
+                current_rows[load_hash] = rows
         return current_rows
 
-    def _check_repeat(self, extracted_dict, etl_step_uuid: UUID) -> Tuple[bool, UUID]:
-        # Convert Row to a dictionary so we can hash it for repeat-checking
-        input_hash = UUID(hasher((etl_step_uuid, extracted_dict), encoders=encoders))
-        # If the input_hash has been seen and we don't have retry=True skip row
-        is_repeat = input_hash in self._old_repeats or input_hash in self._new_repeats
-        return (is_repeat, input_hash)
-
     async def loader(
         self,
         etl_step: ETLStep,
@@ -397,9 +660,11 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
         repeat_queue: 'asyncio.Queue[Set[UUID]]',
         conn_pool: AsyncConnectionPool,
         dashboard: Optional[Dashboard],
+        repeats_in_transaction: bool = False,
     ):
         rows_inserted = 0
         rows_updated = 0
+        rows_unchanged = 0
         logger = self._logger.getChild('loader')
         while True:
             logger.debug('loader waiting for row')
@@ -418,24 +683,67 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
                 if load_queue.empty() or number_of_batches > 60:
                     logger.debug('queue is empty moving on')
                     break
+            repeats_loaded = False
             if rows_to_load:
                 async with conn_pool.connection() as connection:
-                    for load in etl_step.loads:
-                        rows = rows_to_load[load.hash]
-                        logger.debug(f'Loading into {load}')
-                        rows_modified = await load._async_load(rows, connection, etl_step.uuid)
-                        if load.insert:
-                            rows_inserted += rows_modified
-                        else:
-                            rows_updated += rows_modified
+                    if self.run_config.single_transaction:
+                        repeats = processed_hashes if repeats_in_transaction else None
+                        inserted, updated, unchanged = await self._async_load_in_transaction(
+                            etl_step, rows_to_load, connection, repeats
+                        )
+                        repeats_loaded = repeats_in_transaction
+                    else:
+                        results = []
+                        for load in etl_step.loads:
+                            logger.debug(f'Loading into {load}')
+                            results.append(
+                                await load._async_load(rows_to_load[load.hash], connection, etl_step.uuid)
+                            )
+                        inserted, updated, unchanged = count_loaded_rows(
+                            [len(rows_to_load[load.hash]) for load in etl_step.loads], results
+                        )
+                    rows_inserted += inserted
+                    rows_updated += updated
+                    rows_unchanged += unchanged
             if dashboard:
                 dashboard.advance_bar(BarNames.LOADED, advance=number_of_rows)
-            await repeat_queue.put(processed_hashes)
+            if not repeats_loaded:
+                await repeat_queue.put(processed_hashes)
             if record is None:
                 await repeat_queue.put(None)
                 break
         logger.debug('Loading Finished')
-        return rows_inserted, rows_updated
+        return rows_inserted, rows_updated, rows_unchanged
+
+    async def _async_load_in_transaction(
+        self,
+        etl_step: ETLStep,
+        rows_to_load: ROWS_TO_LOAD_TYPE,
+        connection: AsyncConnection,
+        repeats: Optional[Set[UUID]] = None,
+    ) -> Tuple[int, int, int]:
+        """Load merged batches into every Load, and optionally their repeats, in a single transaction."""
+        # Prepare every staging table first as creating one commits
+        staged_loads = [await load._async_prepare_load(connection, etl_step.uuid) for load in etl_step.loads]
+        data = [rows_to_load[load.hash] for load in etl_step.loads]
+        if repeats is not None:
+            staged_loads.append(
+                await async_prepare_load(connection, Repeats._get_load_entity(), ['etl_step_id'], insert=True)
+            )
+            data.append(
+                {
+                    input_hash: (etl_step.uuid,)
+                    for input_hash in repeats
+                    if input_hash not in self._old_repeats
+                }
+            )
+        for staged_load, rows in zip(staged_loads, data):
+            await async_copy_data(connection, staged_load, rows)
+        results = await async_merge_data(connection, staged_loads)
+        await connection.commit()
+        if repeats is not None:
+            self._old_repeats.update(repeats)
+        return count_loaded_rows([len(rows_to_load[load.hash]) for load in etl_step.loads], results)
 
     async def repeat_loader(
         self, repeat_queue: 'asyncio.Queue[Set[UUID]]', conn_pool: AsyncConnectionPool, etl_step_id: UUID
@@ -465,10 +773,10 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
         repeats: Set[UUID],
         etl_step_id: UUID,
     ) -> None:
-        rows = {input_hash: (etl_step_id,) for input_hash in repeats - self._old_repeats}
+        rows = {input_hash: (etl_step_id,) for input_hash in repeats if input_hash not in self._old_repeats}
         async with conn_pool.connection() as connection:
             await Repeats._async_quick_load(connection, rows, column_names=["etl_step_id"])
-        self._old_repeats = self._old_repeats.union(repeats)
+        self._old_repeats.update(repeats)
 
     async def set_length(
         self, extract: Extract, dashboard: Optional[Dashboard], conn_pool: AsyncConnectionPool
@@ -487,8 +795,17 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
             dashboard.set_total(total)
         return total
 
-    async def memory_usage(self, executor: ProcessPoolExecutor, refresh_per_second: int = 1):
-        """Monitor for the memory usage of the async run and the child processes"""
+    async def memory_usage(
+        self,
+        executor: ProcessPoolExecutor,
+        memory_available: Optional[asyncio.Event] = None,
+        memory_limit: Optional[float] = None,
+        refresh_per_second: int = 1,
+    ):
+        """Monitor for the memory usage of the async run and the child processes
+
+        If a memory_limit in MB is given, memory_available is cleared while the total usage exceeds it.
+        """
         logger = self._logger.getChild('memory')
         get_memory = lambda pid=None: psutil.Process(pid).memory_info().rss / (1024 * 1024)
         max_memory = 0
@@ -501,12 +818,19 @@ class AsyncETLStepExecutor(BaseETLStepExecutor):
                     pids = list(executor._processes.keys())
                     total_memory_usage += sum(map(get_memory, pids))
                 max_memory = max(total_memory_usage, max_memory)
+                if memory_available is not None and memory_limit is not None:
+                    if total_memory_usage > memory_limit:
+                        memory_available.clear()
+                    else:
+                        memory_available.set()
                 logger.debug(
                     f'Memory Usage ({len(pids)} child processes): Main = {async_memory_usage:3.1f} MB, Total = {total_memory_usage:3.1f} MB'
                 )
                 await asyncio.sleep(1 / refresh_per_second)
 
         except asyncio.CancelledError:
+            if memory_available is not None:
+                memory_available.set()
             logger.info(f'Max memory used {max_memory:3.1f} MB')
             logger.debug('Memory Usage Finished')
         return max_memory
@@ -14,33 +14,45 @@
 
 """Objects related to the running of Models and ETLSteps."""
 from bdb import BdbQuit
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from math import ceil
 from time import time
 from traceback import format_exc
-from typing import TYPE_CHECKING, Any, Dict, Generator, List, Optional, Tuple
+from typing import TYPE_CHECKING, Deque, Generator, List, Optional, Set, Tuple
 from uuid import UUID
 
 from psycopg import connect as pg3_connect
-from pydasher import hasher
 from sqlalchemy.future import Engine
 from sqlmodel import Session, select
 
 import dbgen.exceptions as exceptions
 from dbgen.configuration import config
-from dbgen.core.base import Base, encoders
+from dbgen.core.base import Base
 from dbgen.core.dashboard import BarNames, Dashboard
 from dbgen.core.etl_step import ETLStep
 from dbgen.core.metadata import ETLStepEntity, ETLStepRunEntity, Repeats, RunEntity, Status
 from dbgen.core.node.extract import Extract
-from dbgen.core.node.query import BaseQuery, ExternalQuery
-from dbgen.core.run.async_run import AsyncETLStepExecutor
-from dbgen.core.run.utilities import BaseETLStepExecutor, RunConfig, update_run_by_id
+from dbgen.core.node.query import BaseQuery, ExternalQuery, split_input_hash
+from dbgen.core.run.async_run import AsyncETLStepExecutor, AsyncRunResources
+from dbgen.core.run.utilities import (
+    BaseETLStepExecutor,
+    RunConfig,
+    count_loaded_rows,
+    same_database,
+    update_run_by_id,
+)
 from dbgen.exceptions import SerializationError
-from dbgen.utils.typing import NAMESPACE_TYPE
+from dbgen.utils.lists import prefetch
+from dbgen.utils.postgresql_load import copy_data, merge_data, prepare_load
+from dbgen.utils.typing import NAMESPACE_TYPE, ROWS_TO_LOAD_TYPE
 
 if TYPE_CHECKING:
     from psycopg import Connection as PG3Connection
 
+# The number of batches extracted ahead of, and waiting to be loaded behind, the batch being transformed
+PIPELINE_DEPTH = 2
+
 
 class ETLStepExecutor(BaseETLStepExecutor):
     """Synchronous ETLStep Executor."""
@@ -60,18 +72,21 @@ class ETLStepExecutor(BaseETLStepExecutor):
         self._etl_step_run.status = Status.running
         meta_session.commit()
         start = time()
-        self._logger.debug('Fetching repeats')
-        # Query the repeats table for input_hashes that match this etl_step's hash
-        self._old_repeats = set(
-            meta_session.exec(
-                select(Repeats.input_hash).where(Repeats.etl_step_id == self.etl_step.uuid)
-            ).all()
-        )
-
         # Setup the extractor
         self._logger.debug('Initializing extractor')
         extract = self.etl_step.extract
         extract._set_run_config(self.run_config)
+        repeats_in_db = self._set_repeat_filter(extract, main_engine, meta_engine)
+
+        meta_raw_connection = pg3_connect(str(meta_engine.url))
+        single_transaction = self.run_config.single_transaction
+        # Repeats can only share the load's transaction when they live in the same database
+        repeats_in_transaction = single_transaction and same_database(main_engine, meta_engine)
+        # Repeats filtered out by the database don't need to be fetched
+        if not repeats_in_db:
+            self._logger.debug('Fetching repeats')
+            # Stream the repeats table for input_hashes that match this etl_step's hash
+            self._fetch_repeats(meta_raw_connection)
         with main_engine.connect() as extractor_connection:
             try:
                 with extract:
@@ -98,48 +113,91 @@ class ETLStepExecutor(BaseETLStepExecutor):
 
                     # Open raw connections for fast loading
                     main_raw_connection = pg3_connect(str(main_engine.url))
-                    meta_raw_connection = pg3_connect(str(meta_engine.url))
                     # Start while loop to iterate through the nodes
                     self._logger.debug('Looping through extracted rows...')
                     if dashboard is not None:
                         dashboard.add_etl_progress_bars(total=row_count)
-                    for batch_ind, batch in enumerate(self.batchify(extract, batch_size, dashboard)):
-                        (
-                            _,
-                            rows_to_load,
+                    batches = self._extract_batches(extract, batch_size, dashboard)
+                    # When pipelining, batches are extracted and loaded in background threads while the
+                    # current batch is transformed. The loader thread is the only user of the raw connections
+                    load_executor = None
+                    if self.run_config.pipeline:
+                        batches = prefetch(batches, PIPELINE_DEPTH)
+                        load_executor = ThreadPoolExecutor(1, thread_name_prefix='dbgen-load')
+                    pending_loads: Deque[Tuple[int, 'Future[Tuple[int, int, int]]', int, int]] = deque()
+
+                    def record_oldest_load() -> None:
+                        batch_ind, future, rows_processed, inputs_skipped = pending_loads.popleft()
+                        self._record_load(
+                            batch_ind,
+                            future.result(),
                             rows_processed,
                             inputs_skipped,
-                            exc,
-                        ) = self.etl_step.transform_batch(batch, self.run_config)
-                        # Check if transforms or loads raised an error
-                        if exc:
-                            msg = f"Error when running etl_step {self.etl_step.name}"
-                            self._logger.error(msg)
-                            self._etl_step_run.status = Status.failed
-                            self._etl_step_run.error = exc
-                            run = meta_session.get(RunEntity, run_id)
-                            assert run
-                            run.errors = run.errors + 1 if run.errors else 1
-                            meta_session.commit()
-                            meta_session.close()
-                            return 1
-                        if dashboard is not None:
-                            dashboard.advance_bar(BarNames.TRANSFORMED, advance=len(batch))
-                        rows_inserted, rows_updated = self._load_data(
-                            rows_to_load, connection=main_raw_connection
-                        )
-                        if dashboard is not None:
-                            dashboard.advance_bar(BarNames.LOADED, advance=rows_processed)
-                        self._load_repeats(meta_raw_connection)
-                        self._logger.debug(
-                            f'Done loading batch {batch_ind}. Inserted {rows_inserted} and updated {rows_updated} rows.'
+                            dashboard,
+                            meta_session,
                         )
 
-                        # Commit changes to db
-                        self._etl_step_run.rows_inserted += rows_inserted
-                        self._etl_step_run.rows_updated += rows_updated
-                        self._etl_step_run.inputs_skipped += inputs_skipped
-                        meta_session.commit()
+                    self._etl_step_run.inputs_extracted = 0
+                    self._etl_step_run.unique_inputs = 0
+                    try:
+                        for batch_ind, (batch, new_repeats) in enumerate(batches):
+                            self._etl_step_run.inputs_extracted += len(batch)
+                            self._etl_step_run.unique_inputs += len(new_repeats)
+                            (
+                                _,
+                                rows_to_load,
+                                rows_processed,
+                                inputs_skipped,
+                                exc,
+                            ) = self.etl_step.transform_batch(batch, self.run_config)
+                            # Check if transforms or loads raised an error
+                            if exc:
+                                # Finish loading the batches transformed before the error
+                                while pending_loads:
+                                    record_oldest_load()
+                                msg = f"Error when running etl_step {self.etl_step.name}"
+                                self._logger.error(msg)
+                                self._etl_step_run.status = Status.failed
+                                self._etl_step_run.error = exc
+                                run = meta_session.get(RunEntity, run_id)
+                                assert run
+                                run.errors = run.errors + 1 if run.errors else 1
+                                meta_session.commit()
+                                meta_session.close()
+                                return 1
+                            if dashboard is not None:
+                                dashboard.advance_bar(BarNames.TRANSFORMED, advance=len(batch))
+                            load_args = (
+                                rows_to_load,
+                                new_repeats,
+                                main_raw_connection,
+                                meta_raw_connection,
+                                repeats_in_transaction,
+                            )
+                            if load_executor is None:
+                                rows_loaded = self._load_batch(*load_args)
+                                self._record_load(
+                                    batch_ind,
+                                    rows_loaded,
+                                    rows_processed,
+                                    inputs_skipped,
+                                    dashboard,
+                                    meta_session,
+                                )
+                                continue
+                            # Bound the number of transformed batches waiting to be loaded
+                            if len(pending_loads) >= PIPELINE_DEPTH:
+                                record_oldest_load()
+                            future = load_executor.submit(self._load_batch, *load_args)
+                            pending_loads.append((batch_ind, future, rows_processed, inputs_skipped))
+                        while pending_loads:
+                            record_oldest_load()
+                    finally:
+                        for _, future, _, _ in pending_loads:
+                            future.cancel()
+                        if load_executor is not None:
+                            load_executor.shutdown()
+                        batches.close()
 
                 # Finish the run and commit to DB
                 self._etl_step_run.status = Status.completed
@@ -147,7 +205,9 @@ class ETLStepExecutor(BaseETLStepExecutor):
                 self._logger.info(
                     f"Finished running etl_step {self.etl_step.name} in {self._etl_step_run.runtime}(s)."
                 )
-                self._logger.info(f"Loaded approximately {self._etl_step_run.rows_inserted} rows")
+                self._logger.info(f"Inserted {self._etl_step_run.rows_inserted} rows")
+                self._logger.info(f"Updated {self._etl_step_run.rows_updated} rows")
+                self._logger.info(f"Left {self._etl_step_run.rows_unchanged} unchanged rows untouched")
                 meta_session.commit()
                 meta_session.close()
                 return 0
@@ -168,25 +228,41 @@ class ETLStepExecutor(BaseETLStepExecutor):
                 meta_session.close()
                 raise
 
+    def _extract_batches(
+        self, extract: Extract, batch_size: int, dashboard: Optional[Dashboard]
+    ) -> Generator[Tuple[List[Tuple[UUID, NAMESPACE_TYPE]], Set[UUID]], None, None]:
+        """Yield each batch along with the input hashes first seen in it.
+
+        Batches may be extracted in a background thread so the caller updates the ETLStepRunEntity's counts.
+        """
+        for batch in self.batchify(extract, batch_size, dashboard):
+            new_repeats, self._new_repeats = self._new_repeats, set()
+            self._old_repeats.update(new_repeats)
+            yield batch, new_repeats
+
     def batchify(
         self, extract: Extract, batch_size: int, dashboard: Optional[Dashboard]
     ) -> Generator[List[Tuple[UUID, NAMESPACE_TYPE]], None, None]:
         # initialize the batch and counts
         batch: List[Tuple[UUID, NAMESPACE_TYPE]] = []
-        self._etl_step_run.inputs_extracted = 0
-        self._etl_step_run.unique_inputs = 0
+        inputs_extracted = 0
+        hashes_in_db = isinstance(extract, BaseQuery) and extract.hashes_inputs
         # Loop the the rows in the extract function
         for row in extract.extract():
             # Check the hash of the inputs against the metadatabase
-            processed_row = extract.process_row(row)
-            is_repeat, input_hash = self._check_repeat(processed_row, self.etl_step.uuid)
+            if hashes_in_db:
+                input_hash, row = split_input_hash(row)
+                processed_row = extract.process_row(row)
+                is_repeat = self._is_repeat(input_hash)
+            else:
+                processed_row = extract.process_row(row)
+                is_repeat, input_hash = self._check_repeat(processed_row, self.etl_step.uuid)
 
             # If we are running with --retry redo repeats
             if self.run_config.retry or not is_repeat:
                 # Store the hash for newly seen rows for later loading
-                self._etl_step_run.inputs_extracted += 1
+                inputs_extracted += 1
                 if not is_repeat:
-                    self._etl_step_run.unique_inputs += 1
                     self._new_repeats.add(input_hash)
                 batch.append((input_hash, {extract.hash: processed_row}))
             elif dashboard is not None:
@@ -205,33 +281,88 @@ class ETLStepExecutor(BaseETLStepExecutor):
                 dashboard.advance_bar(BarNames.EXTRACTED, advance=len(batch))
             yield batch
         if dashboard is not None:
-            dashboard.set_total(total=self._etl_step_run.inputs_extracted)
+            dashboard.set_total(total=inputs_extracted)
+
+    def _load_batch(
+        self,
+        rows_to_load: ROWS_TO_LOAD_TYPE,
+        new_repeats: Set[UUID],
+        main_raw_connection: 'PG3Connection',
+        meta_raw_connection: 'PG3Connection',
+        repeats_in_transaction: bool,
+    ) -> Tuple[int, int, int]:
+        """Load a transformed batch and its repeats, returning the inserted, updated and unchanged row counts."""
+        if self.run_config.single_transaction:
+            repeats = new_repeats if repeats_in_transaction else None
+            rows_loaded = self._load_in_transaction(rows_to_load, main_raw_connection, repeats)
+        else:
+            rows_loaded = self._load_data(rows_to_load, connection=main_raw_connection)
+        if not repeats_in_transaction:
+            self._load_repeats(meta_raw_connection, new_repeats)
+        return rows_loaded
+
+    def _record_load(
+        self,
+        batch_ind: int,
+        rows_loaded: Tuple[int, int, int],
+        rows_processed: int,
+        inputs_skipped: int,
+        dashboard: Optional[Dashboard],
+        meta_session: Session,
+    ) -> None:
+        """Commit the counts of a loaded batch to the metadatabase."""
+        rows_inserted, rows_updated, rows_unchanged = rows_loaded
+        if dashboard is not None:
+            dashboard.advance_bar(BarNames.LOADED, advance=rows_processed)
+        self._logger.debug(
+            f'Done loading batch {batch_ind}. Inserted {rows_inserted} and updated {rows_updated} rows, '
+            f'{rows_unchanged} rows were unchanged.'
+        )
+        # Commit changes to db
+        self._etl_step_run.rows_inserted += rows_inserted
+        self._etl_step_run.rows_updated += rows_updated
+        self._etl_step_run.rows_unchanged += rows_unchanged
+        self._etl_step_run.inputs_skipped += inputs_skipped
+        meta_session.commit()
 
-    def _load_data(self, rows_to_load: Dict[str, Dict[UUID, Any]], connection) -> Tuple[int, int]:
-        rows_inserted = 0
-        rows_updated = 0
-        for load in self.etl_step._sorted_loads():
+    def _load_data(self, rows_to_load: ROWS_TO_LOAD_TYPE, connection) -> Tuple[int, int, int]:
+        loads = self.etl_step._sorted_loads()
+        results = []
+        for load in loads:
             self._logger.debug(f'Loading into {load}')
-            rows = rows_to_load[load.hash]
-            if load.insert:
-                rows_inserted += len(rows)
-            else:
-                rows_updated += len(rows)
-            load._load_data(data=rows, connection=connection, etl_step_id=self.etl_step.uuid)
-        return (rows_inserted, rows_updated)
+            results.append(
+                load._load_data(
+                    data=rows_to_load[load.hash], connection=connection, etl_step_id=self.etl_step.uuid
+                )
+            )
+        return count_loaded_rows([len(rows_to_load[load.hash]) for load in loads], results)
 
-    def _load_repeats(self, connection: 'PG3Connection') -> None:
-        rows = {input_hash: (self.etl_step.uuid,) for input_hash in self._new_repeats}
+    def _load_in_transaction(
+        self,
+        rows_to_load: ROWS_TO_LOAD_TYPE,
+        connection: 'PG3Connection',
+        repeats: Optional[Set[UUID]] = None,
+    ) -> Tuple[int, int, int]:
+        """Load a batch into every Load, and optionally the batch's repeats, in a single transaction."""
+        loads = self.etl_step._sorted_loads()
+        # Prepare every staging table first as creating one commits
+        staged_loads = [load._prepare_load(connection, self.etl_step.uuid) for load in loads]
+        data = [rows_to_load[load.hash] for load in loads]
+        if repeats is not None:
+            staged_loads.append(
+                prepare_load(connection, Repeats._get_load_entity(), ['etl_step_id'], insert=True)
+            )
+            data.append({input_hash: (self.etl_step.uuid,) for input_hash in repeats})
+        for staged_load, rows in zip(staged_loads, data):
+            self._logger.debug(f'Copying into {staged_load.load_entity.name}')
+            copy_data(connection, staged_load, rows)
+        results = merge_data(connection, staged_loads)
+        connection.commit()
+        return count_loaded_rows([len(rows_to_load[load.hash]) for load in loads], results)
+
+    def _load_repeats(self, connection: 'PG3Connection', input_hashes: Set[UUID]) -> None:
+        rows = {input_hash: (self.etl_step.uuid,) for input_hash in input_hashes}
         Repeats._quick_load(connection, rows, column_names=["etl_step_id"])
-        self._old_repeats = self._old_repeats.union(self._new_repeats)
-        self._new_repeats = set()
-
-    def _check_repeat(self, extracted_dict: Dict[str, Any], etl_step_uuid: UUID) -> Tuple[bool, UUID]:
-        # Convert Row to a dictionary so we can hash it for repeat-checking
-        input_hash = UUID(hasher((etl_step_uuid, extracted_dict), encoders=encoders))
-        # If the input_hash has been seen and we don't have retry=True skip row
-        is_repeat = input_hash in self._old_repeats or input_hash in self._new_repeats
-        return (is_repeat, input_hash)
 
 
 class BaseETLStepRun(Base):
@@ -361,16 +492,20 @@ class RemoteETLStepRun(BaseETLStepRun):
 
 class AsyncETLStepRun(BaseETLStepRun):
     etl_step: ETLStep
+    _resources: Optional[AsyncRunResources] = None
 
     def get_etl_step(self, meta_engine: Engine, *args, **kwargs):
         return self.etl_step
 
     def get_executor(self, etl_step, run_config) -> BaseETLStepExecutor:
-        return AsyncETLStepExecutor(etl_step=etl_step, run_config=run_config)
+        executor = AsyncETLStepExecutor(etl_step=etl_step, run_config=run_config)
+        executor._resources = self._resources
+        return executor
 
 
 class AsyncRemoteETLStepRun(BaseETLStepRun):
     etl_step_id: UUID
+    _resources: Optional[AsyncRunResources] = None
 
     def get_etl_step(self, meta_engine, *args, **kwargs):
         with Session(meta_engine) as sess:
@@ -391,4 +526,6 @@ class AsyncRemoteETLStepRun(BaseETLStepRun):
         return etl_step
 
     def get_executor(self, etl_step, run_config) -> BaseETLStepExecutor:
-        return AsyncETLStepExecutor(etl_step=etl_step, run_config=run_config)
+        executor = AsyncETLStepExecutor(etl_step=etl_step, run_config=run_config)
+        executor._resources = self._resources
+        return executor
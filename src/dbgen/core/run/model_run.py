@@ -13,9 +13,10 @@
 #   limitations under the License.
 
 """Objects related to the running of Models and ETLSteps."""
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from time import time
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional
 
 from sqlalchemy.future import Engine
 from sqlmodel import Session, select
@@ -25,6 +26,7 @@ from dbgen.core.dashboard import BarNames, Dashboard
 from dbgen.core.etl_step import ETLStep
 from dbgen.core.metadata import ETLStepsToRun, ModelEntity, RunEntity, Status
 from dbgen.core.model import Model
+from dbgen.core.run.async_run import AsyncRunResources
 from dbgen.core.run.etl_step_run import (
     AsyncETLStepRun,
     AsyncRemoteETLStepRun,
@@ -33,6 +35,8 @@ from dbgen.core.run.etl_step_run import (
     RemoteETLStepRun,
 )
 from dbgen.core.run.utilities import RunConfig, RunInitializer, update_run_by_id
+from dbgen.core.run.worker import cancel_etl_steps, enqueue_etl_step, wait_for_etl_step
+from dbgen.utils.graphs import run_graph_in_parallel
 from dbgen.utils.log import logging_console
 
 if TYPE_CHECKING:
@@ -47,17 +51,92 @@ class ModelRun(Base):
 
         copy_on_model_validation = False
 
-    def get_etl_step_run(self, etl_step: ETLStep, run_async: bool, remote: bool) -> BaseETLStepRun:
+    def get_etl_step_run(
+        self,
+        etl_step: ETLStep,
+        run_async: bool,
+        remote: bool,
+        resources: Optional[AsyncRunResources] = None,
+    ) -> BaseETLStepRun:
         if run_async:
+            async_etl_step_run: BaseETLStepRun
             if remote:
-                return AsyncRemoteETLStepRun(etl_step_id=etl_step.uuid)
+                async_etl_step_run = AsyncRemoteETLStepRun(etl_step_id=etl_step.uuid)
             else:
-                return AsyncETLStepRun(etl_step=etl_step)
+                async_etl_step_run = AsyncETLStepRun(etl_step=etl_step)
+            # Reuse the worker processes and connection pools of the model run
+            async_etl_step_run._resources = resources
+            return async_etl_step_run
         else:
             if remote:
                 return RemoteETLStepRun(etl_step_id=etl_step.uuid)
             return ETLStepRun(etl_step=etl_step)
 
+    @staticmethod
+    @contextmanager
+    def _async_resources(
+        main_engine: Engine, meta_engine: Engine, run_config: RunConfig, run_async: bool
+    ) -> Iterator[Optional[AsyncRunResources]]:
+        if not run_async:
+            yield None
+            return
+        with AsyncRunResources(
+            str(main_engine.url), str(meta_engine.url), run_config.log_level, concurrency=run_config.parallel
+        ) as resources:
+            yield resources
+
+    def _exclude_downstream(
+        self,
+        code: Optional[int],
+        etl_step: ETLStep,
+        later_etl_steps: List[ETLStep],
+        run_config: RunConfig,
+    ) -> None:
+        """If an etl_step failed exclude the etl_steps downstream of it from running."""
+        if code != 1 or not (run_config.fail_downstream or run_config.fast_fail):
+            return
+        if run_config.fast_fail:
+            self._logger.info(f'Excluding all downstream ETLSteps due to the failure of {etl_step.name!r}')
+        excluded = set()
+        for target in later_etl_steps:
+            if run_config.fast_fail:
+                excluded.add(target.name)
+            elif target._get_dependency().test(etl_step._get_dependency()):
+                self._logger.info(
+                    f'Excluding ETLStep {target.name!r} due to failed upstream dependency {etl_step.name!r}'
+                )
+                excluded.add(target.name)
+        # Replace rather than update the set as etl_steps running in parallel may be reading it
+        run_config.upstream_fail_exclude = run_config.upstream_fail_exclude | excluded
+
+    def _execute_graph(
+        self,
+        sorted_etl_steps: List[ETLStep],
+        run_etl_step: Callable[[ETLStep, int], Optional[int]],
+        workers: int,
+        run_config: RunConfig,
+        dashboard: Dashboard,
+    ) -> Optional[int]:
+        """Run up to `workers` etl_steps at once, each as soon as its upstream etl_steps finish."""
+        ordering = {etl_step.name: i for i, etl_step in enumerate(sorted_etl_steps)}
+        codes: List[Optional[int]] = []
+
+        def on_done(name: str, code: Optional[int]) -> bool:
+            codes.append(code)
+            index = ordering[name]
+            self._exclude_downstream(code, sorted_etl_steps[index], sorted_etl_steps[index + 1 :], run_config)
+            dashboard.advance_bar(BarNames.OVERALL)
+            return code != 2
+
+        run_graph_in_parallel(
+            self.model._etl_step_graph(),
+            list(ordering),
+            lambda name: run_etl_step(sorted_etl_steps[ordering[name]], ordering[name]),
+            on_done,
+            workers,
+        )
+        return 2 if 2 in codes else None
+
     def execute(
         self,
         main_engine: Engine,
@@ -67,6 +146,7 @@ class ModelRun(Base):
         run_async: bool = False,
         remote: bool = False,
         rerun_failed: bool = False,
+        distributed: bool = False,
     ) -> RunEntity:
         start = time()
         if run_config is None:
@@ -110,32 +190,53 @@ class ModelRun(Base):
             self._logger.debug(
                 f"Only running etl_steps: {etl_step_names[start_idx:until_idx]} due to start/until"
             )
-        with Dashboard(console=logging_console, enable=run_config.progress_bar).show(
-            total=len(sorted_etl_steps)
-        ) as dashboard:
-            for i, etl_step in enumerate(sorted_etl_steps):
-                dashboard.set_etl_name(etl_step.name, i)
-                etl_step_run = self.get_etl_step_run(etl_step, run_async, remote)
-                code = etl_step_run.execute(
-                    main_engine, meta_engine, run_id, run_config, ordering=i, dashboard=dashboard
+        # The worker processes and connection pools are shared by every async etl_step of the run
+        run_async = run_async and not distributed
+        with self._async_resources(main_engine, meta_engine, run_config, run_async) as resources, Dashboard(
+            console=logging_console, enable=run_config.progress_bar
+        ).show(total=len(sorted_etl_steps)) as dashboard:
+            if distributed:
+                # Act as the coordinator, queueing each etl_step for the dbgen workers once it is ready
+                def run_etl_step(etl_step: ETLStep, ordering: int) -> Optional[int]:
+                    queue_id = enqueue_etl_step(meta_engine, run_id, etl_step.uuid, ordering, run_config)
+                    return wait_for_etl_step(
+                        meta_engine,
+                        queue_id,
+                        lease=run_config.worker_lease,
+                        timeout=run_config.worker_timeout,
+                    )
+
+                try:
+                    code = self._execute_graph(
+                        sorted_etl_steps, run_etl_step, len(sorted_etl_steps) or 1, run_config, dashboard
+                    )
+                finally:
+                    # Leave nothing queued for the workers once the coordinator stops waiting on it
+                    cancel_etl_steps(meta_engine, run_id)
+            elif run_config.parallel > 1:
+
+                def run_etl_step(etl_step: ETLStep, ordering: int) -> Optional[int]:
+                    etl_step_run = self.get_etl_step_run(etl_step, run_async, remote, resources)
+                    # The progress bars follow a single etl_step so only the overall progress is shown
+                    return etl_step_run.execute(
+                        main_engine, meta_engine, run_id, run_config, ordering=ordering, dashboard=None
+                    )
+
+                code = self._execute_graph(
+                    sorted_etl_steps, run_etl_step, run_config.parallel, run_config, dashboard
                 )
-                # If we fail run exclude downstream generators from running
-                if code == 1 and (run_config.fail_downstream or run_config.fast_fail):
-                    if run_config.fast_fail:
-                        self._logger.info(
-                            f'Excluding all downstream ETLSteps due to the failure of {etl_step.name!r}'
-                        )
-                    for target in sorted_etl_steps[i + 1 :]:
-                        if run_config.fast_fail:
-                            run_config.upstream_fail_exclude.add(target.name)
-                        elif target._get_dependency().test(etl_step._get_dependency()):
-                            self._logger.info(
-                                f'Excluding ETLStep {target.name!r} due to failed upstream dependency {etl_step.name!r}'
-                            )
-                            run_config.upstream_fail_exclude.add(target.name)
-                elif code == 2:
-                    break
-                dashboard.advance_bar(BarNames.OVERALL)
+            else:
+                for i, etl_step in enumerate(sorted_etl_steps):
+                    dashboard.set_etl_name(etl_step.name, i)
+                    etl_step_run = self.get_etl_step_run(etl_step, run_async, remote, resources)
+                    code = etl_step_run.execute(
+                        main_engine, meta_engine, run_id, run_config, ordering=i, dashboard=dashboard
+                    )
+                    # If we fail run exclude downstream generators from running
+                    self._exclude_downstream(code, etl_step, sorted_etl_steps[i + 1 :], run_config)
+                    if code == 2:
+                        break
+                    dashboard.advance_bar(BarNames.OVERALL)
             dashboard.finish()
 
         # Complete run
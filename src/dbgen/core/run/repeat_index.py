@@ -0,0 +1,149 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Membership indexes for the input hashes an ETLStep has already processed."""
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Iterable, List, Set, Type
+from uuid import UUID
+
+from dbgen.configuration import RepeatIndexType
+from dbgen.core.metadata import Repeats
+
+if TYPE_CHECKING:
+    from psycopg import Connection as PG3Connection  # pragma: no cover
+
+# Postgres compares uuids bytewise so ordering by input_hash yields the big-endian integer order
+REPEATS_QUERY = (
+    f"SELECT uuid_send(input_hash) FROM {Repeats.__fulltablename__} "
+    "WHERE etl_step_id = %s ORDER BY input_hash"
+)
+LOW_MASK = (1 << 64) - 1
+
+
+class RepeatIndex(ABC):
+    """
+    Answers whether an input hash has been seen before by an ETLStep.
+
+    Hashes fetched from the metadatabase are held in an implementation specific structure while
+    hashes added during the run are kept in a small set alongside them.
+    """
+
+    def __init__(self) -> None:
+        self._added: Set[UUID] = set()
+
+    @abstractmethod
+    def _extend(self, chunk: List[bytes]) -> None:
+        """Add a chunk of 16 byte hashes, fetched in ascending order, to the index."""
+
+    @abstractmethod
+    def _contains_fetched(self, input_hash: UUID) -> bool:
+        pass
+
+    @abstractmethod
+    def _fetched_length(self) -> int:
+        pass
+
+    def __contains__(self, input_hash: UUID) -> bool:
+        return input_hash in self._added or self._contains_fetched(input_hash)
+
+    def __len__(self) -> int:
+        return self._fetched_length() + len(self._added)
+
+    def add(self, input_hash: UUID) -> None:
+        self._added.add(input_hash)
+
+    def update(self, input_hashes: Iterable[UUID]) -> None:
+        self._added.update(input_hashes)
+
+    def fetch(self, connection: 'PG3Connection', etl_step_id: UUID, chunk_size: int = 100000) -> None:
+        """Stream the repeats of an ETLStep into the index with a server-side cursor."""
+        with connection.cursor(name=f'dbgen_repeats_{etl_step_id.hex}') as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute(REPEATS_QUERY, (etl_step_id,))
+            while chunk := cursor.fetchmany(chunk_size):
+                self._extend([row[0] for row in chunk])
+        # Close the transaction opened by the named cursor
+        connection.commit()
+
+    @classmethod
+    def from_hashes(cls, input_hashes: Iterable[UUID]) -> 'RepeatIndex':
+        index = cls()
+        index._extend(sorted(input_hash.bytes for input_hash in input_hashes))
+        return index
+
+
+class SetRepeatIndex(RepeatIndex):
+    """Stores every hash as a UUID in a python set, fast but memory hungry for large ETLSteps."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._fetched: Set[UUID] = set()
+
+    def _extend(self, chunk: List[bytes]) -> None:
+        self._fetched.update(UUID(bytes=input_hash) for input_hash in chunk)
+
+    def _contains_fetched(self, input_hash: UUID) -> bool:
+        return input_hash in self._fetched
+
+    def _fetched_length(self) -> int:
+        return len(self._fetched)
+
+
+class SortedRepeatIndex(RepeatIndex):
+    """
+    Stores the hashes as two sorted arrays of unsigned 64 bit integers.
+
+    Each hash costs 16 bytes and lookups are a binary search over the high halves of the hashes.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._high = array('Q')
+        self._low = array('Q')
+
+    def _extend(self, chunk: List[bytes]) -> None:
+        # Read the 16 byte hashes as pairs of big-endian unsigned 64 bit integers
+        values = array('Q')
+        values.frombytes(b''.join(chunk))
+        if sys.byteorder == 'little':
+            values.byteswap()
+        self._high.extend(values[0::2])
+        self._low.extend(values[1::2])
+
+    def _contains_fetched(self, input_hash: UUID) -> bool:
+        value = input_hash.int
+        high, low = value >> 64, value & LOW_MASK
+        index = bisect_left(self._high, high)
+        length = len(self._high)
+        while index < length and self._high[index] == high:
+            if self._low[index] == low:
+                return True
+            index += 1
+        return False
+
+    def _fetched_length(self) -> int:
+        return len(self._high)
+
+
+REPEAT_INDEXES = {
+    RepeatIndexType.SET: SetRepeatIndex,
+    RepeatIndexType.SORTED: SortedRepeatIndex,
+}
+
+
+def get_repeat_index_class(index_type: RepeatIndexType) -> Type[RepeatIndex]:
+    return REPEAT_INDEXES[RepeatIndexType(index_type)]
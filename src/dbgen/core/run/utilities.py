@@ -14,23 +14,29 @@
 
 """Objects related to the running of Models and ETLSteps."""
 from abc import abstractmethod
-from typing import TYPE_CHECKING, Dict, List, Optional, Set
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
 from uuid import UUID
 
 from pydantic.fields import Field, PrivateAttr
 from sqlalchemy.future import Engine
 from sqlmodel import Session
 
+from dbgen.configuration import config
 from dbgen.core.base import Base
 from dbgen.core.dashboard import Dashboard
 from dbgen.core.etl_step import ETLStep
 from dbgen.core.metadata import ETLStepRunEntity, RunEntity, Status
 from dbgen.core.model import Model
 from dbgen.core.model_settings import BaseModelSettings
+from dbgen.core.node.extract import Extract
+from dbgen.core.node.query import BaseQuery, ExternalQuery
+from dbgen.core.run.repeat_index import RepeatIndex, SetRepeatIndex, get_repeat_index_class
+from dbgen.utils.hashing import get_input_hasher
 from dbgen.utils.log import LogLevel
+from dbgen.utils.postgresql_load import LoadResult
 
 if TYPE_CHECKING:
-    pass
+    from psycopg import Connection as PG3Connection
 
 
 class RunConfig(Base):
@@ -49,6 +55,13 @@ class RunConfig(Base):
     fast_fail: bool = False
     skip_on_error: bool = False
     batch_number: int = 10
+    single_transaction: bool = False
+    pipeline: bool = False
+    memory_limit: Optional[float] = None
+    hash_in_workers: bool = False
+    parallel: int = 1
+    worker_lease: float = 60.0
+    worker_timeout: Optional[float] = None
     log_level: LogLevel = LogLevel.INFO
     settings: BaseModelSettings = Field(default_factory=lambda: BaseModelSettings())
 
@@ -82,6 +95,16 @@ class RunConfig(Base):
         return invalid_marks
 
 
+def same_database(main_engine: Engine, meta_engine: Engine) -> bool:
+    """Check whether two engines point at the same postgres database."""
+    main_url, meta_url = main_engine.url, meta_engine.url
+    return (main_url.host, main_url.port or 5432, main_url.database) == (
+        meta_url.host,
+        meta_url.port or 5432,
+        meta_url.database,
+    )
+
+
 def update_run_by_id(run_id, status: Status, session: Session):
     run = session.get(RunEntity, run_id)
     assert run, f"No run found with id {run_id}"
@@ -109,12 +132,23 @@ class RunInitializer(Base):
         return run_id
 
 
+def count_loaded_rows(rows_offered: Sequence[int], results: Sequence[LoadResult]) -> Tuple[int, int, int]:
+    """Tally the rows offered to and changed by each Load into (inserted, updated, unchanged) counts."""
+    rows_inserted, rows_updated, rows_unchanged = 0, 0, 0
+    for offered, result in zip(rows_offered, results):
+        rows_inserted += result.inserted
+        rows_updated += result.updated
+        rows_unchanged += offered - result.inserted - result.updated
+    return rows_inserted, rows_updated, rows_unchanged
+
+
 class BaseETLStepExecutor(Base):
     etl_step: ETLStep
     run_config: RunConfig
     _etl_step_run: ETLStepRunEntity = PrivateAttr()
-    _old_repeats: Set[UUID] = PrivateAttr(default_factory=set)
+    _old_repeats: RepeatIndex = PrivateAttr(default_factory=SetRepeatIndex)
     _new_repeats: Set[UUID] = PrivateAttr(default_factory=set)
+    _hash_input: Callable[[UUID, Mapping[str, Any]], UUID] = PrivateAttr(default_factory=get_input_hasher)
 
     @abstractmethod
     def execute(
@@ -127,3 +161,37 @@ class BaseETLStepExecutor(Base):
         etl_step_run: ETLStepRunEntity,
     ) -> int:
         pass
+
+    def _is_repeat(self, input_hash: UUID) -> bool:
+        return input_hash in self._old_repeats or input_hash in self._new_repeats
+
+    def _check_repeat(self, extracted_dict: Mapping[str, Any], etl_step_uuid: UUID) -> Tuple[bool, UUID]:
+        # Hash the row for repeat-checking
+        input_hash = self._hash_input(etl_step_uuid, extracted_dict)
+        # If the input_hash has been seen and we don't have retry=True skip row
+        return (self._is_repeat(input_hash), input_hash)
+
+    def _set_repeat_filter(self, extract: Extract, main_engine: Engine, meta_engine: Engine) -> bool:
+        """Hash the inputs of Query extracts in the database for ETLSteps with server_side_repeats set.
+
+        Their repeats are filtered by the database too unless retrying or the metadatabase is elsewhere, in
+        which case the input hashes computed by the database are checked in python instead.
+        Returns whether the repeats are filtered by the database.
+        """
+        if not isinstance(extract, BaseQuery) or isinstance(extract, ExternalQuery):
+            return False
+        if not self.etl_step.server_side_repeats:
+            extract.set_repeat_filter(None)
+            return False
+        filter_repeats = not self.run_config.retry
+        if filter_repeats and not same_database(main_engine, meta_engine):
+            self._logger.info('Main and meta databases differ, falling back to checking repeats in python')
+            filter_repeats = False
+        extract.set_repeat_filter(self.etl_step.uuid, filter_repeats=filter_repeats)
+        return filter_repeats
+
+    def _fetch_repeats(self, connection: 'PG3Connection') -> None:
+        """Stream the input hashes this etl_step has already processed into the repeat index."""
+        self._old_repeats = get_repeat_index_class(config.repeat_index)()
+        self._old_repeats.fetch(connection, self.etl_step.uuid)
+        self._logger.debug(f'Fetched {len(self._old_repeats)} repeats')
@@ -0,0 +1,245 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Distribute the ETLSteps of a run to dbgen workers through a queue table in the metadatabase."""
+import os
+import socket
+from contextlib import contextmanager
+from datetime import timedelta
+from json import loads
+from threading import Event, Thread
+from time import sleep, time
+from traceback import format_exc
+from typing import Any, Iterator, Optional, Tuple
+from uuid import UUID
+
+from pydantic import Field
+from pydasher.import_module import import_string
+from sqlalchemy import and_, func, update
+from sqlalchemy.future import Engine
+from sqlmodel import Session, select
+
+from dbgen.core.base import Base
+from dbgen.core.metadata import ETLStepQueueEntity, Status
+from dbgen.core.run.etl_step_run import AsyncRemoteETLStepRun, BaseETLStepRun, RemoteETLStepRun
+from dbgen.core.run.utilities import RunConfig
+
+# Returned for a queued ETLStep whose worker raised, stopping the run like an uncaught exception would
+WORKER_ERROR_CODE = 2
+UNFINISHED = (Status.initialized, Status.running)
+
+
+def enqueue_etl_step(
+    meta_engine: Engine, run_id: int, etl_step_id: UUID, ordering: Optional[int], run_config: RunConfig
+) -> int:
+    """Add an ETLStep run to the queue for a worker to claim, returning the id of the queue row."""
+    settings_class = type(run_config.settings)
+    with Session(meta_engine) as session:
+        queued = ETLStepQueueEntity(
+            run_id=run_id,
+            etl_step_id=etl_step_id,
+            ordering=ordering,
+            # Settings can hold fields and secrets a plain RunConfig cannot parse back, so workers rebuild them
+            run_config=loads(run_config.json(exclude={'settings'})),
+            settings_class=f'{settings_class.__module__}.{settings_class.__qualname__}',
+        )
+        session.add(queued)
+        session.commit()
+        session.refresh(queued)
+        assert queued.id is not None
+        return queued.id
+
+
+def load_run_config(run_config_json: dict, settings_class: Optional[str]) -> RunConfig:
+    """Rebuild the RunConfig of a queued ETLStep run, reading its settings from the worker's environment."""
+    run_config = RunConfig.parse_obj(run_config_json)
+    if settings_class is not None:
+        run_config.settings = import_string(settings_class)()
+    return run_config
+
+
+def wait_for_etl_step(
+    meta_engine: Engine,
+    queue_id: int,
+    poll_interval: float = 1.0,
+    lease: float = 60.0,
+    timeout: Optional[float] = None,
+) -> Optional[int]:
+    """
+    Wait for a worker to finish a queued ETLStep run and return its return code.
+
+    The queued run is failed once its worker has not sent a heartbeat for `lease` seconds, or once it has not
+    finished within `timeout` seconds, so a dead worker or an empty pool of workers cannot hang the run.
+    """
+    table = ETLStepQueueEntity.__table__
+    statement = select(table.c.status, table.c.return_code).where(table.c.id == queue_id)
+    lost = and_(
+        table.c.status == Status.running,
+        func.coalesce(table.c.heartbeat_at, table.c.claimed_at) < func.now() - timedelta(seconds=lease),
+    )
+    deadline = None if timeout is None else time() + timeout
+    while True:
+        with meta_engine.connect() as connection:
+            status, return_code = connection.execute(statement).one()
+        if status in (Status.completed, Status.failed):
+            return return_code
+        if deadline is not None and time() >= deadline:
+            error, expired = f'Timed out after {timeout} seconds', table.c.status.in_(UNFINISHED)
+        else:
+            error, expired = f'No heartbeat from the worker for {lease} seconds', lost
+        # Only fail the queued run if it is still unfinished, a worker may have just finished it
+        if _fail_queued(meta_engine, error, table.c.id == queue_id, expired):
+            return WORKER_ERROR_CODE
+        sleep(poll_interval)
+
+
+def cancel_etl_steps(meta_engine: Engine, run_id: int) -> int:
+    """Fail the queued ETLStep runs of a run that no worker has claimed, returning how many were failed."""
+    table = ETLStepQueueEntity.__table__
+    return _fail_queued(
+        meta_engine, 'Cancelled by the run', table.c.run_id == run_id, table.c.status == Status.initialized
+    )
+
+
+def _fail_queued(meta_engine: Engine, error: str, *conditions: Any) -> int:
+    table = ETLStepQueueEntity.__table__
+    statement = (
+        update(table)
+        .where(*conditions)
+        .values(status=Status.failed, return_code=WORKER_ERROR_CODE, error=error, finished_at=func.now())
+    )
+    with meta_engine.begin() as connection:
+        return connection.execute(statement).rowcount
+
+
+def claim_etl_step(
+    meta_engine: Engine, worker: str
+) -> Optional[Tuple[int, int, UUID, Optional[int], dict, Optional[str]]]:
+    """
+    Claim the next pending ETLStep run of the oldest run in the queue.
+
+    SKIP LOCKED lets many workers poll the queue at once without claiming the same row or blocking each other.
+    Older runs go first so a steady stream of new runs cannot starve them.
+    """
+    table = ETLStepQueueEntity.__table__
+    pending = (
+        select(table.c.id)
+        .where(table.c.status == Status.initialized)
+        .order_by(table.c.run_id, table.c.ordering, table.c.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    statement = (
+        update(table)
+        .where(table.c.id == pending)
+        .values(status=Status.running, worker=worker, claimed_at=func.now(), heartbeat_at=func.now())
+        .returning(
+            table.c.id,
+            table.c.run_id,
+            table.c.etl_step_id,
+            table.c.ordering,
+            table.c.run_config,
+            table.c.settings_class,
+        )
+    )
+    with meta_engine.begin() as connection:
+        claimed = connection.execute(statement).first()
+    return tuple(claimed) if claimed else None  # type: ignore
+
+
+class ETLStepWorker(Base):
+    """Claims queued ETLStep runs from the metadatabase and runs them until the queue stays empty."""
+
+    name: str = Field(default_factory=lambda: f'{socket.gethostname()}:{os.getpid()}')
+    run_async: bool = False
+    poll_interval: float = 1.0
+    max_idle: Optional[float] = None
+    max_tasks: Optional[int] = None
+    heartbeat_interval: float = 10.0
+
+    def get_etl_step_run(self, etl_step_id: UUID) -> BaseETLStepRun:
+        if self.run_async:
+            return AsyncRemoteETLStepRun(etl_step_id=etl_step_id)
+        return RemoteETLStepRun(etl_step_id=etl_step_id)
+
+    def run(self, main_engine: Engine, meta_engine: Engine) -> int:
+        """Run queued ETLSteps, stopping after max_tasks of them or once idle for max_idle seconds."""
+        tasks = 0
+        idle_since = time()
+        while self.max_tasks is None or tasks < self.max_tasks:
+            claimed = claim_etl_step(meta_engine, self.name)
+            if claimed is None:
+                if self.max_idle is not None and time() - idle_since >= self.max_idle:
+                    break
+                sleep(self.poll_interval)
+                continue
+            queue_id, run_id, etl_step_id, ordering, run_config_json, settings_class = claimed
+            self._logger.info(f'Worker {self.name} claimed etl_step {etl_step_id} of run {run_id}')
+            error = None
+            try:
+                run_config = load_run_config(run_config_json, settings_class)
+                with self._heartbeat(meta_engine, queue_id):
+                    return_code = self.get_etl_step_run(etl_step_id).execute(
+                        main_engine, meta_engine, run_id, run_config, ordering
+                    )
+            except Exception:
+                self._logger.exception(f'Worker {self.name} failed running etl_step {etl_step_id}')
+                return_code, error = WORKER_ERROR_CODE, format_exc()
+            self._finish(meta_engine, queue_id, return_code, error)
+            tasks += 1
+            idle_since = time()
+        return tasks
+
+    @contextmanager
+    def _heartbeat(self, meta_engine: Engine, queue_id: int) -> Iterator[None]:
+        """Keep the lease on a claimed ETLStep run by refreshing its heartbeat in a thread while it runs."""
+        table = ETLStepQueueEntity.__table__
+        statement = update(table).where(table.c.id == queue_id).values(heartbeat_at=func.now())
+        stopped = Event()
+
+        def beat() -> None:
+            while not stopped.wait(self.heartbeat_interval):
+                try:
+                    with meta_engine.begin() as connection:
+                        connection.execute(statement)
+                except Exception:
+                    self._logger.exception(f'Worker {self.name} failed to send a heartbeat')
+
+        thread = Thread(target=beat, name='dbgen-worker-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def _finish(
+        self, meta_engine: Engine, queue_id: int, return_code: Optional[int], error: Optional[str]
+    ) -> None:
+        table = ETLStepQueueEntity.__table__
+        # The coordinator fails queued runs whose lease expired, those are left as it marked them
+        statement = (
+            update(table)
+            .where(table.c.id == queue_id, table.c.status == Status.running, table.c.worker == self.name)
+            .values(
+                status=Status.completed if error is None else Status.failed,
+                return_code=return_code,
+                error=error,
+                finished_at=func.now(),
+            )
+        )
+        with meta_engine.begin() as connection:
+            if not connection.execute(statement).rowcount:
+                self._logger.warning(f'Worker {self.name} lost its claim on queued etl_step {queue_id}')
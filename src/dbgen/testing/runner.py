@@ -18,14 +18,15 @@ from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
 from uuid import UUID
 
 from pydantic import PrivateAttr
-from pydasher import hasher
 
 from dbgen._enum import RunStatus
-from dbgen.core.base import Base, encoders
+from dbgen.core.base import Base
 from dbgen.core.etl_step import ETLStep
 from dbgen.core.model_settings import BaseModelSettings
 from dbgen.core.node.extract import Extract
 from dbgen.core.run.utilities import RunConfig
+from dbgen.utils.hashing import get_input_hasher
+from dbgen.utils.typing import ROWS_TO_LOAD_TYPE
 
 
 class TestRunResults(Base):
@@ -75,7 +76,7 @@ class ETLStepTestRunner(Base):
                 results.status = RunStatus.completed
         return results
 
-    def _fake_load(self, etl_step: ETLStep, rows_to_load: Dict[str, Dict[UUID, Any]]):
+    def _fake_load(self, etl_step: ETLStep, rows_to_load: ROWS_TO_LOAD_TYPE):
         for load in etl_step._sorted_loads():
             self._logger.debug(f'Loading into {load}')
             rows = rows_to_load[load.hash]
@@ -85,7 +86,7 @@ class ETLStepTestRunner(Base):
     def transform_batch(self, batch: List[Tuple[UUID, Dict[str, Dict[str, Any]]]], run_config: 'RunConfig'):
         """Transform a batch of extracted namespaces."""
         # initialize the master dict for the rows that will need to be loaded after
-        rows_to_load: Dict[str, Dict[UUID, dict]] = {node.hash: {} for node in self._etl_step.loads}
+        rows_to_load: ROWS_TO_LOAD_TYPE = {node.hash: node.new_buffer() for node in self._etl_step.loads}
         processed_hashes = []
         inputs_skipped = 0
         for input_hash, row in batch:
@@ -122,5 +123,5 @@ class ETLStepTestRunner(Base):
 
     def _get_hash(self, extracted_dict: Dict[str, Any], etl_step_uuid: UUID) -> UUID:
         # Convert Row to a dictionary so we can hash it for repeat-checking
-        input_hash = UUID(hasher((etl_step_uuid, extracted_dict), encoders=encoders))
+        input_hash = get_input_hasher()(etl_step_uuid, extracted_dict)
         return input_hash
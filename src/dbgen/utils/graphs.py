@@ -12,8 +12,9 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pprint import pformat
-from typing import Any, Callable, Dict, List, Set, Tuple, Union
+from typing import Any, Callable, Dict, List, Sequence, Set, Tuple, Union
 from uuid import UUID
 
 from networkx import DiGraph, NetworkXUnfeasible
@@ -36,6 +37,44 @@ def topsort_with_dict(G: DiGraph) -> List:
         raise ValueError(f"Cycles found: {cycles}")
 
 
+def run_graph_in_parallel(
+    G: DiGraph,
+    order: Sequence[str],
+    run_node: Callable[[str], Any],
+    on_done: Callable[[str, Any], bool],
+    workers: int,
+) -> None:
+    """
+    Run each node in a thread once all of its predecessors have finished, at most `workers` nodes at a time.
+
+    Ready nodes are started in the given order. `on_done` is called from the calling thread with each node's
+    result and returning False stops any further nodes from starting while the running ones finish.
+    """
+    nodes = set(order)
+    waiting_on = {node: set(G.predecessors(node)) & nodes for node in order}
+    started: Set[str] = set()
+    running: Dict['Future[Any]', str] = {}
+    stopped = False
+    with ThreadPoolExecutor(workers, thread_name_prefix='dbgen-etl-step') as pool:
+        while True:
+            for node in order:
+                if stopped or len(running) >= workers:
+                    break
+                if node not in started and not waiting_on[node]:
+                    started.add(node)
+                    running[pool.submit(run_node, node)] = node
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                if not on_done(node, future.result()):
+                    stopped = True
+                for successor in G.successors(node):
+                    if successor in waiting_on:
+                        waiting_on[successor].discard(node)
+
+
 class SerializedNode(BaseModel):
     id: UUID
     name: str
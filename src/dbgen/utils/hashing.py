@@ -0,0 +1,251 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Stable hashing of extracted rows and identifying values into UUIDs.
+
+The legacy scheme serializes values to canonical JSON with pydasher and takes the md5 digest.
+The fast scheme writes values into a typed, length prefixed binary encoding and takes a 16 byte
+blake2b digest, which avoids building the intermediate JSON documents. The two schemes produce
+different UUIDs so the scheme in use is part of the identity of stored repeats and entity ids.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from enum import Enum
+from hashlib import blake2b
+from pathlib import PurePath
+from struct import Struct
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+from uuid import UUID
+
+from pydasher import hasher
+
+from dbgen.configuration import HashingType, config
+from dbgen.core.base import encoders
+
+_length = Struct('>I')
+_double = Struct('>d')
+
+
+def _encode_none(_: None, buffer: bytearray) -> None:
+    buffer += b'N'
+
+
+def _encode_bool(value: bool, buffer: bytearray) -> None:
+    buffer += b'T' if value else b'F'
+
+
+def _encode_int(value: int, buffer: bytearray) -> None:
+    payload = value.to_bytes((value.bit_length() + 8) // 8, 'big', signed=True)
+    buffer += b'i'
+    buffer += _length.pack(len(payload))
+    buffer += payload
+
+
+def _encode_float(value: float, buffer: bytearray) -> None:
+    buffer += b'f'
+    buffer += _double.pack(value)
+
+
+def _encode_tagged_text(tag: bytes, text: str, buffer: bytearray) -> None:
+    payload = text.encode('utf-8')
+    buffer += tag
+    buffer += _length.pack(len(payload))
+    buffer += payload
+
+
+def _encode_str(value: str, buffer: bytearray) -> None:
+    _encode_tagged_text(b's', value, buffer)
+
+
+def _encode_datetime(value: datetime, buffer: bytearray) -> None:
+    _encode_tagged_text(b'D', value.isoformat(), buffer)
+
+
+def _encode_date(value: date, buffer: bytearray) -> None:
+    _encode_tagged_text(b'd', value.isoformat(), buffer)
+
+
+def _encode_time(value: time, buffer: bytearray) -> None:
+    _encode_tagged_text(b't', value.isoformat(), buffer)
+
+
+def _encode_decimal(value: Decimal, buffer: bytearray) -> None:
+    _encode_tagged_text(b'n', str(value), buffer)
+
+
+def _encode_path(value: PurePath, buffer: bytearray) -> None:
+    _encode_tagged_text(b'p', str(value), buffer)
+
+
+def _encode_bytes(value: bytes, buffer: bytearray) -> None:
+    buffer += b'b'
+    buffer += _length.pack(len(value))
+    buffer += value
+
+
+def _encode_uuid(value: UUID, buffer: bytearray) -> None:
+    buffer += b'u'
+    buffer += value.bytes
+
+
+def _encode_timedelta(value: timedelta, buffer: bytearray) -> None:
+    buffer += b'r'
+    buffer += _double.pack(value.total_seconds())
+
+
+def _encode_sequence(tag: bytes) -> Callable[[Any, bytearray], None]:
+    def encode(value: Any, buffer: bytearray) -> None:
+        buffer += tag
+        buffer += _length.pack(len(value))
+        for item in value:
+            _encode(item, buffer)
+
+    return encode
+
+
+_encode_list = _encode_sequence(b'l')
+_encode_tuple = _encode_sequence(b'(')
+
+
+def _encode_set(value: Any, buffer: bytearray) -> None:
+    # Sets have no inherent order so the encoded elements are sorted for a stable hash
+    buffer += b'S'
+    buffer += _length.pack(len(value))
+    for item in sorted(encode_value(item) for item in value):
+        buffer += item
+
+
+def _encode_dict(value: Mapping[str, Any], buffer: bytearray) -> None:
+    buffer += b'{'
+    buffer += _length.pack(len(value))
+    for key in sorted(value):
+        if not isinstance(key, str):
+            raise TypeError(f"Cannot hash dictionaries with non string keys: {value}")
+        _encode_str(key, buffer)
+        _encode(value[key], buffer)
+
+
+def _type_name(value: Any) -> str:
+    return f'{type(value).__module__}.{type(value).__qualname__}'
+
+
+def _encode_enum(value: Enum, buffer: bytearray) -> None:
+    _encode_tagged_text(b'e', _type_name(value), buffer)
+    _encode(value.value, buffer)
+
+
+_ENCODERS: Dict[Type[Any], Callable[[Any, bytearray], None]] = {
+    type(None): _encode_none,
+    bool: _encode_bool,
+    int: _encode_int,
+    float: _encode_float,
+    str: _encode_str,
+    bytes: _encode_bytes,
+    UUID: _encode_uuid,
+    datetime: _encode_datetime,
+    date: _encode_date,
+    time: _encode_time,
+    timedelta: _encode_timedelta,
+    Decimal: _encode_decimal,
+    list: _encode_list,
+    tuple: _encode_tuple,
+    set: _encode_set,
+    frozenset: _encode_set,
+    dict: _encode_dict,
+}
+# Checked in order for subclasses of the supported types, bool must precede int
+_SUBCLASS_ENCODERS: Tuple[Tuple[Type[Any], Callable[[Any, bytearray], None]], ...] = (
+    (Enum, _encode_enum),
+    (bool, _encode_bool),
+    (int, _encode_int),
+    (float, _encode_float),
+    (str, _encode_str),
+    (datetime, _encode_datetime),
+    (date, _encode_date),
+    (PurePath, _encode_path),
+    (UUID, _encode_uuid),
+    (Mapping, _encode_dict),
+    (list, _encode_list),
+    (tuple, _encode_tuple),
+)
+
+
+def _encode(value: Any, buffer: bytearray) -> None:
+    encoder = _ENCODERS.get(type(value))
+    if encoder is not None:
+        encoder(value, buffer)
+        return
+    for base_type, encoder in _SUBCLASS_ENCODERS:
+        if isinstance(value, base_type):
+            encoder(value, buffer)
+            return
+    if type(value) in encoders:
+        _encode_tagged_text(b'x', _type_name(value), buffer)
+        _encode(encoders[type(value)](value), buffer)
+        return
+    raise TypeError(f"Unknown type found when hashing:\n{value!r}\n{type(value)}")
+
+
+def encode_value(value: Any) -> bytes:
+    """Encode a value into the canonical binary form used by the fast hashing scheme."""
+    buffer = bytearray()
+    _encode(value, buffer)
+    return bytes(buffer)
+
+
+def fast_hash(value: Any) -> UUID:
+    return UUID(bytes=blake2b(encode_value(value), digest_size=16).digest())
+
+
+def legacy_hash(value: Any) -> UUID:
+    return UUID(hasher(value))
+
+
+def fast_input_hash(etl_step_uuid: UUID, row: Mapping[str, Any]) -> UUID:
+    buffer = bytearray()
+    _encode_uuid(etl_step_uuid, buffer)
+    _encode_dict(row, buffer)
+    return UUID(bytes=blake2b(buffer, digest_size=16).digest())
+
+
+def legacy_input_hash(etl_step_uuid: UUID, row: Mapping[str, Any]) -> UUID:
+    return UUID(hasher((etl_step_uuid, row), encoders=encoders))
+
+
+INPUT_HASHERS: Dict[HashingType, Callable[[UUID, Mapping[str, Any]], UUID]] = {
+    HashingType.LEGACY: legacy_input_hash,
+    HashingType.FAST: fast_input_hash,
+}
+VALUE_HASHERS: Dict[HashingType, Callable[[Any], UUID]] = {
+    HashingType.LEGACY: legacy_hash,
+    HashingType.FAST: fast_hash,
+}
+
+
+def get_input_hasher(hashing: Optional[HashingType] = None) -> Callable[[UUID, Mapping[str, Any]], UUID]:
+    """Get the function hashing an ETLStep's uuid and an extracted row into the row's input hash."""
+    return INPUT_HASHERS[HashingType(hashing or config.hashing)]
+
+
+def hash_inputs(
+    etl_step_uuid: UUID, rows: Sequence[Any], hashing: Optional[HashingType] = None
+) -> List[UUID]:
+    """Hash a batch of extracted rows into their input hashes, used to hash rows in worker processes."""
+    hash_input = get_input_hasher(hashing)
+    return [hash_input(etl_step_uuid, row) for row in rows]
+
+
+def get_value_hasher(hashing: Optional[HashingType] = None) -> Callable[[Any], UUID]:
+    """Get the function hashing the identifying values of an entity into its primary key."""
+    return VALUE_HASHERS[HashingType(hashing or config.hashing)]
@@ -12,10 +12,12 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+from collections import deque
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 from itertools import repeat
-from typing import Dict, Generator, Sequence, Set, Tuple, TypeVar, overload
+from typing import Deque, Dict, Generator, Iterator, Sequence, Set, Tuple, TypeVar, overload
 
 ##############################################################
 T = TypeVar("T")
@@ -119,3 +121,21 @@ def flatten(thing):
             yield from flatten(element)
         else:
             yield element
+
+
+def prefetch(iterator: Iterator[T], depth: int) -> Generator[T, None, None]:
+    """Advance an iterator in a background thread, staying up to depth items ahead of the consumer."""
+    sentinel = object()
+    with ThreadPoolExecutor(1, thread_name_prefix='dbgen-prefetch') as executor:
+        # A single worker advances the iterator so the submitted calls run one at a time and in order
+        pending: Deque = deque(executor.submit(next, iterator, sentinel) for _ in range(max(depth, 1)))
+        try:
+            while True:
+                item = pending.popleft().result()
+                if item is sentinel:
+                    return
+                pending.append(executor.submit(next, iterator, sentinel))
+                yield item
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,89 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+"""Column oriented container for the rows a Load has queued for the database."""
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+from uuid import UUID
+
+
+class LoadBuffer(Mapping[UUID, Tuple[Any, ...]]):
+    """
+    Stores the rows waiting to be loaded by a Load as one list per column alongside a list of primary keys.
+
+    Adding a row with a primary key that is already in the buffer overwrites the stored values in place, so the
+    buffer keeps the last-write-wins semantics of a dictionary keyed by primary key. The buffer behaves as a
+    read-only mapping from primary key to the tuple of column values.
+    """
+
+    __slots__ = ('primary_keys', 'columns', '_index')
+
+    def __init__(self, num_columns: int) -> None:
+        self.primary_keys: List[UUID] = []
+        self.columns: List[List[Any]] = [[] for _ in range(num_columns)]
+        self._index: Optional[Dict[UUID, int]] = {}
+
+    def _get_index(self) -> Dict[UUID, int]:
+        # The index is not pickled so it is rebuilt the first time an unpickled buffer is modified
+        if self._index is None:
+            self._index = {primary_key: i for i, primary_key in enumerate(self.primary_keys)}
+        return self._index
+
+    def append(self, primary_key: UUID, values: Sequence[Any]) -> None:
+        self.extend([primary_key], [[value] for value in values])
+
+    def extend(self, primary_keys: Sequence[UUID], columns: Sequence[Sequence[Any]]) -> None:
+        """Add a batch of rows given as a list of primary keys and one sequence of values per column."""
+        if len(columns) != len(self.columns):
+            raise ValueError(f"Expected {len(self.columns)} columns but received {len(columns)}")
+        index = self._get_index()
+        for row_number, primary_key in enumerate(primary_keys):
+            position = index.get(primary_key)
+            if position is None:
+                index[primary_key] = len(self.primary_keys)
+                self.primary_keys.append(primary_key)
+                for column, values in zip(self.columns, columns):
+                    column.append(values[row_number])
+            else:
+                for column, values in zip(self.columns, columns):
+                    column[position] = values[row_number]
+
+    def merge(self, other: 'LoadBuffer') -> None:
+        """Add the rows of another buffer, its values take precedence for shared primary keys."""
+        self.extend(other.primary_keys, other.columns)
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        """Iterate over the rows as (primary_key, *values) tuples ready to be copied into the database."""
+        return zip(self.primary_keys, *self.columns)
+
+    def __getitem__(self, primary_key: UUID) -> Tuple[Any, ...]:
+        position = self._get_index()[primary_key]
+        return tuple(column[position] for column in self.columns)
+
+    def __iter__(self) -> Iterator[UUID]:
+        return iter(self.primary_keys)
+
+    def __len__(self) -> int:
+        return len(self.primary_keys)
+
+    def __repr__(self) -> str:
+        return f"LoadBuffer<{len(self.primary_keys)} rows, {len(self.columns)} columns>"
+
+    def __getstate__(self) -> Tuple[bytes, List[List[Any]]]:
+        # Pack the primary keys into a single bytes object as pickling many UUID objects is expensive
+        return (b''.join(primary_key.bytes for primary_key in self.primary_keys), self.columns)
+
+    def __setstate__(self, state: Tuple[bytes, List[List[Any]]]) -> None:
+        packed_keys, self.columns = state
+        self.primary_keys = [UUID(bytes=packed_keys[i : i + 16]) for i in range(0, len(packed_keys), 16)]
+        self._index = None
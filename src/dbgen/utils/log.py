@@ -54,18 +54,22 @@ class LogLevel(str, Enum):
 
 def capture_stdout(func):
     def wrapped(*args, **kwargs):
-        logger = logging.getLogger(f"dbgen.pyblock.{func.name}")
-        stream = StringIO()
-        with contextlib.redirect_stdout(stream):
-            output = func(*args, **kwargs)
-        stdout = stream.getvalue().strip()
-        if stdout:
-            logger.debug(stdout)
-        return output
+        return call_capturing_stdout(logging.getLogger(f"dbgen.pyblock.{func.name}"), func, *args, **kwargs)
 
     return wrapped
 
 
+def call_capturing_stdout(logger: Logger, func, *args, **kwargs):
+    """Call a function, logging what it prints to stdout at DEBUG on the logger."""
+    stream = StringIO()
+    with contextlib.redirect_stdout(stream):
+        output = func(*args, **kwargs)
+    stdout = stream.getvalue().strip()
+    if stdout:
+        logger.debug(stdout)
+    return output
+
+
 def setup_logger(
     level: LogLevel = LogLevel.DEBUG, std_out_level: LogLevel = LogLevel.INFO
 ) -> Tuple[Logger, RichHandler]:
@@ -13,15 +13,32 @@
 #   limitations under the License.
 
 """Methods related to fast copying to a postgresql database."""
-import asyncio
 import re
+from functools import partial
+from hashlib import md5
 from logging import getLogger
-from typing import TYPE_CHECKING, Any, Iterable, Mapping, Optional, Sequence, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 from uuid import UUID
+from weakref import WeakKeyDictionary
 
 from psycopg.errors import UndefinedColumn
 
+from dbgen.configuration import CopyFormat, LoadStrategy, config
 from dbgen.exceptions import DatabaseError
+from dbgen.utils.load_buffer import LoadBuffer
 
 if TYPE_CHECKING:
     from psycopg import AsyncConnection, Connection
@@ -32,14 +49,26 @@ if TYPE_CHECKING:
 MISSING_COLUMN_ERROR = "An ETLStep is trying to load into the entity {name!r}, however {column} does not exist. This commonly occurs when a column is added to an entity without being effectively synced with the database. An easy fix is to rerun the model with --build, if this is not possible you can manually add the column. If this column "
 MISSING_ID_ERROR = "An ETLStep is trying to load into the entity {name!r}, however {column} does not exist. This can occur when the entities in the model comes out of sync with the database. Since {column} is an identifying column of {name!r} the id hashes for the rows in the table will change when adding this column therefore you must rebuild the database with --build."
 
+# Staging tables created on each open connection mapped to the etl_step_id set as their default.
+# The tables are created with ON COMMIT DELETE ROWS so they can be reused by every batch on the connection
+_staging_tables: 'WeakKeyDictionary[Union[Connection, AsyncConnection], Dict[str, Optional[UUID]]]' = (
+    WeakKeyDictionary()
+)
+
 # SQL Statements for the get_statements function
 CREATE_TABLE_STATEMENT = """
-CREATE TEMPORARY TABLE {temp_table_name} AS
+CREATE TEMPORARY TABLE {temp_table_name}
+ON COMMIT DELETE ROWS AS
 TABLE {full_table_name}
 WITH NO DATA;
-ALTER TABLE {temp_table_name}
+"""
+# Only needed to keep the last of several rows with the same primary key when deduplicating
+AUTO_INC_STATEMENT = """ALTER TABLE {temp_table_name}
 ADD COLUMN auto_inc SERIAL NOT NULL;
 """
+SET_DEFAULT_STATEMENT = (
+    "ALTER TABLE {temp_table_name} ALTER COLUMN \"etl_step_id\" SET DEFAULT '{etl_step_id}'"
+)
 
 UPDATE_STATEMENT = """
 UPDATE
@@ -49,11 +78,11 @@ SET
 FROM
     {temp_table_name}
 WHERE
-    {full_table_name}.{table_primary_key_name} = {temp_table_name}.{table_primary_key_name};
+    {full_table_name}.{table_primary_key_name} = {temp_table_name}.{table_primary_key_name}{changed_condition};
 """
 
 INSERT_STATEMENT = """
-INSERT INTO {full_table_name}
+INSERT INTO {full_table_name} AS T
 ({all_columns_str})
 SELECT
 {all_columns_str}
@@ -69,33 +98,136 @@ WHERE
   DO
   UPDATE
   SET
-  {update_column_statement}
+  {update_column_statement}{conflict_condition}
   RETURNING
-    {table_primary_key_name}
+    (xmax = 0) AS inserted
 """
 
+UPSERT_STATEMENT = """
+INSERT INTO {full_table_name} AS T
+({all_columns_str})
+SELECT
+{all_columns_str}
+FROM
+  {temp_table_name}
+ON CONFLICT {conflict_key}
+  DO
+  UPDATE
+  SET
+  {update_column_statement}{conflict_condition}
+  RETURNING
+    (xmax = 0) AS inserted
+"""
+
+MERGE_STATEMENT = """
+MERGE INTO {full_table_name} AS T
+USING {temp_table_name} AS S
+ON {merge_condition}
+WHEN MATCHED{matched_condition} THEN
+  UPDATE SET {merge_update_statement}
+WHEN NOT MATCHED THEN
+  INSERT ({all_columns_str})
+  VALUES ({merge_values_str}){merge_returning}
+"""
+MERGE_RETURNING_STATEMENT = """
+RETURNING
+  merge_action() = 'INSERT' AS inserted"""
+# The first server versions supporting MERGE and RETURNING from a MERGE
+MERGE_SERVER_VERSION = 150000
+MERGE_RETURNING_SERVER_VERSION = 170000
+
+
+MAX_IDENTIFIER_LENGTH = 63
+# Types without an equality operator that are compared as jsonb when skipping unchanged rows
+JSON_TYPES = ('json', 'json[]')
+
 
 def escape_str(column: str):
     return f"\"{column}\""
 
 
+def resolve_load_strategy(load_strategy: Optional[LoadStrategy] = None) -> LoadStrategy:
+    """Resolve a load strategy, defaulting to the configured load_strategy."""
+    load_strategy = LoadStrategy(load_strategy or config.load_strategy)
+    # Rows are always staged from a mapping keyed by primary key so they are already unique
+    if load_strategy == LoadStrategy.AUTO:
+        return LoadStrategy.UPSERT
+    return load_strategy
+
+
+def _changed_condition(
+    target: str, source: str, columns: Sequence[str], json_columns: Mapping[str, str]
+) -> str:
+    """Get the condition that is true when any of the columns differ between the target and source rows."""
+    if not columns:
+        return 'FALSE'
+
+    def reference(table: str, column: str) -> str:
+        # json has no equality operator so it is compared as jsonb
+        if column in json_columns:
+            return f"{table}.{column}::{json_columns[column].replace('json', 'jsonb')}"
+        return f'{table}.{column}'
+
+    target_str = ', '.join(reference(target, column) for column in columns)
+    source_str = ', '.join(reference(source, column) for column in columns)
+    return f'ROW({target_str}) IS DISTINCT FROM ROW({source_str})'
+
+
+def get_temp_table_name(full_table_name: str, temp_table_suffix: str = '', dedup: bool = False) -> str:
+    sanitized_name = full_table_name.replace(".", "_").replace('"', '')
+    # Deduplicating staging tables have an extra auto_inc column so they are not shared with other strategies
+    temp_table_name = f'{sanitized_name}_temp_load_table' + ('_dedup' if dedup else '')
+    if temp_table_suffix:
+        temp_table_name += f'_{temp_table_suffix}'
+    # Postgres truncates long identifiers so shorten them without losing the suffix's uniqueness
+    if len(temp_table_name.encode('utf-8')) > MAX_IDENTIFIER_LENGTH:
+        temp_table_name = f"dbgen_temp_load_table_{md5(temp_table_name.encode('utf-8')).hexdigest()}"
+    return escape_str(temp_table_name)
+
+
 def _get_types(load_entity: 'LoadEntity', columns):
     oids = list(map(lambda x: load_entity.attributes[x], sorted(columns)))
     return oids
 
 
-def load_data(
-    data: Mapping[UUID, Sequence[Any]],
-    connection: 'Connection',
+def _iter_rows(data: Mapping[UUID, Sequence[Any]]) -> Iterator[Tuple[Any, ...]]:
+    """Iterate over the (primary_key, *values) rows of a mapping, streaming LoadBuffers column-wise."""
+    if isinstance(data, LoadBuffer):
+        return data.rows()
+    return ((pk_curr, *row_curr) for pk_curr, row_curr in data.items())
+
+
+class LoadResult(NamedTuple):
+    """The number of rows a load inserted and updated."""
+
+    inserted: int = 0
+    updated: int = 0
+
+
+class StagedLoad(NamedTuple):
+    """A staging table prepared on a connection with the statements to fill it and merge it into its table."""
+
+    load_entity: 'LoadEntity'
+    columns: List[str]
+    insert: bool
+    temp_table_name: str
+    copy_statement: str
+    load_statement: str
+
+
+def _staging_statements(
+    connection: Union['Connection', 'AsyncConnection'],
     load_entity: 'LoadEntity',
     columns: Iterable[str],
     insert: bool,
-    temp_table_suffix: str = '',
-    etl_step_id: Optional[UUID] = None,
-) -> int:
-    # Setup the logger
-    logger = getLogger(f'dbgen.load.{load_entity.name}')
-    # Get the SQL Statements for this load
+    temp_table_suffix: str,
+    etl_step_id: Optional[UUID],
+    copy_format: Optional[CopyFormat],
+    load_strategy: Optional[LoadStrategy],
+    skip_unchanged: Optional[bool],
+) -> Tuple[StagedLoad, List[str]]:
+    """Get the staged load and the statements needed to create or update its staging table on the connection."""
+    columns = list(columns)
     create_statement, drop_statement, copy_statement, load_statement = get_statements(
         load_entity.name,
         load_entity.full_name,
@@ -104,110 +236,284 @@ def load_data(
         columns,
         temp_table_suffix=temp_table_suffix,
         etl_step_id=etl_step_id,
+        copy_format=copy_format,
+        load_strategy=load_strategy,
+        skip_unchanged=skip_unchanged,
+        server_version=connection.info.server_version,
+        json_columns={
+            column: load_entity.attributes[column]
+            for column in columns
+            if load_entity.attributes.get(column) in JSON_TYPES
+        },
     )
-    # Drop the Create the Temporary table
-    logger.debug('creating temp table')
-    with connection.cursor() as cur:
-        cur.execute(drop_statement)
-        cur.execute(create_statement)
-    connection.commit()
+    load_strategy = resolve_load_strategy(load_strategy)
+    if load_strategy == LoadStrategy.MERGE and connection.info.server_version < MERGE_SERVER_VERSION:
+        raise DatabaseError(
+            "The merge load strategy requires postgres 15 or later, "
+            f"the server version is {connection.info.server_version}"
+        )
+    temp_table_name = get_temp_table_name(
+        load_entity.full_name, temp_table_suffix, dedup=load_strategy == LoadStrategy.DEDUP
+    )
+    staged_load = StagedLoad(load_entity, columns, insert, temp_table_name, copy_statement, load_statement)
+    staging_tables = _staging_tables.setdefault(connection, {})
+    # Create the staging table the first time this connection loads into it
+    if temp_table_name not in staging_tables:
+        setup_statements = [drop_statement, create_statement]
+    elif etl_step_id is not None and staging_tables[temp_table_name] != etl_step_id:
+        setup_statements = [
+            SET_DEFAULT_STATEMENT.format(temp_table_name=temp_table_name, etl_step_id=etl_step_id)
+        ]
+    else:
+        setup_statements = []
+    staging_tables.setdefault(temp_table_name, etl_step_id)
+    return staged_load, setup_statements
+
+
+def _missing_column_error(staged_load: StagedLoad, connection, exc: UndefinedColumn) -> DatabaseError:
+    # The staging table may be stale so recreate it on the next load
+    _staging_tables.get(connection, {}).pop(staged_load.temp_table_name, None)
+    # Try to match the column name to give helpful error messages
+    load_entity = staged_load.load_entity
+    match = re.match('column \"(\\w+)\"', str(exc))
+    column = None
+    if match:
+        (column,) = match.groups()
+        column_str = f'the column {column!r}'
+    else:
+        column_str = 'a column'
+    if column in load_entity.identifiers:
+        return DatabaseError(MISSING_ID_ERROR.format(name=load_entity.name, column=column_str))
+    return DatabaseError(MISSING_COLUMN_ERROR.format(name=load_entity.name, column=column_str))
 
+
+def prepare_load(
+    connection: 'Connection',
+    load_entity: 'LoadEntity',
+    columns: Iterable[str],
+    insert: bool,
+    temp_table_suffix: str = '',
+    etl_step_id: Optional[UUID] = None,
+    copy_format: Optional[CopyFormat] = None,
+    load_strategy: Optional[LoadStrategy] = None,
+    skip_unchanged: Optional[bool] = None,
+) -> StagedLoad:
+    """Make sure the staging table of a load exists on the connection, committing if it had to be modified."""
+    staged_load, setup_statements = _staging_statements(
+        connection,
+        load_entity,
+        columns,
+        insert,
+        temp_table_suffix,
+        etl_step_id,
+        copy_format,
+        load_strategy,
+        skip_unchanged,
+    )
+    if setup_statements:
+        getLogger(f'dbgen.load.{load_entity.name}').debug('creating temp table')
+        try:
+            with connection.cursor() as cur:
+                for statement in setup_statements:
+                    cur.execute(statement)
+            connection.commit()
+        except BaseException:
+            _staging_tables[connection].pop(staged_load.temp_table_name, None)
+            raise
+        _staging_tables[connection][staged_load.temp_table_name] = etl_step_id
+    return staged_load
+
+
+def copy_data(connection: 'Connection', staged_load: StagedLoad, data: Mapping[UUID, Sequence[Any]]) -> None:
+    """Copy the rows into the staging table without committing."""
+    load_entity = staged_load.load_entity
     with connection.cursor() as cur:
-        logger.debug("load into temporary table")
         try:
-            with cur.copy(copy_statement) as copy:
-                oids = _get_types(load_entity, [load_entity.primary_key_name] + list(columns))
-                copy.set_types(oids)
-                for pk_curr, row_curr in data.items():
-                    copy.write_row((pk_curr, *row_curr))
+            with cur.copy(staged_load.copy_statement) as copy:
+                copy.set_types(_get_types(load_entity, [load_entity.primary_key_name] + staged_load.columns))
+                for row in _iter_rows(data):
+                    copy.write_row(row)
         except UndefinedColumn as exc:
-            # Try to match the column name to give helpful error messages
-            match = re.match('column \"(\\w+)\"', str(exc))
-            if match:
-                (column,) = match.groups()
-                column_str = f'the column {column!r}'
-            else:
-                column_str = 'a column'
-
-            if column in load_entity.identifiers:
-                raise DatabaseError(MISSING_ID_ERROR.format(name=load_entity.name, column=column_str))
-            raise DatabaseError(
-                MISSING_COLUMN_ERROR.format(name=load_entity.name, column=column_str)
-            ) from exc
-        # Try to insert everything from the temp table into the real table
-        # If a foreign_key violation is hit, we delete those rows in the
-        # temp table and move on
-        logger.debug("transfer from temp table to main table")
-        cur.execute(load_statement)
-        logger.debug("Dropping temp table...")
-        cur.execute(drop_statement)
-    connection.commit()
-    logger.debug("loading finished")
-    return len(data)
+            raise _missing_column_error(staged_load, connection, exc) from exc
 
 
-async def async_load_data(
+def _merge_statement(staged_loads: Sequence[StagedLoad]) -> str:
+    return ';\n'.join(staged_load.load_statement.strip().rstrip(';') for staged_load in staged_loads)
+
+
+def _load_result(staged_load: StagedLoad, rowcount: int, rows: Optional[List[Tuple[bool]]]) -> LoadResult:
+    # Inserts return whether each changed row was inserted (xmax = 0) or updated
+    if rows is not None:
+        inserted = sum(1 for (row_inserted,) in rows if row_inserted)
+        return LoadResult(inserted, len(rows) - inserted)
+    # Merges on servers without RETURNING support only report the number of rows changed
+    if staged_load.insert:
+        return LoadResult(inserted=rowcount)
+    return LoadResult(updated=rowcount)
+
+
+def merge_data(connection: 'Connection', staged_loads: Sequence[StagedLoad]) -> List[LoadResult]:
+    """
+    Merge the staging tables into their tables in order with a single round trip, without committing.
+
+    Returns the number of rows inserted and updated by each staged load.
+    """
+    if not staged_loads:
+        return []
+    results = []
+    with connection.cursor() as cur:
+        cur.execute(_merge_statement(staged_loads))
+        # Each statement has its own result set
+        for staged_load in staged_loads:
+            rows = cur.fetchall() if cur.description else None
+            results.append(_load_result(staged_load, cur.rowcount, rows))
+            cur.nextset()
+    return results
+
+
+def load_data(
     data: Mapping[UUID, Sequence[Any]],
-    connection: 'AsyncConnection',
+    connection: 'Connection',
     load_entity: 'LoadEntity',
     columns: Iterable[str],
     insert: bool,
     temp_table_suffix: str = '',
     etl_step_id: Optional[UUID] = None,
-) -> int:
+    copy_format: Optional[CopyFormat] = None,
+    load_strategy: Optional[LoadStrategy] = None,
+    skip_unchanged: Optional[bool] = None,
+) -> LoadResult:
     # Setup the logger
-    logger = getLogger(f'dbgen.async_load.{load_entity.name}')
-    task = asyncio.current_task()
-    # Get the SQL Statements for this load
-    create_statement, drop_statement, copy_statement, load_statement = get_statements(
-        load_entity.name,
-        load_entity.full_name,
-        load_entity.primary_key_name,
+    logger = getLogger(f'dbgen.load.{load_entity.name}')
+    staged_load = prepare_load(
+        connection,
+        load_entity,
+        columns,
         insert,
+        temp_table_suffix,
+        etl_step_id,
+        copy_format,
+        load_strategy,
+        skip_unchanged,
+    )
+    logger.debug("load into temporary table")
+    copy_data(connection, staged_load, data)
+    # Insert or update everything from the temp table into the real table
+    logger.debug("transfer from temp table to main table")
+    (result,) = merge_data(connection, [staged_load])
+    # Committing empties the staging table for the next batch
+    connection.commit()
+    logger.debug("loading finished")
+    return result
+
+
+async def async_prepare_load(
+    connection: 'AsyncConnection',
+    load_entity: 'LoadEntity',
+    columns: Iterable[str],
+    insert: bool,
+    temp_table_suffix: str = '',
+    etl_step_id: Optional[UUID] = None,
+    copy_format: Optional[CopyFormat] = None,
+    load_strategy: Optional[LoadStrategy] = None,
+    skip_unchanged: Optional[bool] = None,
+) -> StagedLoad:
+    """Make sure the staging table of a load exists on the connection, committing if it had to be modified."""
+    staged_load, setup_statements = _staging_statements(
+        connection,
+        load_entity,
         columns,
-        temp_table_suffix=f'{temp_table_suffix}_{hash(task)}',
-        etl_step_id=etl_step_id,
+        insert,
+        temp_table_suffix,
+        etl_step_id,
+        copy_format,
+        load_strategy,
+        skip_unchanged,
     )
-    # Drop the Create the Temporary table
-    logger.debug('creating temp table')
-    async with connection.cursor() as cur:
-        await cur.execute(drop_statement)
-        logger.debug(create_statement)
-        await cur.execute(create_statement)
-    await connection.commit()
+    if setup_statements:
+        getLogger(f'dbgen.async_load.{load_entity.name}').debug('creating temp table')
+        try:
+            async with connection.cursor() as cur:
+                for statement in setup_statements:
+                    await cur.execute(statement)
+            await connection.commit()
+        except BaseException:
+            _staging_tables[connection].pop(staged_load.temp_table_name, None)
+            raise
+        _staging_tables[connection][staged_load.temp_table_name] = etl_step_id
+    return staged_load
+
 
+async def async_copy_data(
+    connection: 'AsyncConnection', staged_load: StagedLoad, data: Mapping[UUID, Sequence[Any]]
+) -> None:
+    """Copy the rows into the staging table without committing."""
+    load_entity = staged_load.load_entity
     async with connection.cursor() as cur:
-        logger.debug("load into temporary table")
         try:
-            async with cur.copy(copy_statement) as copy:
-                oids = _get_types(load_entity, [load_entity.primary_key_name] + list(columns))
-                copy.set_types(oids)
-                for pk_curr, row_curr in data.items():
-                    await copy.write_row((pk_curr, *row_curr))
+            async with cur.copy(staged_load.copy_statement) as copy:
+                copy.set_types(_get_types(load_entity, [load_entity.primary_key_name] + staged_load.columns))
+                for row in _iter_rows(data):
+                    await copy.write_row(row)
         except UndefinedColumn as exc:
-            # Try to match the column name to give helpful error messages
-            match = re.match('column \"(\\w+)\"', str(exc))
-            if match:
-                (column,) = match.groups()
-                column_str = f'the column {column!r}'
-            else:
-                column_str = 'a column'
-
-            if column in load_entity.identifiers:
-                raise DatabaseError(MISSING_ID_ERROR.format(name=load_entity.name, column=column_str))
-            raise DatabaseError(
-                MISSING_COLUMN_ERROR.format(name=load_entity.name, column=column_str)
-            ) from exc
-        # Try to insert everything from the temp table into the real table
-        # If a foreign_key violation is hit, we delete those rows in the
-        # temp table and move on
-        logger.debug("transfer from temp table to main table")
-        await cur.execute(load_statement)
-        logger.debug("Dropping temp table...")
-        await cur.execute(drop_statement)
+            raise _missing_column_error(staged_load, connection, exc) from exc
+
+
+async def async_merge_data(
+    connection: 'AsyncConnection', staged_loads: Sequence[StagedLoad]
+) -> List[LoadResult]:
+    """
+    Merge the staging tables into their tables in order with a single round trip, without committing.
+
+    Returns the number of rows inserted and updated by each staged load.
+    """
+    if not staged_loads:
+        return []
+    results = []
+    async with connection.cursor() as cur:
+        await cur.execute(_merge_statement(staged_loads))
+        # Each statement has its own result set
+        for staged_load in staged_loads:
+            rows = await cur.fetchall() if cur.description else None
+            results.append(_load_result(staged_load, cur.rowcount, rows))
+            cur.nextset()
+    return results
+
+
+async def async_load_data(
+    data: Mapping[UUID, Sequence[Any]],
+    connection: 'AsyncConnection',
+    load_entity: 'LoadEntity',
+    columns: Iterable[str],
+    insert: bool,
+    temp_table_suffix: str = '',
+    etl_step_id: Optional[UUID] = None,
+    copy_format: Optional[CopyFormat] = None,
+    load_strategy: Optional[LoadStrategy] = None,
+    skip_unchanged: Optional[bool] = None,
+) -> LoadResult:
+    # Setup the logger
+    logger = getLogger(f'dbgen.async_load.{load_entity.name}')
+    staged_load = await async_prepare_load(
+        connection,
+        load_entity,
+        columns,
+        insert,
+        temp_table_suffix,
+        etl_step_id,
+        copy_format,
+        load_strategy,
+        skip_unchanged,
+    )
+    logger.debug("load into temporary table")
+    await async_copy_data(connection, staged_load, data)
+    # Insert or update everything from the temp table into the real table
+    logger.debug("transfer from temp table to main table")
+    (result,) = await async_merge_data(connection, [staged_load])
+    # Committing empties the staging table for the next batch
     await connection.commit()
     logger.debug("loading finished")
-    return len(data)
+    return result
 
 
 def get_statements(
@@ -219,6 +525,11 @@ def get_statements(
     etl_step_id: Optional[UUID] = None,
     temp_table_suffix: str = '',
     partition_attribute: Optional[str] = None,
+    copy_format: Optional[CopyFormat] = None,
+    load_strategy: Optional[LoadStrategy] = None,
+    skip_unchanged: Optional[bool] = None,
+    json_columns: Optional[Mapping[str, str]] = None,
+    server_version: Optional[int] = None,
 ) -> Tuple[str, str, str, str]:
     """
     Generate the SQL statements relevant for bulk loading data into postgresql.sql
@@ -229,17 +540,21 @@ def get_statements(
         load_entity_hash (str): A unique hash for this loads
         insert (bool): Whether or not the statement should be update or inserted
         etl_step_id (UUID): The ETLStep UUID that is loading this data.sql
+        copy_format (CopyFormat): The format of the COPY statement, defaults to the configured copy_format
+        load_strategy (LoadStrategy): How inserted rows are merged into the table, defaults to the configured load_strategy
+        skip_unchanged (bool): Whether to leave rows whose values would not change untouched, defaults to the configured skip_unchanged
+        json_columns (Mapping[str, str]): The type names of the json and json[] columns, which are compared as jsonb
+        server_version (int): The version of the postgres server, merges only report inserted rows on postgres 17+
 
     Returns:
         Tuple[str, str, str]: The create_table, drop_table, and load statements
     """
     # create
-    sanitized_name = full_table_name.replace(".", "_").replace('"', '')
-    temp_table_name = f'{sanitized_name}_temp_load_table'
-    if temp_table_suffix:
-        temp_table_name += f'_{temp_table_suffix}'
-    temp_table_name = escape_str(temp_table_name)
-    all_columns = [escape_str(table_primary_key_name)] + list(sorted(map(escape_str, columns)))
+    load_strategy = resolve_load_strategy(load_strategy)
+    dedup = load_strategy == LoadStrategy.DEDUP
+    temp_table_name = get_temp_table_name(full_table_name, temp_table_suffix, dedup=dedup)
+    data_columns = list(sorted(map(escape_str, columns)))
+    all_columns = [escape_str(table_primary_key_name)] + data_columns
 
     create_statement = CREATE_TABLE_STATEMENT.format(
         temp_table_name=temp_table_name,
@@ -247,15 +562,19 @@ def get_statements(
         full_table_name=full_table_name,
         etl_step_id=etl_step_id,
     )
+    if dedup:
+        create_statement += AUTO_INC_STATEMENT.format(temp_table_name=temp_table_name)
     drop_statement = f"DROP TABLE IF EXISTS {temp_table_name}"
     # The Copy statement does not need to insert the ETLStep ID
     copy_columns_str = ', '.join(all_columns)
     copy_statement = f'COPY  {temp_table_name} ({copy_columns_str}) FROM STDIN'
+    if CopyFormat(copy_format or config.copy_format) == CopyFormat.BINARY:
+        copy_statement += ' (FORMAT BINARY)'
     # If an etl_step_id is provided add it as a default column on temp table so each row
     # modified by these statements track their id
     if etl_step_id is not None:
-        create_statement += (
-            f"ALTER TABLE {temp_table_name} ALTER COLUMN \"etl_step_id\" SET DEFAULT '{etl_step_id}'"
+        create_statement += SET_DEFAULT_STATEMENT.format(
+            temp_table_name=temp_table_name, etl_step_id=etl_step_id
         )
         all_columns.append(escape_str('etl_step_id'))
 
@@ -268,16 +587,46 @@ def get_statements(
         all_columns_str=', '.join(all_columns),
         column_str=', '.join(column_statement),
         order='ASC' if first else 'DESC',
+        changed_condition='',
+        conflict_condition='',
+        matched_condition='',
     )
+    # Only write rows whose values change to avoid dead tuples and WAL from no-op updates
+    if config.skip_unchanged if skip_unchanged is None else skip_unchanged:
+        escaped_json_columns = {
+            escape_str(column): type_name for column, type_name in (json_columns or {}).items()
+        }
+        changed_condition = partial(
+            _changed_condition, columns=data_columns, json_columns=escaped_json_columns
+        )
+        full_kwargs['changed_condition'] = f'\n    AND {changed_condition(full_table_name, temp_table_name)}'
+        full_kwargs['conflict_condition'] = f"\n  WHERE {changed_condition('T', 'excluded')}"
+        full_kwargs['matched_condition'] = f" AND {changed_condition('T', 'S')}"
 
-    if insert:
+    if insert and load_strategy == LoadStrategy.MERGE:
+        key_columns = [escape_str(table_primary_key_name)]
+        if partition_attribute:
+            key_columns.append(escape_str(partition_attribute))
+        full_kwargs['merge_condition'] = ' AND '.join(f'T.{column} = S.{column}' for column in key_columns)
+        full_kwargs['merge_update_statement'] = ', '.join(
+            f'{column} = S.{column}' for column in all_columns if column not in key_columns
+        )
+        full_kwargs['merge_values_str'] = ', '.join(f'S.{column}' for column in all_columns)
+        full_kwargs['merge_returning'] = (
+            MERGE_RETURNING_STATEMENT
+            if server_version is not None and server_version >= MERGE_RETURNING_SERVER_VERSION
+            else ''
+        )
+        load_statement = MERGE_STATEMENT.format(**full_kwargs)
+    elif insert:
         if partition_attribute:
             full_kwargs['conflict_key'] = f'("{table_primary_key_name}","{partition_attribute}")'
         else:
             full_kwargs['conflict_key'] = f'({escape_str(table_primary_key_name)})'
         update_column_statement = ', '.join([f'{column} = excluded.{column}' for column in all_columns])
         full_kwargs['update_column_statement'] = update_column_statement
-        load_statement = INSERT_STATEMENT.format(**full_kwargs)
+        insert_statement = INSERT_STATEMENT if dedup else UPSERT_STATEMENT
+        load_statement = insert_statement.format(**full_kwargs)
     else:
         load_statement = UPDATE_STATEMENT.format(**full_kwargs)
 
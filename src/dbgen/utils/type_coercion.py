@@ -22,7 +22,8 @@ from uuid import UUID
 
 from psycopg import adapters
 from psycopg.adapt import Dumper
-from psycopg.types.json import Jsonb, JsonbDumper, set_json_dumps
+from psycopg.pq import Format
+from psycopg.types.json import Json, Jsonb, JsonbDumper, JsonBinaryDumper, set_json_dumps
 
 
 # Utilities for converting types
@@ -74,6 +75,20 @@ class PathDumper(Dumper):
         return str(thing).encode(encoding='utf-8')
 
 
+# Binary counterparts of the dumpers above for binary parameters and binary COPY
+class DictBinaryDumper(DictDumper):
+    format = Format.BINARY
+
+    def dump(self, thing):
+        return JsonBinaryDumper(dict).dump(Json(thing))
+
+
+class PathBinaryDumper(PathDumper):
+    format = Format.BINARY
+
+
 # Set the adapters for dicts and json
 adapters.register_dumper(dict, DictDumper)
+adapters.register_dumper(dict, DictBinaryDumper)
 adapters.register_dumper(PosixPath, PathDumper)
+adapters.register_dumper(PosixPath, PathBinaryDumper)
@@ -13,13 +13,17 @@
 #   limitations under the License.
 
 """Store useful python type hints for use in project."""
-from typing import Any, Callable, Dict, Optional, Type, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
 from uuid import UUID
 
 import sqlalchemy.types as sa_types
 
+from dbgen.utils.load_buffer import LoadBuffer
+
 COLUMN_TYPE = Union[Type[sa_types.TypeEngine], sa_types.TypeEngine]
 NoArgAnyCallable = Callable[[], Any]
 IDType = Optional[UUID]
 NAMESPACE_TYPE = Dict[str, Dict[str, Any]]
-ROWS_TO_LOAD_TYPE = Dict[str, Dict[UUID, Any]]
+ROWS_TO_LOAD_TYPE = Dict[str, LoadBuffer]
+# The validated rows a Load assembles from one input along with their ids, None until they are hashed
+ASSEMBLED_ROWS_TYPE = Tuple[List[Dict[str, Any]], Optional[List[UUID]]]
@@ -0,0 +1,45 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from uuid import uuid4
+
+import pytest
+from faker import Faker
+
+from dbgen.configuration import HashingType
+from dbgen.utils.hashing import get_input_hasher
+
+pytestmark = pytest.mark.skip('performance tests')
+
+fake = Faker()
+etl_step_id = uuid4()
+rows = [
+    {
+        'id': i,
+        'name': fake.name(),
+        'address': fake.address(),
+        'created_at': fake.date_time(),
+        'score': fake.pyfloat(),
+        'tags': fake.words(5),
+        'active': fake.pybool(),
+    }
+    for i in range(10000)
+]
+
+
+@pytest.mark.parametrize('hashing', list(HashingType))
+def test_input_hashing(hashing, benchmark):
+    input_hasher = get_input_hasher(hashing)
+    benchmark.extra_info['rows'] = len(rows)
+    benchmark(lambda: [input_hasher(etl_step_id, row) for row in rows])
@@ -0,0 +1,61 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from typing import List
+from uuid import uuid4
+
+import pytest
+
+import tests.example.entities as entities
+from dbgen.core.args import Constant
+from dbgen.core.etl_step import ETLStep
+from dbgen.core.node.extract import Extract
+from dbgen.core.node.transforms import PythonTransform
+from dbgen.core.run.utilities import RunConfig
+
+pytestmark = pytest.mark.skip('performance tests')
+
+n_rows = 10000
+
+
+class LabelExtract(Extract[dict]):
+    outputs: List[str] = ['label', 'number']
+
+
+def add_suffix(label: str, suffix: str) -> str:
+    return f"{label}-{suffix}"
+
+
+def build_etl_step() -> ETLStep:
+    """An ETLStep of 10 nodes, an extract feeding a chain of 8 transforms into a load."""
+    extract = LabelExtract()
+    label = extract['label']
+    transforms = []
+    for i in range(8):
+        transform = PythonTransform(function=add_suffix, inputs=[label, Constant(str(i))])
+        transforms.append(transform)
+        label = transform['out']
+    load = entities.Child.load(insert=True, label=label, type=Constant('child_type'))
+    return ETLStep(name='benchmark', extract=extract, transforms=transforms, loads=[load])
+
+
+@pytest.mark.parametrize('planned', [True, False])
+def test_transform_batch(planned, benchmark):
+    etl_step = build_etl_step()
+    if not planned:
+        etl_step._plan, etl_step._plan_compiled = None, True
+    batch = [(uuid4(), {etl_step.extract.hash: {'label': str(i), 'number': i}}) for i in range(n_rows)]
+    run_config = RunConfig()
+    benchmark.extra_info['rows'] = n_rows
+    benchmark(etl_step.transform_batch, batch, run_config)
@@ -12,28 +12,48 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from random import shuffle
-from typing import Optional, cast
+from threading import Event
+from typing import List, Optional, cast
+from uuid import uuid4
 
 import pytest
+from sqlalchemy import create_engine
 from sqlalchemy.future import Engine
 from sqlmodel import Session, func, select
 
+import dbgen.core.run.async_run as async_run
 import tests.example.entities as entities
+from dbgen.configuration import HashingType, LogLevel, config
 from dbgen.core.args import Constant
+from dbgen.core.decorators import transform
 from dbgen.core.entity import Entity
 from dbgen.core.etl_step import ETLStep
 from dbgen.core.func import Import
 from dbgen.core.metadata import RunEntity
-from dbgen.core.node.load import Load
+from dbgen.core.node.extract import Extract
+from dbgen.core.node.load import Load, LoadEntity
 from dbgen.core.node.query import BaseQuery
 from dbgen.core.node.transforms import PythonTransform
+from dbgen.core.run.async_run import AsyncETLStepExecutor, ETLStepRegistry
+from dbgen.core.run.utilities import RunConfig
+from dbgen.utils.hashing import hash_inputs
 
 
 def transform_func(x):
     return f"{x}-child"
 
 
+class LetterExtract(Extract[str]):
+    outputs: List[str] = ['char']
+
+    def extract(self):
+        yield from 'abcde'
+
+
 @pytest.fixture(scope='function')
 def basic_etl_step() -> ETLStep:
     Parent = entities.Parent
@@ -155,3 +175,259 @@ def test_dumb_extractor(connection, sql_engine, clear_registry, recreate_meta):
             select(func.count(TestUser.id)).where(TestUser.label + '-child' == TestUser.new_label)
         ).one()
         assert current_count == num_users
+
+
+def test_async_extraction_waits_for_memory(basic_etl_step: ETLStep):
+    executor = AsyncETLStepExecutor(etl_step=basic_etl_step, run_config=RunConfig(memory_limit=1))
+
+    async def wait_for_memory():
+        memory_available = asyncio.Event()
+        queue: asyncio.Queue = asyncio.Queue()
+        await queue.put(None)
+        waiter = asyncio.create_task(executor._wait_for_memory(memory_available, queue))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        memory_available.set()
+        await asyncio.wait_for(waiter, timeout=1)
+        # Extraction resumes once the downstream queues drain so the run can't stall
+        memory_available.clear()
+        await asyncio.wait_for(executor._wait_for_memory(memory_available, asyncio.Queue()), timeout=1)
+
+    asyncio.run(wait_for_memory())
+
+
+def test_async_extractor_enqueues_batches(basic_etl_step: ETLStep):
+    executor = AsyncETLStepExecutor(etl_step=basic_etl_step, run_config=RunConfig())
+
+    async def extract_batches():
+        queue: asyncio.Queue = asyncio.Queue()
+        counts = await executor.extractor(
+            LetterExtract(), queue, asyncio.Queue(), '', 2, None, basic_etl_step.uuid, retry=False
+        )
+        return counts, [queue.get_nowait() for _ in range(queue.qsize())]
+
+    counts, batches = asyncio.run(extract_batches())
+    assert counts == (5, 5, 5)
+    assert [len(batch) for batch in batches[:-1]] == [2, 2, 1]
+    assert batches[-1] is None
+
+
+def test_async_extractor_hashes_in_executor(basic_etl_step: ETLStep):
+    executor = AsyncETLStepExecutor(etl_step=basic_etl_step, run_config=RunConfig(hash_in_workers=True))
+
+    async def extract_batches():
+        queue: asyncio.Queue = asyncio.Queue()
+        with ThreadPoolExecutor(1) as hash_executor:
+            await executor.extractor(
+                LetterExtract(),
+                queue,
+                asyncio.Queue(),
+                '',
+                5,
+                None,
+                basic_etl_step.uuid,
+                retry=False,
+                hash_executor=hash_executor,
+            )
+        return queue.get_nowait()
+
+    batch = asyncio.run(extract_batches())
+    # Rows hashed by the workers are queued unprocessed for transform_raw_batch
+    assert [row for _, row in batch] == list('abcde')
+    assert [input_hash for input_hash, _ in batch] == [
+        executor._check_repeat(row, basic_etl_step.uuid)[1] for row in 'abcde'
+    ]
+
+
+def test_async_extractor_hashes_batches_concurrently(basic_etl_step: ETLStep, monkeypatch):
+    executor = AsyncETLStepExecutor(etl_step=basic_etl_step, run_config=RunConfig(hash_in_workers=True))
+    both_hashing = Event()
+
+    def hash_with_next_batch(etl_step_id, rows, hashing):
+        # The first batch only finishes once the second batch is hashing alongside it
+        if rows[0] == 'a':
+            assert both_hashing.wait(timeout=5)
+        else:
+            both_hashing.set()
+        return hash_inputs(etl_step_id, rows, hashing)
+
+    monkeypatch.setattr(async_run, 'hash_inputs', hash_with_next_batch)
+
+    async def extract_batches():
+        queue: asyncio.Queue = asyncio.Queue()
+        with ThreadPoolExecutor(2) as hash_executor:
+            counts = await executor.extractor(
+                LetterExtract(),
+                queue,
+                asyncio.Queue(),
+                '',
+                2,
+                None,
+                basic_etl_step.uuid,
+                retry=False,
+                hash_executor=hash_executor,
+            )
+        return counts, [queue.get_nowait() for _ in range(queue.qsize())]
+
+    counts, batches = asyncio.run(extract_batches())
+    assert counts == (5, 5, 5)
+    # Batches are still queued in the order they were extracted
+    assert [[row for _, row in batch] for batch in batches[:-1]] == [['a', 'b'], ['c', 'd'], ['e']]
+    assert batches[-1] is None
+
+
+def test_worker_caches_etl_steps(basic_etl_step: ETLStep, monkeypatch):
+    registry = ETLStepRegistry()
+    registry.register(basic_etl_step)
+    monkeypatch.setattr(async_run, '_worker_registry', registry.directory)
+    monkeypatch.setattr(async_run, '_worker_etl_steps', {})
+    input_hash = basic_etl_step.uuid
+    batch = [(input_hash, {basic_etl_step.extract.hash: {'label': 'a'}})]
+    try:
+        processed, rows_to_load, count, _, tb = async_run._transform_in_worker(
+            basic_etl_step.uuid, batch, RunConfig()
+        )
+        assert tb is None and processed == [input_hash] and count == 1
+        assert list(async_run._worker_etl_steps) == [basic_etl_step.uuid]
+        # Later batches of the same ETLStep reuse the cached ETLStep instead of loading it again
+        ETLStepRegistry.path(registry.directory, basic_etl_step.uuid).unlink()
+        processed, *_ = async_run._transform_in_worker(basic_etl_step.uuid, batch, RunConfig())
+        assert processed == [input_hash]
+    finally:
+        registry.cleanup()
+
+
+def _get_worker_hashing() -> HashingType:
+    return config.hashing
+
+
+def test_worker_uses_parent_config():
+    parent_config = config.copy()
+    parent_config.hashing = HashingType.FAST if config.hashing == HashingType.LEGACY else HashingType.LEGACY
+    registry = ETLStepRegistry()
+    executor = ProcessPoolExecutor(
+        1,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=async_run._initialize_worker,
+        initargs=(LogLevel.INFO, registry.directory, parent_config),
+    )
+    try:
+        # Settings only set in the parent, such as a CLI config file, decide how the workers hash entities
+        assert executor.submit(_get_worker_hashing).result() == parent_config.hashing
+    finally:
+        executor.shutdown()
+        registry.cleanup()
+
+
+def test_server_side_repeats_opt_in(basic_etl_step: ETLStep):
+    """Only ETLSteps that opt in hash their query inputs in the database."""
+    main_engine = create_engine('postgresql://localhost/main')
+    meta_engine = create_engine('postgresql://localhost/meta')
+    extract = basic_etl_step.extract
+    executor = AsyncETLStepExecutor(etl_step=basic_etl_step, run_config=RunConfig())
+    assert not executor._set_repeat_filter(extract, main_engine, main_engine)
+    assert not extract.hashes_inputs
+    opted_in = basic_etl_step.copy(update={'server_side_repeats': True})
+    assert opted_in.hash == basic_etl_step.hash
+    executor = AsyncETLStepExecutor(etl_step=opted_in, run_config=RunConfig())
+    assert executor._set_repeat_filter(extract, main_engine, main_engine)
+    assert extract.hashes_inputs
+    # Repeats are checked in python against the database's hashes when the metadatabase is elsewhere
+    assert not executor._set_repeat_filter(extract, main_engine, meta_engine)
+    assert extract.hashes_inputs
+    executor = AsyncETLStepExecutor(etl_step=opted_in, run_config=RunConfig(retry=True))
+    assert not executor._set_repeat_filter(extract, main_engine, main_engine)
+    assert extract.hashes_inputs
+
+
+def test_transform_batch_plan(basic_etl_step: ETLStep):
+    """The compiled execution plan loads the same rows as transforming the namespace of each row."""
+    assert basic_etl_step._get_plan() is not None
+    batch = [(uuid4(), {basic_etl_step.extract.hash: {'label': label}}) for label in 'abc']
+    processed, rows_to_load, count, skipped, tb = basic_etl_step.transform_batch(batch, RunConfig())
+    assert tb is None and count == 3 and skipped == 0
+    basic_etl_step._plan, basic_etl_step._plan_compiled = None, True
+    expected = basic_etl_step.transform_batch(batch, RunConfig())
+    assert (processed, rows_to_load) == expected[:2]
+    (load,) = basic_etl_step.loads
+    assert sorted(rows_to_load[load.hash].columns[0]) == ['a-child', 'b-child', 'c-child']
+    bad_batch = [(uuid4(), {basic_etl_step.extract.hash: {'name': 'a'}})]
+    basic_etl_step._plan_compiled = False
+    *_, tb = basic_etl_step.transform_batch(bad_batch, RunConfig())
+    assert tb is not None and 'DBgenMissingInfo' in tb
+
+
+def test_transform_batch_hashes_once_per_load(basic_etl_step: ETLStep, monkeypatch):
+    """Each load hashes the ids of a whole batch at once, even when a later load takes its ids."""
+    calls = []
+    get_hashes = LoadEntity._get_hashes
+
+    def count_hashes(self, columns, num_rows):
+        calls.append((self.name, num_rows))
+        return get_hashes(self, columns, num_rows)
+
+    monkeypatch.setattr(LoadEntity, '_get_hashes', count_hashes)
+    query = basic_etl_step.extract
+    parent_load = entities.Parent.load(insert=True, label=query['label'], type=Constant('parent_type'))
+    child_load = entities.Child.load(
+        insert=True, label=query['label'], type=Constant('child_type'), parent_id=parent_load
+    )
+    etl_step = ETLStep(name='test', extract=query, loads=[parent_load, child_load])
+    batch = [(uuid4(), {query.hash: {'label': label}}) for label in 'abc']
+    processed, rows_to_load, *_ = etl_step.transform_batch(batch, RunConfig())
+    assert calls == [('parent', 3), ('child', 3)]
+    etl_step._plan, etl_step._plan_compiled = None, True
+    assert (processed, rows_to_load) == etl_step.transform_batch(batch, RunConfig())[:2]
+    assert rows_to_load[child_load.hash].columns[1] == rows_to_load[parent_load.hash].primary_keys
+    # A row with a bad identifying value is skipped on its own instead of failing its load's batch
+    monkeypatch.setattr(LoadEntity, '_validate', lambda self, input_data, **_: input_data)
+    etl_step._plan_compiled = False
+    bad_batch = [*batch, (uuid4(), {query.hash: {'label': 1}})]
+    processed, rows_to_load, _, skipped, tb = etl_step.transform_batch(
+        bad_batch, RunConfig(skip_on_error=True)
+    )
+    assert tb is None and skipped == 1 and processed == [input_hash for input_hash, _ in batch]
+    assert len(rows_to_load[parent_load.hash].primary_keys) == 3
+
+
+def test_batched_transform(basic_etl_step: ETLStep):
+    """Batched transforms are called once per batch with columns and load the same rows as row transforms."""
+    calls = []
+
+    @transform(batched=True)
+    def add_suffix(labels: List[str]) -> List[str]:
+        calls.append(labels)
+        return [label + "-child" for label in labels]
+
+    query = basic_etl_step.extract
+    batched = add_suffix(query["label"])
+    (load,) = basic_etl_step.loads
+    batched_load = entities.Child.load(insert=True, label=batched.results(), type=Constant("child_type"))
+    etl_step = ETLStep(name="batched", extract=query, transforms=[batched], loads=[batched_load])
+    batch = [(uuid4(), {query.hash: {'label': label}}) for label in 'abc']
+    processed, rows_to_load, count, skipped, tb = etl_step.transform_batch(batch, RunConfig())
+    assert tb is None and processed == [input_hash for input_hash, _ in batch]
+    assert calls == [['a', 'b', 'c']]
+    expected = basic_etl_step.transform_batch(batch, RunConfig())[1]
+    assert rows_to_load[batched_load.hash] == expected[load.hash]
+    # Run one row at a time the function is given single value columns
+    assert batched.node.run({query.hash: {'label': 'd'}}) == {'out': 'd-child'}
+    assert calls[-1] == ['d']
+
+    # Single output columns returned as tuples are not mistaken for several outputs
+    def to_tuple(labels: List[str]) -> tuple:
+        return tuple(labels)
+
+    as_tuple = PythonTransform(function=to_tuple, inputs=[query["label"]], batched=True)
+    assert as_tuple.apply_batch([['a', 'b']], {}, 2) == [['a', 'b']]
+    assert as_tuple.run({query.hash: {'label': 'a'}}) == {'out': 'a'}
+    # A failing batch skips every row it was given, rows that fail on their own are skipped alone
+    bad_batch = [*batch, (uuid4(), {query.hash: {'label': None}})]
+    *_, tb = etl_step.transform_batch(bad_batch, RunConfig())
+    assert tb is not None
+    processed, _, _, skipped, tb = etl_step.transform_batch(bad_batch, RunConfig(skip_on_error=True))
+    assert tb is None and processed == [] and skipped == 4
+    processed, _, _, skipped, tb = etl_step.transform_batch(
+        [(uuid4(), {query.hash: {}}), *batch], RunConfig(skip_on_error=True)
+    )
+    assert tb is None and skipped == 1 and len(processed) == 3
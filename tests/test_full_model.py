@@ -12,16 +12,25 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import multiprocessing
+from threading import Event, Thread
+from time import sleep
+
 import pytest
+from pydantic import SecretStr
 from sqlalchemy.future import Engine
 from sqlalchemy.orm import registry
-from sqlmodel import Session, select
+from sqlmodel import Session, create_engine, select
 
 from dbgen.core.args import Constant
 from dbgen.core.entity import Entity
 from dbgen.core.etl_step import ETLStep
+from dbgen.core.metadata import ETLStepEntity, ETLStepQueueEntity, RunEntity, Status
 from dbgen.core.model import Model
+from dbgen.core.model_settings import BaseModelSettings
 from dbgen.core.node.query import Query
+from dbgen.core.run.utilities import RunConfig
+from dbgen.core.run.worker import ETLStepWorker, claim_etl_step, enqueue_etl_step, load_run_config
 from dbgen.utils.typing import IDType
 
 test_registry = registry()
@@ -78,3 +87,99 @@ def test_full_model_run(simple_model: Model, sql_engine: Engine, run_async: bool
         assert parent.last_name == 'Simpson'
         assert child.first_name == 'Bart'
         assert child.last_name == 'Simpson'
+
+
+def test_pipelined_model_run(simple_model: Model, sql_engine: Engine):
+    run_config = RunConfig(pipeline=True, batch_size=1)
+    run = simple_model.run(sql_engine, sql_engine, run_config=run_config, build=True, run_async=False)
+    assert run.status == 'completed'
+    with Session(sql_engine) as session:
+        assert session.exec(select(Son).where(Son.first_name == 'Bart')).one().last_name == 'Simpson'
+
+
+def run_worker(dsn: str) -> None:
+    engine = create_engine(dsn)
+    ETLStepWorker(poll_interval=0.1, max_idle=5).run(engine, engine)
+
+
+def test_distributed_model_run(simple_model: Model, sql_engine: Engine):
+    # Build the database first so the workers find the queue table
+    simple_model.sync(sql_engine, sql_engine, build=True)
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=run_worker, args=(str(sql_engine.url),)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    try:
+        run = simple_model.run(sql_engine, sql_engine, run_async=False, distributed=True)
+    finally:
+        for worker in workers:
+            worker.join(timeout=30)
+    assert run.status == 'completed'
+    with Session(sql_engine) as session:
+        assert session.exec(select(Son).where(Son.first_name == 'Bart')).one().last_name == 'Simpson'
+        queued = session.exec(select(ETLStepQueueEntity).where(ETLStepQueueEntity.run_id == run.id)).all()
+        assert len(queued) == 2
+        assert all(etl_step.status == Status.completed for etl_step in queued)
+
+
+def claim_and_die(engine: Engine, claimed: Event) -> None:
+    """Claim a queued etl_step like a worker that dies before finishing it."""
+    while claim_etl_step(engine, 'dead-worker') is None:
+        sleep(0.1)
+    claimed.set()
+
+
+def test_distributed_run_fails_lost_etl_step(simple_model: Model, sql_engine: Engine):
+    simple_model.sync(sql_engine, sql_engine, build=True)
+    claimed = Event()
+    worker = Thread(target=claim_and_die, args=(sql_engine, claimed), daemon=True)
+    worker.start()
+    run_config = RunConfig(worker_lease=1.0, worker_timeout=30.0)
+    run = simple_model.run(sql_engine, sql_engine, run_config=run_config, run_async=False, distributed=True)
+    assert claimed.is_set()
+    assert run.status == 'failed'
+    with Session(sql_engine) as session:
+        queued = session.exec(select(ETLStepQueueEntity).where(ETLStepQueueEntity.run_id == run.id)).one()
+        assert queued.status == Status.failed and 'heartbeat' in queued.error
+
+
+def test_distributed_run_times_out(simple_model: Model, sql_engine: Engine):
+    simple_model.sync(sql_engine, sql_engine, build=True)
+    # No workers are running, so the run stops waiting once the timeout passes
+    run_config = RunConfig(worker_timeout=1.0)
+    run = simple_model.run(sql_engine, sql_engine, run_config=run_config, run_async=False, distributed=True)
+    assert run.status == 'failed'
+    with Session(sql_engine) as session:
+        queued = session.exec(select(ETLStepQueueEntity).where(ETLStepQueueEntity.run_id == run.id)).all()
+        assert queued and all(etl_step.status == Status.failed for etl_step in queued)
+        # Nothing is left for a worker to claim after the run
+        assert claim_etl_step(sql_engine, 'late-worker') is None
+
+
+class WorkerSettings(BaseModelSettings):
+    api_key: SecretStr = SecretStr('hunter2')
+    label: str = 'default'
+
+
+def test_queued_etl_steps_rebuild_settings(simple_model: Model, sql_engine: Engine):
+    simple_model.sync(sql_engine, sql_engine, build=True)
+    with Session(sql_engine) as session:
+        runs = [RunEntity(status=Status.running) for _ in range(2)]
+        session.add_all(runs)
+        session.commit()
+        run_ids = [run.id for run in runs]
+        etl_step_id = session.exec(select(ETLStepEntity.id)).first()
+    run_config = RunConfig(batch_size=7, settings=WorkerSettings(label='custom'))
+    # Queue the newer run first, workers still claim the older run's etl_step first
+    for run_id in reversed(run_ids):
+        enqueue_etl_step(sql_engine, run_id, etl_step_id, 0, run_config)
+    claimed = claim_etl_step(sql_engine, 'worker')
+    assert claimed is not None
+    _, run_id, _, _, run_config_json, settings_class = claimed
+    assert run_id == run_ids[0]
+    assert 'settings' not in run_config_json
+    worker_config = load_run_config(run_config_json, settings_class)
+    assert worker_config.batch_size == 7
+    # Settings are read again from the worker's environment with their own class
+    assert isinstance(worker_config.settings, WorkerSettings)
+    assert worker_config.settings.api_key.get_secret_value() == 'hunter2'
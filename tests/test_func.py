@@ -12,6 +12,9 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import inspect
+
+import dbgen.core.func as dbgen_func
 from dbgen.core.func import Func, func_from_callable, get_callable_source_code
 
 
@@ -68,3 +71,30 @@ def test_func_path_name():
     func = func_from_callable(no_arg_func)
     func.store_func(force=True)
     assert func._func != no_arg_func
+
+
+def test_func_compiled_in_memory():
+    """Funcs compile their source once per process without writing it to the temp dir."""
+    func = Func.parse_obj(func_from_callable(basic_function).dict())
+    assert not func.path.exists()
+    assert func(1, 1, 1) == basic_function(1, 1, 1)
+    assert not func.path.exists()
+    copy = Func.parse_obj(func.dict())
+    copy.store_func()
+    assert copy._func is func._func
+    assert inspect.getsource(copy._func) == func.src
+
+
+def test_func_signature_cached(monkeypatch):
+    func = func_from_callable(basic_function)
+    calls = []
+    monkeypatch.setattr(dbgen_func, "signature", lambda f: calls.append(f) or inspect.signature(f))
+    for _ in range(3):
+        assert func.argnames == ["arg_1", "arg_2", "arg_3"]
+        assert func.number_of_required_inputs == 3
+        assert not func.var_positional_keyword
+    assert len(calls) == 1
+    assert func == Func.parse_obj(func.dict())
+    func.set_func(None)
+    assert func.number_of_inputs == 3
+    assert len(calls) == 2
@@ -0,0 +1,63 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from threading import Event
+
+import pytest
+from networkx import DiGraph
+
+from dbgen.utils.graphs import run_graph_in_parallel
+
+
+@pytest.fixture
+def diamond() -> DiGraph:
+    graph = DiGraph()
+    graph.add_edges_from([('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd')])
+    return graph
+
+
+def test_run_graph_in_parallel_respects_dependencies(diamond: DiGraph):
+    finished = []
+    both_started = Event()
+    started = set()
+
+    def run_node(node):
+        started.add(node)
+        if {'b', 'c'} <= started:
+            both_started.set()
+        # The independent branches have to run at the same time for either to finish
+        if node in ('b', 'c'):
+            assert both_started.wait(timeout=5)
+        return node
+
+    def on_done(node, result):
+        assert result == node
+        assert all(upstream in finished for upstream in diamond.predecessors(node))
+        finished.append(node)
+        return True
+
+    run_graph_in_parallel(diamond, ['a', 'b', 'c', 'd'], run_node, on_done, workers=2)
+    assert finished[0] == 'a' and finished[-1] == 'd'
+    assert sorted(finished) == ['a', 'b', 'c', 'd']
+
+
+def test_run_graph_in_parallel_stops(diamond: DiGraph):
+    finished = []
+
+    def on_done(node, result):
+        finished.append(node)
+        return node != 'a'
+
+    run_graph_in_parallel(diamond, ['a', 'b', 'c', 'd'], lambda node: node, on_done, workers=4)
+    assert finished == ['a']
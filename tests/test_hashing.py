@@ -0,0 +1,80 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from datetime import datetime
+from pathlib import Path
+from uuid import UUID, uuid4
+
+import pytest
+from pydasher import hasher
+
+from dbgen.configuration import HashingType
+from dbgen.core.base import encoders
+from dbgen.utils.hashing import encode_value, fast_input_hash, get_input_hasher, get_value_hasher, hash_inputs
+
+etl_step_id = uuid4()
+row = {
+    'int_val': 1,
+    'str_val': 'a',
+    'float_val': 1.5,
+    'none_val': None,
+    'list_val': [1, '1', True],
+    'time_val': datetime(2021, 1, 1),
+    'path_val': Path('/tmp'),
+    'nested': {'b': (1, 2), 'a': {3, 2, 1}},
+}
+
+
+def test_legacy_hashing_is_unchanged():
+    assert get_input_hasher(HashingType.LEGACY)(etl_step_id, row) == UUID(
+        hasher((etl_step_id, row), encoders=encoders)
+    )
+    assert get_value_hasher(HashingType.LEGACY)((1, 'a')) == UUID(hasher((1, 'a')))
+
+
+def test_fast_input_hash_is_stable():
+    reordered = dict(reversed(list(row.items())))
+    assert fast_input_hash(etl_step_id, row) == fast_input_hash(etl_step_id, reordered)
+    assert fast_input_hash(etl_step_id, row) != fast_input_hash(uuid4(), row)
+    assert get_input_hasher(HashingType.FAST) is fast_input_hash
+
+
+@pytest.mark.parametrize(
+    'first,second',
+    [
+        (1, True),
+        (1, 1.0),
+        (1, '1'),
+        ([1, 2], (1, 2)),
+        (['ab'], ['a', 'b']),
+        ({'a': 'b'}, {'ab': ''}),
+        (None, ''),
+        (-1, 255),
+    ],
+)
+def test_fast_encoding_is_unambiguous(first, second):
+    assert encode_value(first) != encode_value(second)
+
+
+def test_fast_encoding_unknown_type():
+    with pytest.raises(TypeError):
+        encode_value(object())
+
+
+@pytest.mark.parametrize('hashing', list(HashingType))
+def test_hash_inputs_matches_input_hasher(hashing):
+    etl_step_uuid = uuid4()
+    rows = [{'a': i, 'b': str(i)} for i in range(10)]
+    hash_input = get_input_hasher(hashing)
+    assert hash_inputs(etl_step_uuid, rows, hashing) == [hash_input(etl_step_uuid, row) for row in rows]
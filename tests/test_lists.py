@@ -0,0 +1,58 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import threading
+
+import pytest
+
+from dbgen.utils.lists import prefetch
+
+
+def test_prefetch_preserves_order():
+    assert list(prefetch(iter(range(100)), 3)) == list(range(100))
+    assert list(prefetch(iter([]), 2)) == []
+
+
+def test_prefetch_runs_in_background():
+    def numbers():
+        for i in range(3):
+            yield threading.current_thread().name, i
+
+    assert all(name.startswith('dbgen-prefetch') for name, _ in prefetch(numbers(), 2))
+
+
+def test_prefetch_raises_errors_in_order():
+    def failing():
+        yield 1
+        raise ValueError('extraction failed')
+
+    items = prefetch(failing(), 2)
+    assert next(items) == 1
+    with pytest.raises(ValueError, match='extraction failed'):
+        next(items)
+
+
+def test_prefetch_stays_bounded():
+    consumed = []
+
+    def numbers():
+        for i in range(100):
+            consumed.append(i)
+            yield i
+
+    items = prefetch(numbers(), 2)
+    assert next(items) == 0
+    items.close()
+    # Only the items requested ahead of the consumer are extracted
+    assert len(consumed) <= 3
@@ -12,7 +12,6 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-from collections import defaultdict
 from importlib import reload
 
 import pytest
@@ -22,12 +21,14 @@ from sqlalchemy import func
 from sqlmodel import Session, select
 
 import tests.example.entities as entities
+from dbgen.configuration import CopyFormat, LoadStrategy
 from dbgen.core.args import Arg, Constant
 from dbgen.core.dependency import Dependency
 from dbgen.core.entity import Entity
-from dbgen.core.node.load import Load, LoadEntity
+from dbgen.core.node.load import Load, LoadEntity, hash_tuple
+from dbgen.core.run.utilities import count_loaded_rows
 from dbgen.utils.lists import broadcast
-from dbgen.utils.postgresql_load import get_statements
+from dbgen.utils.postgresql_load import LoadResult, get_statements, get_temp_table_name
 from tests.strategies import (
     basic_insert_load_strat,
     basic_load_strat,
@@ -73,7 +74,7 @@ def test_build_io_obj(clear_registry, simple_load, sql_engine, raw_pg3_connectio
     Child.metadata.create_all(sql_engine)
     n_rows = 1000
     namespace_rows = [{"pyblock": {"label": [i for i in range(n_rows)]}}]
-    rows_to_load = defaultdict(dict)
+    rows_to_load = {load.hash: load.new_buffer() for load in (parent_load, child_load)}
     for row in namespace_rows:
         for load in (parent_load, child_load):
             row[load.hash] = load.new_run(row, rows_to_load)
@@ -204,6 +205,19 @@ def test_recursive_load_hypo(instance: Load):
     assert isinstance(instance, Load)
 
 
+def test_get_hashes(simple_load):
+    load_entity = simple_load.load_entity
+    rows = [{"key_1": f"a{i}", "key_2": f"b{i % 3}"} for i in range(10)]
+    columns = {key: [row[key] for row in rows] for key in ("key_1", "key_2")}
+    hashes = load_entity._get_hashes(columns, len(rows))
+    assert hashes == [hash_tuple((row["key_1"], row["key_2"])) for row in rows]
+    assert hashes == [load_entity._get_hash(row) for row in rows]
+    with pytest.raises(KeyError):
+        load_entity._get_hashes({"key_1": columns["key_1"]}, len(rows))
+    with pytest.raises(ValueError):
+        load_entity._get_hashes({**columns, "key_1": [1] * len(rows)}, len(rows))
+
+
 def test_load_dependency(simple_load):
     dep = simple_load._get_dependency()
     assert isinstance(dep, Dependency)
@@ -253,3 +267,90 @@ def test_load_data(insert: bool, clear_registry):
     assert isinstance(drop_statement, str)
     assert isinstance(copy_statement, str)
     assert isinstance(load_statement, str)
+
+
+def test_binary_copy_statement(simple_load):
+    load_entity = simple_load.load_entity
+    args = (load_entity.name, load_entity.full_name, load_entity.primary_key_name, True, ['key_1', 'key_2'])
+    _, _, copy_statement, _ = get_statements(*args)
+    assert 'BINARY' not in copy_statement
+    _, _, copy_statement, _ = get_statements(*args, copy_format=CopyFormat.BINARY)
+    assert copy_statement.endswith('FROM STDIN (FORMAT BINARY)')
+    # The copy format is a performance setting and must not change the ETLStep's hash
+    assert simple_load.copy(update={'copy_format': CopyFormat.BINARY}).hash == simple_load.hash
+
+
+def test_reusable_temp_table_statements(simple_load):
+    load_entity = simple_load.load_entity
+    create_statement, drop_statement, copy_statement, load_statement = get_statements(
+        load_entity.name,
+        load_entity.full_name,
+        load_entity.primary_key_name,
+        True,
+        ['key_1', 'key_2'],
+        temp_table_suffix='suffix',
+    )
+    temp_table_name = get_temp_table_name(load_entity.full_name, 'suffix')
+    assert 'ON COMMIT DELETE ROWS' in create_statement
+    assert temp_table_name in create_statement
+    assert temp_table_name in copy_statement
+    assert drop_statement.endswith(temp_table_name)
+
+
+def test_long_temp_table_names_stay_unique():
+    full_table_name = 'a_very_long_schema_name.a_very_long_table_name_for_an_entity'
+    first = get_temp_table_name(full_table_name, 'a' * 32)
+    second = get_temp_table_name(full_table_name, 'b' * 32)
+    assert first != second
+    assert all(len(name.strip('"')) <= 63 for name in (first, second))
+
+
+def test_load_strategy_statements(simple_load):
+    load_entity = simple_load.load_entity
+    args = (load_entity.name, load_entity.full_name, load_entity.primary_key_name, True, ['key_1', 'key_2'])
+    create_statement, _, _, load_statement = get_statements(*args, load_strategy=LoadStrategy.DEDUP)
+    assert 'auto_inc' in create_statement
+    assert 'ROW_NUMBER()' in load_statement
+    # The staged rows are unique by primary key so auto resolves to a plain upsert
+    for load_strategy in (LoadStrategy.AUTO, LoadStrategy.UPSERT):
+        create_statement, _, _, load_statement = get_statements(*args, load_strategy=load_strategy)
+        assert 'auto_inc' not in create_statement
+        assert 'ROW_NUMBER()' not in load_statement
+        assert 'ON CONFLICT' in load_statement
+    _, _, _, load_statement = get_statements(*args, load_strategy=LoadStrategy.MERGE)
+    assert load_statement.strip().startswith('MERGE INTO')
+    assert 'WHEN NOT MATCHED THEN' in load_statement
+    # Deduplicating staging tables have an extra column so they must not be reused by other strategies
+    dedup_table_name = get_temp_table_name(load_entity.full_name, dedup=True)
+    assert dedup_table_name != get_temp_table_name(load_entity.full_name)
+    assert simple_load.copy(update={'load_strategy': LoadStrategy.MERGE}).hash == simple_load.hash
+
+
+@pytest.mark.parametrize('load_strategy', list(LoadStrategy))
+def test_skip_unchanged_statements(simple_load, load_strategy):
+    load_entity = simple_load.load_entity
+    args = (load_entity.name, load_entity.full_name, load_entity.primary_key_name, True, ['key_1', 'key_2'])
+    _, _, _, load_statement = get_statements(*args, load_strategy=load_strategy)
+    assert 'IS DISTINCT FROM' not in load_statement
+    _, _, _, load_statement = get_statements(
+        *args, load_strategy=load_strategy, skip_unchanged=True, json_columns={'key_2': 'json'}
+    )
+    assert 'IS DISTINCT FROM' in load_statement
+    # json has no equality operator so it has to be compared as jsonb
+    assert '"key_2"::jsonb' in load_statement
+    _, _, _, update_statement = get_statements(*args[:3], False, args[4], skip_unchanged=True)
+    assert 'AND ROW(' in update_statement
+    assert simple_load.copy(update={'skip_unchanged': True}).hash == simple_load.hash
+
+
+def test_load_results(simple_load):
+    load_entity = simple_load.load_entity
+    args = (load_entity.name, load_entity.full_name, load_entity.primary_key_name, True, ['key_1', 'key_2'])
+    _, _, _, load_statement = get_statements(*args)
+    assert '(xmax = 0) AS inserted' in load_statement
+    # Only postgres 17+ can return which action a merge took
+    _, _, _, load_statement = get_statements(*args, load_strategy=LoadStrategy.MERGE, server_version=160000)
+    assert 'RETURNING' not in load_statement
+    _, _, _, load_statement = get_statements(*args, load_strategy=LoadStrategy.MERGE, server_version=170000)
+    assert "merge_action() = 'INSERT'" in load_statement
+    assert count_loaded_rows([10, 5], [LoadResult(inserted=3, updated=4), LoadResult(updated=5)]) == (3, 9, 3)
@@ -0,0 +1,45 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+import pickle
+from uuid import uuid4
+
+import pytest
+
+from dbgen.utils.load_buffer import LoadBuffer
+
+
+def test_load_buffer_last_write_wins():
+    keys = [uuid4() for _ in range(3)]
+    buffer = LoadBuffer(2)
+    buffer.extend(keys, [[1, 2, 3], ['a', 'b', 'c']])
+    buffer.append(keys[1], (4, 'd'))
+    expected = {keys[0]: (1, 'a'), keys[1]: (4, 'd'), keys[2]: (3, 'c')}
+    assert dict(buffer) == expected
+    assert list(buffer) == keys
+    assert list(buffer.rows()) == [(key, *values) for key, values in expected.items()]
+    with pytest.raises(ValueError):
+        buffer.extend(keys, [[1, 2, 3]])
+
+
+def test_load_buffer_merge_and_pickle():
+    keys = [uuid4() for _ in range(3)]
+    buffer = LoadBuffer(1)
+    buffer.extend(keys[:2], [[1, 2]])
+    other = LoadBuffer(1)
+    other.extend(keys[1:], [[3, 4]])
+    unpickled = pickle.loads(pickle.dumps(buffer))
+    assert dict(unpickled) == dict(buffer)
+    unpickled.merge(other)
+    assert dict(unpickled) == {keys[0]: (1,), keys[1]: (3,), keys[2]: (4,)}
@@ -14,12 +14,13 @@
 
 import pytest
 from pydantic import ValidationError
-from sqlalchemy import exc, select, text
+from sqlalchemy import exc, inspect, select, text
 from sqlalchemy.orm import registry
 
 from dbgen.core.dependency import Dependency
 from dbgen.core.entity import Entity
 from dbgen.core.etl_step import ETLStep
+from dbgen.core.metadata import META_SCHEMA, ETLStepRunEntity
 from dbgen.core.model import Model
 from dbgen.exceptions import ModelRunError
 
@@ -87,3 +88,17 @@ def test_empty_model(sql_engine):
     model = Model(name='test')
     with pytest.raises(ModelRunError, match='Model test has no ETLSteps'):
         model.run(sql_engine, sql_engine)
+
+
+@pytest.mark.database
+def test_model_sync_migrates_meta_tables(sql_engine):
+    """Test that syncing adds columns missing from meta tables created by an older version of dbgen."""
+    model = Model(name='test')
+    model.sync(sql_engine, sql_engine, meta_only=True)
+    with sql_engine.begin() as conn:
+        conn.execute(text(f'ALTER TABLE {META_SCHEMA}.etl_step_run DROP COLUMN rows_unchanged'))
+    model.sync(sql_engine, sql_engine, meta_only=True)
+    # Syncing again leaves the migrated tables as they are
+    model.sync(sql_engine, sql_engine, meta_only=True)
+    columns = inspect(sql_engine).get_columns(ETLStepRunEntity.__tablename__, schema=META_SCHEMA)
+    assert 'rows_unchanged' in {column['name'] for column in columns}
@@ -12,6 +12,8 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import logging
+
 import pytest
 from hypothesis import given
 from pydantic import ValidationError
@@ -78,6 +80,24 @@ def test_pyblock_run_with_args():
     assert pb_dict["out"] == 6
 
 
+def test_pyblock_captures_stdout_when_logged(capsys, caplog):
+    def noisy(x):
+        print(f"got {x}")
+        return x
+
+    pb = PythonTransform(function=noisy, inputs=[Constant(1)])
+    assert pb.run({}) == {"out": 1}
+    assert capsys.readouterr().out == "got 1\n"
+    with caplog.at_level(logging.DEBUG, logger="dbgen.pyblock.noisy"):
+        assert pb.run({}) == {"out": 1}
+    assert capsys.readouterr().out == ""
+    assert "got 1" in caplog.text
+    quiet = PythonTransform(function=noisy, inputs=[Constant(1)], capture_output=True)
+    assert quiet.hash == pb.hash
+    assert quiet.run({}) == {"out": 1}
+    assert capsys.readouterr().out == ""
+
+
 def test_two_pyblocks():
     func_1 = lambda x: x + 1
     func_2 = lambda x: str(x)
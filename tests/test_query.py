@@ -11,10 +11,13 @@
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
+from uuid import uuid4
+
 import pytest
 
 from dbgen.core.args import Arg
-from dbgen.core.node.query import BaseQuery, Connection, ExternalQuery
+from dbgen.core.metadata import Repeats
+from dbgen.core.node.query import INPUT_HASH_COLUMN, BaseQuery, Connection, ExternalQuery, split_input_hash
 from tests.example.database import dsn
 
 test_connection = Connection.from_uri(dsn)
@@ -68,3 +71,49 @@ def test_external_connection_streaming(seed_db):
         output = list(ext.extract())
         assert len(output) == 100
         assert all(map(lambda x: "name" in x, output))
+
+
+def test_repeat_filter_query():
+    etl_step_id = uuid4()
+    ext = BaseQuery(query="Select 1 as test", outputs=["test"])
+    assert not ext.hashes_inputs
+    assert ext.compiled_query.strip() == "Select 1 as test"
+    ext.set_repeat_filter(etl_step_id)
+    assert ext.hashes_inputs
+    assert INPUT_HASH_COLUMN in ext.compiled_query
+    assert str(etl_step_id) in ext.compiled_query
+    assert Repeats.__fulltablename__ in ext.compiled_query
+    ext.set_repeat_filter(etl_step_id, filter_repeats=False)
+    assert Repeats.__fulltablename__ not in ext.compiled_query
+    ext.set_repeat_filter(None)
+    assert ext.compiled_query.strip() == "Select 1 as test"
+
+
+def test_split_input_hash():
+    input_hash = uuid4()
+    row = {"test": 1, INPUT_HASH_COLUMN: str(input_hash)}
+    assert split_input_hash(row) == (input_hash, {"test": 1})
+    assert INPUT_HASH_COLUMN in row
+
+
+def test_partition_conditions():
+    query = BaseQuery(query="select id from t", outputs=["id"])
+    assert query._partition_conditions() == ["TRUE"]
+    hashed = BaseQuery(query="select id from t", outputs=["id"]).partition(3, "id")
+    assert hashed.hash == query.hash
+    assert hashed._partition_conditions() == [
+        f'mod(abs(CAST(hashtext(coalesce(CAST(P."id" AS TEXT), \'\')) AS BIGINT)), 3) = {i}' for i in range(3)
+    ]
+    ranged = BaseQuery(query="select id from t", outputs=["id"]).partition(3, "id", "range")
+    assert ranged._partition_conditions((0, 90)) == [
+        '(P."id" < 30.0 OR P."id" IS NULL)',
+        'P."id" >= 30.0 AND P."id" < 60.0',
+        'P."id" >= 60.0',
+    ]
+    assert ranged._partition_conditions((None, None)) == ['P."id" IS NULL', "FALSE", "FALSE"]
+    with pytest.raises(TypeError):
+        ranged._partition_conditions(("a", "z"))
+    with pytest.raises(ValueError):
+        BaseQuery(query="select id from t", outputs=["id"], partitions=2, partition_strategy="range")
+    with pytest.raises(ValueError):
+        BaseQuery(query="select id from t", outputs=["id"]).partition(0)
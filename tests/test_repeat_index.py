@@ -0,0 +1,50 @@
+#   Copyright 2021 Modelyst LLC
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+from uuid import UUID, uuid4
+
+import pytest
+
+from dbgen.configuration import RepeatIndexType
+from dbgen.core.run.repeat_index import SetRepeatIndex, SortedRepeatIndex, get_repeat_index_class
+
+
+@pytest.mark.parametrize('index_class', [SetRepeatIndex, SortedRepeatIndex])
+def test_repeat_index_membership(index_class):
+    fetched = [uuid4() for _ in range(1000)]
+    index = index_class.from_hashes(fetched)
+    assert len(index) == len(fetched)
+    assert all(input_hash in index for input_hash in fetched)
+    assert not any(uuid4() in index for _ in range(1000))
+    new_hash = uuid4()
+    assert new_hash not in index
+    index.add(new_hash)
+    assert new_hash in index
+    assert len(index) == len(fetched) + 1
+
+
+def test_sorted_repeat_index_shared_high_bits():
+    """Hashes that share their first 8 bytes have to be distinguished by the low bits."""
+    high = 0xFFFFFFFFFFFFFFFF << 64
+    fetched = [UUID(int=high + i) for i in (0, 2, 4)]
+    index = SortedRepeatIndex.from_hashes(fetched)
+    assert all(input_hash in index for input_hash in fetched)
+    assert UUID(int=high + 1) not in index
+    assert UUID(int=high + 5) not in index
+    assert UUID(int=0) not in index
+
+
+def test_get_repeat_index_class():
+    assert get_repeat_index_class(RepeatIndexType.SET) is SetRepeatIndex
+    assert get_repeat_index_class('sorted') is SortedRepeatIndex
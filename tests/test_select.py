@@ -137,6 +137,9 @@ def test_base_query():
         "query": str(basic_statement),
         "outputs": ["id", "label", "col_label"],
         "params": {},
+        "partitions": 1,
+        "partition_by": None,
+        "partition_strategy": "hash",
     }
     assert isinstance(base_query.hash, str)
     assert isinstance(base_query.dict(), dict)
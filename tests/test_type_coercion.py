@@ -16,8 +16,12 @@ from datetime import date, datetime, time
 from decimal import Decimal
 from enum import Enum
 from inspect import isclass
+from pathlib import PosixPath
 from uuid import UUID
 
+from psycopg import adapters
+from psycopg.adapt import PyFormat
+from psycopg.pq import Format
 from sqlalchemy import Column
 from sqlalchemy.orm import registry
 
@@ -25,6 +29,7 @@ from dbgen.core.attribute import Attribute
 from dbgen.core.entity import Entity
 from dbgen.core.type_registry import column_registry
 from dbgen.types import BigInteger
+from dbgen.utils.type_coercion import PathDumper
 
 type_registry = registry()
 
@@ -64,6 +69,15 @@ def test_column_type_map():
         ) == type(expected_type)
 
 
+def test_path_dumpers_keep_text_columns():
+    # Binary COPY picks dumpers by column oid so the path dumpers must not claim text columns
+    text_oid = adapters.types.get_oid('text')
+    path_oid = adapters.types.get_oid('path')
+    for format in (Format.TEXT, Format.BINARY):
+        assert not issubclass(adapters.get_dumper_by_oid(text_oid, format), PathDumper)
+        assert adapters.get_dumper(PosixPath, PyFormat.from_pq(format)).oid == path_oid
+
+
 # def test_type_load_entity():
 #     load_entity = TypeEntity._get_load_entity()
 #     for attr_name, type_str in load_entity.attributes.items():